@@ -0,0 +1,133 @@
+import json
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+VALID_CATEGORIES = {"Painting", "Photography", "Posters", "Print", "Textile Arts"}
+REQUIRED_LINKS = ["thumbnail_link", "artists_link", "genes_link", "similar_link"]
+ROW_GROUP_SIZE = 10_000
+CHUNK_SIZE = 1 << 20  # Characters read from the input at a time
+
+SCHEMA = pa.schema(
+    [
+        ("id", pa.string()),
+        ("title", pa.string()),
+        ("category", pa.string()),
+        ("thumbnail_link", pa.string()),
+        ("artists_link", pa.string()),
+        ("genes_link", pa.string()),
+        ("similar_link", pa.string()),
+    ]
+)
+
+
+def iter_artworks(json_file, chunk_size=CHUNK_SIZE):
+    """
+    Yield the artworks of a JSON array file, like artworks.json, or of a JSONL
+    file, like the crawler's artworks.jsonl, one at a time.
+
+    The file is read in chunks and every artwork is decoded as soon as it is
+    complete, so memory does not grow with the size of the file.
+    """
+    decoder = json.JSONDecoder()
+    with open(json_file, "r", encoding="utf-8") as f:
+        buffer = ""
+        position = 0
+        is_array = None
+        eof = False
+
+        while True:
+            # Skip whitespace and the separators of a JSON array.
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if is_array is None and position < len(buffer):
+                is_array = buffer[position] == "["
+                if is_array:
+                    position += 1
+                continue
+            if is_array and position < len(buffer) and buffer[position] == "]":
+                return
+
+            try:
+                artwork, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    if buffer[position:].strip():
+                        raise
+                    return
+                # The next artwork is not complete yet, read more.
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+
+            position = end
+            yield artwork
+
+
+def extract_artwork(artwork):
+    """
+    Extract id, title, category, thumbnail link, artists link, genes link and similar link.
+    """
+    links = artwork.get("_links", {})
+    return {
+        "id": artwork.get("id", ""),
+        "title": artwork.get("title", ""),
+        "category": artwork.get("category", ""),
+        "thumbnail_link": links.get("thumbnail", {}).get("href", ""),
+        "artists_link": links.get("artists", {}).get("href", ""),
+        "genes_link": links.get("genes", {}).get("href", ""),
+        "similar_link": links.get("similar_artworks", {}).get("href", ""),
+    }
+
+
+def is_valid_artwork(row):
+    """
+    Category is one of Painting, Photography, Posters, Print, or Textile Arts,
+    and none of the links is empty.
+    """
+    return row["category"] in VALID_CATEGORIES and all(
+        (row[link] or "").strip() for link in REQUIRED_LINKS
+    )
+
+
+def convert_json_to_parquet(json_file, parquet_file, row_group_size=ROW_GROUP_SIZE):
+    """
+    Convert a JSON or JSONL file of artworks to a filtered Parquet file in a single pass.
+
+    Replaces convertArtworksToCSV.py followed by filterArtworks.py: artworks
+    are filtered as they are parsed and written in row groups of
+    `row_group_size` rows, so at most one row group is held in memory.
+    """
+    try:
+        total = 0
+        written = 0
+        batch = []
+        with pq.ParquetWriter(parquet_file, SCHEMA) as writer:
+            for artwork in iter_artworks(json_file):
+                total += 1
+                row = extract_artwork(artwork)
+                if not is_valid_artwork(row):
+                    continue
+
+                batch.append(row)
+                if len(batch) >= row_group_size:
+                    writer.write_table(pa.Table.from_pylist(batch, schema=SCHEMA))
+                    written += len(batch)
+                    batch = []
+
+            if batch:
+                writer.write_table(pa.Table.from_pylist(batch, schema=SCHEMA))
+                written += len(batch)
+
+        print(f"Kept {written} of {total} artworks in {parquet_file}.")
+
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
+# Usage
+if __name__ == "__main__":
+    json_file = "artworks.jsonl"  # artworks.json also works
+    parquet_file = "filtered_artworks.parquet"  # Output Parquet file path
+    convert_json_to_parquet(json_file, parquet_file)
@@ -1,27 +1,60 @@
-import requests
-import time
+import asyncio
+import json
 import os
+import random
+
+import aiohttp
+
+from recsys.artsy import TokenBucket
 
 # Constants
-API_BASE_URL = "https://api.artsy.net/api"
+API_BASE_URL = os.environ.get("ARTSY_API_BASE_URL", "https://api.artsy.net/api")
 CLIENT_ID = os.environ.get('CLIENT_ID') # Replace with your Artsy client_id
 CLIENT_SECRET = os.environ.get('CLIENT_SECRET')  # Replace with your Artsy client_secret
 RATE_LIMIT = 5  # 5 requests per second
 ARTWORKS_COUNT = 27577
-def get_access_token():
+PAGE_SIZE = 50
+MAX_CONCURRENCY = 8  # Requests in flight, the rate limit still applies
+MAX_RETRIES = 5
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class Checkpoint:
     """
-    Fetch the access token from the Artsy API.
+    Progress of a crawl: the pages written to the output file and the size of
+    the output file once they were written. On resume the output file is
+    truncated back to that size, which drops a page that was only partly
+    written when the crawl stopped.
     """
-    auth_url = f"{API_BASE_URL}/tokens/xapp_token"
-    payload = {
-        "client_id": CLIENT_ID,
-        "client_secret": CLIENT_SECRET,
-    }
-    response = requests.post(auth_url, json=payload)
-    response.raise_for_status()  # Raise an error for bad status codes
-    return response.json()["token"]
 
-def get_access_token():
+    def __init__(self, filename):
+        self.filename = filename
+        self.completed_pages = set()
+        self.offset = 0
+        self.end_page = None
+        if os.path.exists(filename):
+            with open(filename, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            self.completed_pages = set(state["completed_pages"])
+            self.offset = state["offset"]
+            self.end_page = state["end_page"]
+
+    def save(self):
+        # Write to a temporary file first so a crash never leaves a torn checkpoint.
+        tmp_filename = self.filename + ".tmp"
+        with open(tmp_filename, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "completed_pages": sorted(self.completed_pages),
+                    "offset": self.offset,
+                    "end_page": self.end_page,
+                },
+                f,
+            )
+        os.replace(tmp_filename, self.filename)
+
+
+async def get_access_token(session):
     """
     Fetch the access token from the Artsy API.
     """
@@ -30,57 +63,117 @@ def get_access_token():
         "client_id": CLIENT_ID,
         "client_secret": CLIENT_SECRET,
     }
-    response = requests.post(auth_url, json=payload)
-    response.raise_for_status()  # Raise an error for bad status codes
-    return response.json()["token"]
+    async with session.post(auth_url, json=payload) as response:
+        response.raise_for_status()  # Raise an error for bad status codes
+        return (await response.json())["token"]
 
 
-def fetch_artworks(token):
+async def fetch_page(session, limiter, page):
     """
-    Fetch all artworks using the Artsy API.
+    Fetch one page of artworks, retrying rate limited and failed requests with exponential backoff.
     """
-    artworks = []
-    headers = {
-        "X-Xapp-Token": token,
-    }
-    next_page_url = f"{API_BASE_URL}/artworks?page=1&size=50"
-    counter = 0
-    while next_page_url:
-        print (str((counter / ARTWORKS_COUNT) * 100) + "% completed")
-        response = requests.get(next_page_url, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-        artworks.extend(data["_embedded"]["artworks"])
-        next_page_url = data.get("_links", {}).get("next", {}).get("href", None)
-        # Respect rate limiting
-        time.sleep(1 / RATE_LIMIT)
-        counter += 50
-    
-    return artworks
-
-def save_artworks_to_file(artworks, filename="artworks.json"):
+    url = f"{API_BASE_URL}/artworks"
+    params = {"page": page, "size": PAGE_SIZE}
+    for attempt in range(MAX_RETRIES + 1):
+        await limiter.acquire()
+        try:
+            async with session.get(url, params=params) as response:
+                if response.status not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    data = await response.json()
+                    return data["_embedded"]["artworks"]
+                retry_after = response.headers.get("Retry-After")
+                error = f"HTTP {response.status}"
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            retry_after = None
+            error = repr(e)
+
+        if attempt == MAX_RETRIES:
+            raise RuntimeError(f"Page {page} failed after {MAX_RETRIES} retries: {error}")
+        delay = float(retry_after) if retry_after else 2**attempt + random.random()
+        print(f"Page {page}: {error}, retrying in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+
+async def fetch_artworks(
+    token,
+    output_file="artworks.jsonl",
+    checkpoint_file="artworks.checkpoint.json",
+    rate_limit=RATE_LIMIT,
+    max_concurrency=MAX_CONCURRENCY,
+):
     """
-    Save artworks data to a file in JSON format.
+    Fetch all artworks using the Artsy API and append them to a JSONL file, one artwork per line.
+
+    Pages are fetched concurrently at up to `rate_limit` requests per second
+    and written as they arrive, so they are not in page order. The crawl
+    stops at the first empty page. It can be interrupted at any time and
+    resumed with the same files.
     """
-    import json
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(artworks, f, ensure_ascii=False, indent=4)
+    checkpoint = Checkpoint(checkpoint_file)
+    if checkpoint.completed_pages:
+        print(f"Resuming after {len(checkpoint.completed_pages)} pages.")
+
+    limiter = TokenBucket(rate_limit)
+    write_lock = asyncio.Lock()
+    next_page = 1
+
+    with open(output_file, "ab") as f:
+        f.truncate(checkpoint.offset)
+
+        async def worker(session):
+            nonlocal next_page
+            while True:
+                page = next_page
+                next_page += 1
+                if checkpoint.end_page is not None and page >= checkpoint.end_page:
+                    return
+                if page in checkpoint.completed_pages:
+                    continue
+
+                artworks = await fetch_page(session, limiter, page)
+                async with write_lock:
+                    if not artworks:
+                        checkpoint.end_page = min(page, checkpoint.end_page or page)
+                    for artwork in artworks:
+                        f.write(json.dumps(artwork, ensure_ascii=False).encode("utf-8"))
+                        f.write(b"\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                    checkpoint.completed_pages.add(page)
+                    checkpoint.offset = f.tell()
+                    checkpoint.save()
+
+                    fetched = len(checkpoint.completed_pages) * PAGE_SIZE
+                    print(f"{min(fetched / ARTWORKS_COUNT, 1) * 100:.1f}% completed")
+
+        headers = {"X-Xapp-Token": token}
+        connector = aiohttp.TCPConnector(limit=max_concurrency)
+        async with aiohttp.ClientSession(headers=headers, connector=connector) as session:
+            await asyncio.gather(*(worker(session) for _ in range(max_concurrency)))
+
+
+async def main_async():
+    """
+    Download all artworks from Artsy API.
+    """
+    print("Authenticating...")
+    async with aiohttp.ClientSession() as session:
+        token = await get_access_token(session)
+    print("Fetching artworks...")
+    await fetch_artworks(token)
+    print("Artworks saved to artworks.jsonl")
+
 
 def main():
     """
     Main function to download all artworks from Artsy API.
     """
     try:
-        print("Authenticating...")
-        token = get_access_token()
-        # token = get_access_token()
-        print("Fetching artworks...")
-        artworks = fetch_artworks(token)
-        print(f"Fetched {len(artworks)} artworks.")
-        save_artworks_to_file(artworks)
-        print("Artworks saved to artworks.json")
+        asyncio.run(main_async())
     except Exception as e:
-        print(f"An error occurred: {e}")
+        print(f"An error occurred: {e}. Run again to resume.")
 
 if __name__ == "__main__":
     main()
@@ -1,13 +1,27 @@
+import asyncio
 import csv
+import json
 import random
-import time
 import requests
 import os
 import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import aiohttp
+import polars as pl
+
+from recsys.artsy import TokenBucket
 
 # Constants
 CLIENT_ID = os.environ.get('CLIENT_ID') # Replace with your Artsy client_id
 CLIENT_SECRET = os.environ.get('CLIENT_SECRET')  # Replace with your Artsy client_secret
+RATE_LIMIT = 5  # 5 requests per second
+MAX_CONCURRENCY = 8  # Requests in flight, the rate limit still applies
+MAX_RETRIES = 5
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Small row groups let readers skip everything before a `t_dat` watermark.
+PARQUET_ROW_GROUP_SIZE = 50_000
 
 def get_access_token():
     """
@@ -29,115 +43,236 @@ def get_access_token():
         raise
 
 
-def get_artwork_data(token, similar_link):
+async def get_artwork_data(session, limiter, similar_link):
     """
     Fetches data from the Artsy API using the provided `similar_link`.
+    Rate limited and failed requests are retried with exponential backoff,
+    other client errors are not retried.
 
     Args:
+        session (aiohttp.ClientSession): Session holding the Artsy token.
+        limiter (TokenBucket): Rate limiter shared by all requests.
         similar_link (str): The URL for the API request.
 
     Returns:
-        list: A list of artwork IDs returned by the API.
+        list: The artwork IDs and thumbnail links returned by the API, or None if the request failed.
     """
-    try:
-        headers = {
-            "X-Xapp-Token": token  # Replace with your Artsy API token
+    for attempt in range(MAX_RETRIES + 1):
+        await limiter.acquire()
+        try:
+            async with session.get(similar_link) as response:
+                if response.status not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    data = await response.json()
+                    break
+                retry_after = response.headers.get("Retry-After")
+                error = f"HTTP {response.status}"
+        except aiohttp.ClientResponseError as e:
+            # Other client errors will not go away on a retry within this
+            # run. The link is not recorded as fetched, so the next run
+            # tries it again.
+            print(f"Error fetching data from {similar_link}: {e}")
+            return None
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            retry_after = None
+            error = repr(e)
+
+        if attempt == MAX_RETRIES:
+            print(f"Error fetching data from {similar_link}: {error}")
+            return None
+        await asyncio.sleep(float(retry_after) if retry_after else 2**attempt + random.random())
+
+    # Extract artwork IDs and thumbnail links from the response
+    return [
+        {
+            "id": artwork.get("id"),
+            "thumbnail_link": artwork.get("_links", {}).get("thumbnail", {}).get("href")
         }
-        response = requests.get(similar_link, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-
-       # Extract artwork IDs and thumbnail links from the response
-        artworks = [
-            {
-                "id": artwork.get("id"),
-                "thumbnail_link": artwork.get("_links", {}).get("thumbnail", {}).get("href")
-            }
-            for artwork in data.get("_embedded", {}).get("artworks", [])
-        ]
-        return artworks
+        for artwork in data.get("_embedded", {}).get("artworks", [])
+    ]
 
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching data from {similar_link}: {e}")
-        return []
 
-def generate_transaction_data(token, input_csv, output_csv):
+def load_progress(progress_file):
+    """
+    Load the responses fetched by a previous run, keyed by `similar_link`.
+    A line that was only partly written when the run stopped is dropped, and
+    entries without a fetch time are fetched again.
+    """
+    responses = {}
+    if not os.path.exists(progress_file):
+        return responses
+
+    with open(progress_file, "rb+") as f:
+        offset = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            entry = json.loads(line)
+            if "t_dat" in entry:
+                responses[entry["similar_link"]] = entry
+            offset += len(line)
+        f.truncate(offset)
+
+    return responses
+
+
+async def fetch_similar_artworks(
+    token,
+    similar_links,
+    progress_file,
+    rate_limit=RATE_LIMIT,
+    max_concurrency=MAX_CONCURRENCY,
+):
+    """
+    Fetch the similar artworks of every distinct link not fetched yet.
+
+    Every response is appended to `progress_file` as soon as it arrives,
+    with the time it was fetched, so an interrupted run resumes where it
+    stopped. Failed requests are not recorded, and are fetched again by the
+    next run.
+
+    Returns:
+        dict: Entries with the similar 'artworks' and their fetch time 't_dat', keyed by `similar_link`.
+    """
+    responses = load_progress(progress_file)
+    pending = [link for link in similar_links if link not in responses]
+    print(f"{len(similar_links)} distinct links, {len(pending)} left to fetch.")
+
+    limiter = TokenBucket(rate_limit)
+    queue = asyncio.Queue()
+    for link in pending:
+        queue.put_nowait(link)
+
+    with open(progress_file, "a", encoding="utf-8") as progress:
+
+        async def worker(session):
+            while not queue.empty():
+                similar_link = queue.get_nowait()
+                artworks = await get_artwork_data(session, limiter, similar_link)
+                if artworks is None:
+                    continue
+
+                entry = {
+                    "similar_link": similar_link,
+                    "artworks": artworks,
+                    "t_dat": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S"),
+                }
+                responses[similar_link] = entry
+                progress.write(json.dumps(entry) + "\n")
+                progress.flush()
+                if len(responses) % 100 == 0:
+                    print(f"{len(responses) / len(similar_links) * 100:.1f}% done")
+
+        headers = {"X-Xapp-Token": token}
+        connector = aiohttp.TCPConnector(limit=max_concurrency)
+        async with aiohttp.ClientSession(headers=headers, connector=connector) as session:
+            await asyncio.gather(*(worker(session) for _ in range(max_concurrency)))
+
+    return responses
+
+
+def generate_transaction_data(
+    token, input_csv, output_csv, progress_file="similar-artworks.jsonl"
+):
     """
     Generate a CSV file with transaction data including:
     - Random transaction_id
     - User ID
     - Artwork ID
     - Thumbnail Link
+    - Timestamp t_dat, the time the user's similar artworks were fetched
+
+    Every distinct `similar_link` is fetched once, concurrently, then the
+    rows are written in `t_dat` order. The fetch times are kept in the
+    progress file, so rows keep their `t_dat` over runs and rows added by a
+    later run come last. Users whose link could not be fetched are left out;
+    running again retries those links. The rows are also written to a Parquet
+    file next to `output_csv`, which incremental feature updates read.
 
     Args:
         input_csv (str): Path to the input CSV file (user-artworks.csv).
         output_csv (str): Path to the output CSV file.
+        progress_file (str): Path to the JSONL file caching the fetched links.
     """
-    try:
-        with open(input_csv, "r", encoding="utf-8") as infile, open(output_csv, "w", encoding="utf-8", newline="") as outfile:
-            reader = csv.DictReader(infile)
-            fieldnames = ["transaction_id", "user_id", "artwork_id", "thumbnail_link"]
-            
-            with open(output_csv, "w", encoding="utf-8", newline="") as outfile:
-                
-                writer = csv.DictWriter(outfile, fieldnames=fieldnames)
-                writer.writeheader()
-
-                batch = []
-                batch_size=100
-                counter = 0
-
-                for row in reader:
-                    user_id = row.get("id")
-                    similar_link = row.get("similar_link")
-                    r_artwork_id = row.get("artwork_id")
-                    r_thumbnail_link= row.get("thumbnail_link")
-
-                    if not similar_link:
-                        continue
-                    writer.writerow({
-                        "transaction_id": uuid.uuid4(),
-                        "user_id": user_id,
-                        "artwork_id": r_artwork_id,
-                        "thumbnail_link": r_thumbnail_link,
-                    })
-                    # Fetch artwork data from the API
-                    artworks = get_artwork_data(token, similar_link)
-                    # Rate limit: Wait to comply with the API's limit of 5 requests per second
-                    # time.sleep(0.2)  # 200ms pause between requests
-
-                    # Create a row for each artwork
-                    for artwork in artworks:
-                        batch.append({
-                            "transaction_id": uuid.uuid4(),
-                            "user_id": user_id,
-                            "artwork_id": artwork["id"],
-                            "thumbnail_link": artwork["thumbnail_link"]
-                        })
-                        batchlength = len(batch)
-                        if batchlength >= batch_size:
-                            writer.writerows(batch)
-                            batch = []
-                    print("Batch length " + str(batchlength))
-                    print(str((counter / 54000) * 100) + "% done")
-                    counter+=1
-
-        print(f"Transaction data written to {output_csv}.")
-
-    except Exception as e:
-        print(f"An error occurred: {e}")
+    with open(input_csv, "r", encoding="utf-8") as infile:
+        reader = csv.DictReader(infile)
+        similar_links = list(dict.fromkeys(
+            row["similar_link"] for row in reader if row.get("similar_link")
+        ))
+
+    responses = asyncio.run(
+        fetch_similar_artworks(token, similar_links, progress_file)
+    )
+
+    rows = []
+    missing = 0
+    with open(input_csv, "r", encoding="utf-8") as infile:
+        reader = csv.DictReader(infile)
+        for row in reader:
+            user_id = row.get("id")
+            similar_link = row.get("similar_link")
+
+            if not similar_link:
+                continue
+            if similar_link not in responses:
+                missing += 1
+                continue
+
+            entry = responses[similar_link]
+            rows.append({
+                "transaction_id": str(uuid.uuid4()),
+                "user_id": user_id,
+                "artwork_id": row.get("artwork_id"),
+                "thumbnail_link": row.get("thumbnail_link"),
+                "t_dat": entry["t_dat"],
+            })
+            # Create a row for each artwork
+            rows.extend(
+                {
+                    "transaction_id": str(uuid.uuid4()),
+                    "user_id": user_id,
+                    "artwork_id": artwork["id"],
+                    "thumbnail_link": artwork["thumbnail_link"],
+                    "t_dat": entry["t_dat"],
+                }
+                for artwork in entry["artworks"]
+            )
+
+    # ISO timestamps sort chronologically, the sort keeps the input order within a second.
+    rows.sort(key=lambda row: row["t_dat"])
+
+    with open(output_csv, "w", encoding="utf-8", newline="") as outfile:
+        fieldnames = ["transaction_id", "user_id", "artwork_id", "thumbnail_link", "t_dat"]
+        writer = csv.DictWriter(outfile, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    parquet_path = Path(output_csv).with_suffix(".parquet")
+    pl.DataFrame(
+        rows,
+        schema={
+            "transaction_id": pl.Utf8,
+            "user_id": pl.Utf8,
+            "artwork_id": pl.Utf8,
+            "thumbnail_link": pl.Utf8,
+            "t_dat": pl.Utf8,
+        },
+    ).with_columns(pl.col("t_dat").str.to_datetime("%Y-%m-%dT%H:%M:%S")).write_parquet(
+        parquet_path, row_group_size=PARQUET_ROW_GROUP_SIZE
+    )
+
+    if missing:
+        print(f"{missing} users without similar artworks, run again to fetch them.")
+    print(f"Transaction data written to {output_csv} and {parquet_path}.")
 
 def main():
-    try:
-        print("Authenticating...")
-        token = get_access_token()
-        print("Fetching artworks...") 
-        input_csv = "user-artworks.csv"  # Path to the input CSV file
-        output_csv = "transaction-data.csv"  # Path to the output CSV file
-        generate_transaction_data(token, input_csv, output_csv)
-        print("Artworks saved to " + output_csv)
-    except Exception as e:
-        print(f"An error occurred: {e}")
+    print("Authenticating...")
+    token = get_access_token()
+    print("Fetching artworks...")
+    input_csv = "user-artworks.csv"  # Path to the input CSV file
+    output_csv = "transaction-data.csv"  # Path to the output CSV file
+    generate_transaction_data(token, input_csv, output_csv)
+    print("Artworks saved to " + output_csv)
 
 # Usage
 if __name__ == "__main__":
@@ -0,0 +1,33 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter: allows `rate` requests per second on average
+    and bursts of up to `capacity` requests.
+
+    It is shared by the Artsy crawlers of the data generation scripts, which
+    run from the repository root with it on the path, e.g.
+    `PYTHONPATH=. python 02-generate-interactions/generate_user_likes.py`.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated_at) * self.rate
+                )
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
@@ -11,6 +11,29 @@ class UserDatasetSize(Enum):
     SMALL = "SMALL"
 
 
+class UserSamplingMethod(Enum):
+    HASH = "HASH"
+    RESERVOIR = "RESERVOIR"
+
+
+class EmbeddingEncoding(Enum):
+    FLOAT64 = "FLOAT64"
+    FLOAT32 = "FLOAT32"
+    INT8 = "INT8"
+
+
+class TowerIdMode(Enum):
+    STRING = "STRING"
+    INDEX = "INDEX"
+    HASH = "HASH"
+
+
+class DistributionStrategy(Enum):
+    NONE = "NONE"
+    MIRRORED = "MIRRORED"
+    MULTI_WORKER = "MULTI_WORKER"
+
+
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
@@ -22,10 +45,47 @@ class Settings(BaseSettings):
     # OpenAI
     OPENAI_MODEL_ID: str = "gpt-4o-mini"
     OPENAI_API_KEY: SecretStr | None = None
+    OPENAI_BATCH_DIR: Path = RECSYS_DIR.parent / "data" / "openai_batches"
+    OPENAI_BATCH_MAX_REQUESTS: int = 50_000
+    OPENAI_BATCH_MAX_BYTES: int = 200 * 1024 * 1024
+    OPENAI_BATCH_NUM_PARTITIONS: int = 8
+    OPENAI_BATCH_RESULTS_CHUNK_SIZE: int = 2_000
 
     # Feature engineering
     USER_DATA_SIZE: UserDatasetSize = UserDatasetSize.SMALL
+    USER_SAMPLING_METHOD: UserSamplingMethod = UserSamplingMethod.RESERVOIR
+    USER_SAMPLING_STRATIFY_BY: str | None = None
+    FEATURES_RAW_DATA_DIR: Path = RECSYS_DIR.parent / "data"
+    FEATURES_RAW_ARTWORKS_FILE: str = "artworks_info.parquet"
+    FEATURES_RAW_USERS_FILE: str = "updated_user_details.parquet"
+    FEATURES_RAW_TRANSACTIONS_FILE: str = "transaction-data.parquet"
+    FEATURES_OUTPUT_DIR: Path = RECSYS_DIR.parent / "data" / "features"
+    FEATURES_ID_DICTIONARY_DIR: Path = RECSYS_DIR.parent / "data" / "id_dictionaries"
+    FEATURES_ID_DICTIONARY_REMOTE_DIR: str = "Resources/id_dictionaries"
+    # Version of the users and artworks feature groups the codes are stored in.
+    FEATURES_ID_DICTIONARY_VERSION: int = 2
     FEATURES_EMBEDDING_MODEL_ID: str = "all-MiniLM-L6-v2"
+    FEATURES_EMBEDDING_BATCH_SIZE: int = 64
+    FEATURES_EMBEDDING_NUM_WORKERS: int = 0  # 0 uses every CPU.
+    FEATURES_EMBEDDING_CACHE_DIR: Path = RECSYS_DIR.parent / ".cache" / "embeddings"
+    ARTWORKS_EMBEDDING_ENCODING: EmbeddingEncoding = EmbeddingEncoding.FLOAT32
+    ARTWORKS_EMBEDDING_MIN_RECALL: float = 0.95  # Recall@10 int8 embeddings must keep.
+    INTERACTIONS_SEED: int = 27
+    INTERACTIONS_NUM_SHARDS: int = 64
+    FEATURES_WATERMARKS_PATH: Path = RECSYS_DIR.parent / ".cache" / "watermarks.json"
+    COOCCURRENCE_INDEX_DIR: Path = RECSYS_DIR.parent / "data" / "cooccurrence"
+    COOCCURRENCE_TOP_N: int = 50
+    COOCCURRENCE_MAX_ITEMS_PER_USER: int = 200
+    COOCCURRENCE_UI_FALLBACK: bool = True  # Co-liked artworks before popular ones.
+    POPULARITY_DIR: Path = RECSYS_DIR.parent / "data" / "popularity"
+    POPULARITY_HALF_LIFE_DAYS: float = 30.0
+    TRENDING_HALF_LIFE_DAYS: float = 3.0
+    POPULARITY_LATENESS_DAYS: float = 2.0  # Events this late are still folded in.
+    POPULARITY_TOP_K: int = 100
+    THUMBNAIL_PACK_DIR: Path = RECSYS_DIR.parent / "data" / "thumbnails"
+    THUMBNAIL_WIDTH: int = 200
+    THUMBNAIL_HEIGHT: int = 300
+    THUMBNAIL_DOWNLOAD_WORKERS: int = 16
 
     # Training
     TWO_TOWER_MODEL_EMBEDDING_SIZE: int = 16
@@ -35,12 +95,27 @@ class Settings(BaseSettings):
     TWO_TOWER_LEARNING_RATE: float = 0.01
     TWO_TOWER_DATASET_VALIDATON_SPLIT_SIZE: float = 0.1
     TWO_TOWER_DATASET_TEST_SPLIT_SIZE: float = 0.1
+    TWO_TOWER_DATASET_DIR: Path = RECSYS_DIR.parent / "data" / "two_tower"
+    TWO_TOWER_DATASET_FILE_ROWS: int = 100_000
+    TWO_TOWER_DATASET_STREAMING: bool = False  # Export the splits to Parquet and stream them.
+    TWO_TOWER_SHUFFLE_BUFFER_SIZE: int = 100_000
+    TWO_TOWER_ID_MODE: TowerIdMode = TowerIdMode.STRING
+    TWO_TOWER_ID_DICTIONARY_VERSION: int = 2
+    TWO_TOWER_HASH_NUM_BUCKETS: int = 2**16
+    TWO_TOWER_HASH_NUM_HASHES: int = 2
+    TWO_TOWER_EVALUATION_TOP_KS: list[int] = [10, 50, 100]
+    TWO_TOWER_EVALUATION_BLOCK_SIZE: int = 4096
+    TWO_TOWER_DISTRIBUTION_STRATEGY: DistributionStrategy = DistributionStrategy.NONE
+    TWO_TOWER_NUM_CPU_REPLICAS: int = 0  # 0 uses every CPU.
+    TWO_TOWER_CHECKPOINT_DIR: Path = RECSYS_DIR.parent / ".cache" / "two_tower_checkpoints"
 
     RANKING_DATASET_VALIDATON_SPLIT_SIZE: float = 0.1
     RANKING_LEARNING_RATE: float = 0.2
     RANKING_ITERATIONS: int = 100
     RANKING_SCALE_POS_WEIGHT: int = 10
     RANKING_EARLY_STOPPING_ROUNDS: int = 5
+    RANKING_NEGATIVES_PER_POSITIVE: int = 10
+    RANKING_NEGATIVES_POPULARITY_EXPONENT: float = 0.0  # 0 is uniform.
 
 
 settings = Settings()
@@ -1,10 +1,36 @@
-from . import artworks, users, embeddings, interaction, ranking, transactions
+import importlib
 
 __all__ = [
     "artworks",
     "users",
+    "cooccurrence",
+    "embedding_cache",
+    "embedding_codec",
+    "embedding_engine",
     "embeddings",
+    "id_dictionary",
+    "incremental",
     "interaction",
+    "negative_sampling",
+    "openai_batch",
+    "openai_batch_results",
+    "pipeline",
+    "popularity",
     "ranking",
+    "thumbnails",
     "transactions",
 ]
+
+
+def __getattr__(name: str):
+    # Submodules are imported on first use, so the spawned workers of the
+    # process pools only import the module of their entry point, not
+    # TensorFlow, Hopsworks and sentence-transformers with every other one.
+    if name in __all__:
+        return importlib.import_module(f"{__name__}.{name}")
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> list[str]:
+    return sorted(list(globals()) + __all__)
@@ -2,17 +2,24 @@ import contextlib
 import io
 import sys
 
+import numpy as np
 import polars as pl
+from loguru import logger
 from tqdm.auto import tqdm
 from sentence_transformers import SentenceTransformer
 
-def compute_features_artworks(df: pl.DataFrame) -> pl.DataFrame:
+from recsys.features.embedding_cache import EmbeddingCache
+from recsys.features.embedding_engine import SentenceEmbeddingEngine
+
+def compute_features_artworks(
+    df: pl.DataFrame | pl.LazyFrame,
+) -> pl.DataFrame | pl.LazyFrame:
     """
     Prepares the input DataFrame by creating new features and dropping specific columns.
     Parameters:
-    - df (pl.DataFrame): Input DataFrame.
+    - df (pl.DataFrame | pl.LazyFrame): Input DataFrame or LazyFrame.
     Returns:
-    - pl.DataFrame: Processed DataFrame with new features and specific columns dropped.
+    - pl.DataFrame | pl.LazyFrame: Processed frame with new features and specific columns dropped.
     """
     # Create new columns
     # df = df.with_columns(
@@ -34,7 +41,7 @@ def compute_features_artworks(df: pl.DataFrame) -> pl.DataFrame:
     # Remove  column
     df = df.rename({"id": "artwork_id"})
     columns_to_drop = ["artists_link", "genes_link", "similar_link"]
-    existing_columns = df.columns
+    existing_columns = df.collect_schema().names()
     columns_to_keep = [col for col in existing_columns if col not in columns_to_drop]
 
 
@@ -42,7 +49,11 @@ def compute_features_artworks(df: pl.DataFrame) -> pl.DataFrame:
 
 
 def generate_embeddings_for_dataframe(
-    df: pl.DataFrame, text_column: str, model: SentenceTransformer, batch_size: int = 32
+    df: pl.DataFrame,
+    text_column: str,
+    model: SentenceTransformer | SentenceEmbeddingEngine,
+    batch_size: int = 32,
+    cache: EmbeddingCache | None = None,
 ) -> pl.DataFrame:
     """
     Generate embeddings for a text column in a Polars DataFrame.
@@ -50,13 +61,49 @@ def generate_embeddings_for_dataframe(
     Args:
     df (pl.DataFrame): Input Polars DataFrame
     text_column (str): Name of the column containing text to embed
-    model (SentenceTransformer): SentenceTransformer embedding model to use
-    batch_size (int): Number of samples run at once through the embedding model
+    model (SentenceTransformer | SentenceEmbeddingEngine): Embedding model, or a multi-process engine to use
+    batch_size (int): Number of samples run at once through the embedding model (ignored by the engine)
+    cache (EmbeddingCache | None): Optional on-disk cache; only texts missing from it are encoded
 
     Returns:
-    pl.DataFrame: DataFrame with a new 'embedding' column
+    pl.DataFrame: DataFrame with a new 'embeddings' Array(Float32, dim) column
     """
+    # Create a new column with embeddings
+    texts = df[text_column].to_list()
+    embeddings = np.empty(
+        (len(texts), model.get_sentence_embedding_dimension()), dtype=np.float32
+    )
+
+    if cache is not None:
+        keys = cache.hash_texts(texts)
+        hits, cached_embeddings = cache.get(keys)
+        embeddings[hits] = cached_embeddings
+        missing = np.flatnonzero(~hits)
+        logger.info(f"Found {hits.sum()}/{len(texts)} embeddings in the cache.")
+    else:
+        missing = np.arange(len(texts))
+
+    if isinstance(model, SentenceEmbeddingEngine):
+        embeddings[missing] = model.encode([texts[j] for j in missing])
+    else:
+        _encode_in_batches(model, texts, missing, embeddings, batch_size)
+
+    if cache is not None and len(missing) > 0:
+        cache.put(keys[missing], embeddings[missing])
+
+    # Wrap the contiguous buffer as a fixed-width Array column without copying.
+    df_with_embeddings = df.with_columns(pl.Series("embeddings", embeddings))
+
+    return df_with_embeddings
+
 
+def _encode_in_batches(
+    model: SentenceTransformer,
+    texts: list[str],
+    indices: np.ndarray,
+    embeddings: np.ndarray,
+    batch_size: int,
+) -> None:
     @contextlib.contextmanager
     def suppress_stdout():
         new_stdout = io.StringIO()
@@ -67,24 +114,16 @@ def generate_embeddings_for_dataframe(
         finally:
             sys.stdout = old_stdout
 
-    total_rows = len(df)
-    pbar = tqdm(total=total_rows, desc="Generating embeddings")
+    pbar = tqdm(total=len(indices), desc="Generating embeddings")
 
-    # Create a new column with embeddings
-    texts = df[text_column].to_list()
-
-    all_embeddings = []
-    for i in range(0, len(texts), batch_size):
-        batch_texts = texts[i : i + batch_size]
+    for i in range(0, len(indices), batch_size):
+        batch_idx = indices[i : i + batch_size]
+        batch_texts = [texts[j] for j in batch_idx]
         with suppress_stdout():
             batch_embeddings = model.encode(
                 batch_texts, device=model.device, show_progress_bar=False
             )
-        all_embeddings.extend(batch_embeddings.tolist())
+        embeddings[batch_idx] = batch_embeddings
         pbar.update(len(batch_texts))
 
-    df_with_embeddings = df.with_columns(embeddings=pl.Series(all_embeddings))
-
     pbar.close()
-
-    return df_with_embeddings
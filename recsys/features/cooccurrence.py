@@ -0,0 +1,245 @@
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+from loguru import logger
+
+from recsys.config import settings
+from recsys.features.id_dictionary import IdDictionary
+
+
+class CooccurrenceIndex:
+    """
+    Top-N item-item neighbours stored as a CSR matrix.
+
+    The neighbours of the artwork with code `i` are
+    `neighbors[offsets[i]:offsets[i + 1]]`, sorted by decreasing score. The
+    arrays are plain `.npy` files, so a saved index is memory mapped on load
+    and a lookup is two slices.
+    """
+
+    def __init__(
+        self,
+        offsets: np.ndarray,
+        neighbors: np.ndarray,
+        scores: np.ndarray,
+        artwork_ids: np.ndarray,
+    ) -> None:
+        self._offsets = offsets
+        self._neighbors = neighbors
+        self._scores = scores
+        self._artwork_ids = artwork_ids
+        self._codes = {artwork_id: code for code, artwork_id in enumerate(artwork_ids.tolist())}
+
+    def __len__(self) -> int:
+        return self._offsets.size - 1
+
+    def neighbors(self, artwork_id: str, k: int | None = None) -> list[tuple[str, float]]:
+        """
+        Return up to `k` most co-liked artworks of an artwork with their scores.
+        """
+        code = self._codes.get(artwork_id)
+        if code is None:
+            return []
+
+        neighbors, scores = self.neighbors_by_code(code, k)
+
+        return list(zip(self._artwork_ids[neighbors].tolist(), scores.tolist()))
+
+    def neighbors_by_code(
+        self, code: int, k: int | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        start, end = self._offsets[code], self._offsets[code + 1]
+        if k is not None:
+            end = min(end, start + k)
+
+        return self._neighbors[start:end], self._scores[start:end]
+
+    def recommend(
+        self, artwork_ids: list[str], k: int = 10
+    ) -> list[tuple[str, float]]:
+        """
+        Recommend artworks for a history of liked artworks.
+
+        The neighbour scores of every artwork in the history are summed and
+        artworks already in the history are left out.
+
+        Parameters:
+        - artwork_ids (list[str]): Artworks the user interacted with.
+        - k (int): Number of recommendations.
+
+        Returns:
+        - list[tuple[str, float]]: Recommended artwork ids and scores, best first.
+        """
+        codes = [self._codes[a] for a in artwork_ids if a in self._codes]
+        if not codes:
+            return []
+
+        slices = [self.neighbors_by_code(code) for code in codes]
+        neighbors = np.concatenate([neighbors for neighbors, _ in slices])
+        scores = np.concatenate([scores for _, scores in slices])
+
+        order = np.argsort(neighbors, kind="stable")
+        neighbors, scores = neighbors[order], scores[order]
+        starts = _run_starts(neighbors)
+        candidates = neighbors[starts]
+        totals = np.add.reduceat(scores, starts) if starts.size else scores[:0]
+
+        keep = ~np.isin(candidates, codes)
+        candidates, totals = candidates[keep], totals[keep]
+        top = np.argsort(-totals, kind="stable")[:k]
+
+        return list(zip(self._artwork_ids[candidates[top]].tolist(), totals[top].tolist()))
+
+    def save(self, directory: Path = settings.COOCCURRENCE_INDEX_DIR) -> Path:
+        """
+        Write the index to `directory`, replacing a previous index only once it is complete.
+        """
+        directory = Path(directory)
+        tmp_dir = directory.with_name(directory.name + ".tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+
+        np.save(tmp_dir / "offsets.npy", self._offsets)
+        np.save(tmp_dir / "neighbors.npy", self._neighbors)
+        np.save(tmp_dir / "scores.npy", self._scores)
+        np.save(tmp_dir / "artwork_ids.npy", self._artwork_ids)
+        (tmp_dir / "meta.json").write_text(
+            json.dumps({"num_artworks": len(self), "num_entries": int(self._neighbors.size)})
+        )
+
+        old_dir = directory.with_name(directory.name + ".old")
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if directory.exists():
+            os.replace(directory, old_dir)
+        os.replace(tmp_dir, directory)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+        return directory
+
+    @classmethod
+    def load(
+        cls, directory: Path = settings.COOCCURRENCE_INDEX_DIR
+    ) -> "CooccurrenceIndex":
+        directory = Path(directory)
+
+        return cls(
+            offsets=np.load(directory / "offsets.npy", mmap_mode="r"),
+            neighbors=np.load(directory / "neighbors.npy", mmap_mode="r"),
+            scores=np.load(directory / "scores.npy", mmap_mode="r"),
+            artwork_ids=np.load(directory / "artwork_ids.npy"),
+        )
+
+
+def build_cooccurrence_index(
+    trans_df: pl.DataFrame,
+    artworks: IdDictionary | None = None,
+    top_n: int = settings.COOCCURRENCE_TOP_N,
+    max_items_per_user: int = settings.COOCCURRENCE_MAX_ITEMS_PER_USER,
+) -> CooccurrenceIndex:
+    """
+    Build the top-N item-item co-occurrence index of liked artworks.
+
+    Two artworks co-occur when the same user liked both. Pairs are counted
+    over every user's distinct artworks and scored with the cosine similarity
+    of the binary user vectors, `count(a, b) / sqrt(likes(a) * likes(b))`.
+    Users with more than `max_items_per_user` likes only contribute their most
+    recent ones, which bounds the quadratic number of pairs.
+
+    Parameters:
+    - trans_df (pl.DataFrame): Transactions with 'user_id', 'artwork_id' and optionally 't_dat'.
+    - artworks (IdDictionary | None): Dictionary giving the row of every artwork. Defaults to the liked artworks.
+    - top_n (int): Number of neighbours kept per artwork.
+    - max_items_per_user (int): Maximum number of likes of a user taken into account.
+
+    Returns:
+    - CooccurrenceIndex: In-memory index.
+    """
+    if artworks is None:
+        artworks = IdDictionary("artwork_id", trans_df["artwork_id"].unique().sort())
+    num_items = len(artworks)
+
+    if "t_dat" in trans_df.columns:
+        trans_df = trans_df.sort("t_dat", descending=True)
+    likes = (
+        trans_df.select("user_id", artworks.encode("artwork_id"))
+        .drop_nulls()
+        .unique(subset=["user_id", "artwork_idx"], maintain_order=True)
+        .group_by("user_id", maintain_order=True)
+        .head(max_items_per_user)
+        .sort("user_id", maintain_order=True)
+    )
+    items = likes["artwork_idx"].to_numpy().astype(np.int64)
+    basket_sizes = (
+        likes.group_by("user_id", maintain_order=True)
+        .len()["len"]
+        .to_numpy()
+        .astype(np.int64)
+    )
+
+    left, right = _basket_pairs(items, basket_sizes)
+    keys = np.sort(np.minimum(left, right) * num_items + np.maximum(left, right))
+    starts = _run_starts(keys)
+    counts = np.diff(np.r_[starts, keys.size])
+    first, second = np.divmod(keys[starts], num_items)
+
+    popularity = np.bincount(items, minlength=num_items).astype(np.float64)
+    pair_scores = counts / np.sqrt(popularity[first] * popularity[second])
+
+    # Every pair is a neighbour of both of its artworks.
+    rows = np.concatenate([first, second])
+    cols = np.concatenate([second, first])
+    scores = np.concatenate([pair_scores, pair_scores])
+
+    order = np.lexsort((cols, -scores, rows))
+    rows, cols, scores = rows[order], cols[order], scores[order]
+    row_starts = np.searchsorted(rows, np.arange(num_items))
+    rank = np.arange(rows.size) - row_starts[rows]
+    keep = rank < top_n
+    rows, cols, scores = rows[keep], cols[keep], scores[keep]
+
+    offsets = np.zeros(num_items + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=num_items), out=offsets[1:])
+
+    logger.info(
+        f"Built co-occurrence index over {num_items} artworks and "
+        f"{basket_sizes.size} users: {keys.size} pairs, {cols.size} neighbours kept."
+    )
+
+    return CooccurrenceIndex(
+        offsets=offsets,
+        neighbors=cols.astype(np.int32),
+        scores=scores.astype(np.float32),
+        artwork_ids=artworks.ids.to_numpy().astype(str),
+    )
+
+
+def _basket_pairs(
+    items: np.ndarray, basket_sizes: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Return every unordered pair of items within the same basket. Baskets are consecutive runs of `items`.
+    """
+    basket_ends = np.repeat(np.cumsum(basket_sizes), basket_sizes)
+    positions = np.arange(items.size)
+
+    # Every item pairs with the items after it in its basket.
+    num_partners = basket_ends - positions - 1
+    total = int(num_partners.sum())
+    pair_starts = np.cumsum(num_partners) - num_partners
+    left_positions = np.repeat(positions, num_partners)
+    right_positions = (
+        left_positions + 1 + np.arange(total) - np.repeat(pair_starts, num_partners)
+    )
+
+    return items[left_positions], items[right_positions]
+
+
+def _run_starts(values: np.ndarray) -> np.ndarray:
+    """
+    Return the start positions of the runs of equal values of a sorted array.
+    """
+    return np.flatnonzero(np.diff(values, prepend=-1) != 0)
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+import re
+import time
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+
+from recsys.config import settings
+
+_KEY_DTYPE = "S32"
+
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed cache of text embeddings for one embedding model.
+
+    Vectors are appended to a float32 matrix that is read through a memory map.
+    A sorted index maps the sha256 of every text to its row in the matrix and
+    to the time it was last used. Every model gets its own directory, so
+    entries are keyed by `(model_id, sha256(text))`. The cache assumes a single
+    writer at a time.
+    """
+
+    def __init__(
+        self,
+        model_id: str,
+        dim: int,
+        cache_dir: Path = settings.FEATURES_EMBEDDING_CACHE_DIR,
+    ) -> None:
+        self._model_id = model_id
+        self._dim = dim
+        self._dir = Path(cache_dir) / re.sub(r"[^A-Za-z0-9_.-]", "_", model_id)
+        self._dir.mkdir(parents=True, exist_ok=True)
+
+        self._vectors_path = self._dir / "vectors.f32"
+        self._index_path = self._dir / "index.npz"
+        self._meta_path = self._dir / "meta.json"
+
+        self._load()
+
+    def __len__(self) -> int:
+        return self._keys.size
+
+    @staticmethod
+    def hash_texts(texts: list[str]) -> np.ndarray:
+        """
+        Return the sha256 digest of every text as a fixed-width bytes array.
+        """
+        return np.array(
+            [hashlib.sha256(text.encode("utf-8")).digest() for text in texts],
+            dtype=_KEY_DTYPE,
+        )
+
+    def get(self, keys: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Look up embeddings by key and mark the hits as used.
+
+        Parameters:
+        - keys (np.ndarray): Keys returned by `hash_texts`.
+
+        Returns:
+        - tuple[np.ndarray, np.ndarray]: Hit mask over `keys` and the float32 embeddings of the hits, in order.
+        """
+        positions, hits = self._find(keys)
+        if not hits.any():
+            return hits, np.empty((0, self._dim), dtype=np.float32)
+
+        self._last_used[positions[hits]] = int(time.time())
+        self._save_index()
+
+        vectors = np.memmap(
+            self._vectors_path,
+            dtype=np.float32,
+            mode="r",
+            shape=(self._num_rows, self._dim),
+        )
+
+        return hits, np.asarray(vectors[self._rows[positions[hits]]])
+
+    def put(self, keys: np.ndarray, vectors: np.ndarray) -> None:
+        """
+        Append new embeddings to the cache. Keys already present are skipped.
+
+        Parameters:
+        - keys (np.ndarray): Keys returned by `hash_texts`.
+        - vectors (np.ndarray): Embeddings of shape `(len(keys), dim)`.
+        """
+        keys = np.asarray(keys, dtype=_KEY_DTYPE)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+
+        _, present = self._find(keys)
+        keys, first = np.unique(keys[~present], return_index=True)
+        vectors = vectors[~present][first]
+        if keys.size == 0:
+            return
+
+        with open(self._vectors_path, "ab") as f:
+            f.write(vectors.tobytes())
+
+        rows = np.arange(self._num_rows, self._num_rows + keys.size, dtype=np.int64)
+        self._num_rows += keys.size
+        self._set_index(
+            np.concatenate([self._keys, keys]),
+            np.concatenate([self._rows, rows]),
+            np.concatenate(
+                [self._last_used, np.full(keys.size, int(time.time()), dtype=np.int64)]
+            ),
+        )
+        self._save_index()
+
+    def evict(self, max_age_seconds: float) -> int:
+        """
+        Drop entries not used for `max_age_seconds` and compact the vectors file.
+
+        Parameters:
+        - max_age_seconds (float): Maximum time since an entry was last used.
+
+        Returns:
+        - int: Number of evicted entries.
+        """
+        keep = self._last_used >= time.time() - max_age_seconds
+        num_evicted = int((~keep).sum())
+        if num_evicted == 0:
+            return 0
+
+        vectors = np.memmap(
+            self._vectors_path,
+            dtype=np.float32,
+            mode="r",
+            shape=(self._num_rows, self._dim),
+        )
+        kept_vectors = np.asarray(vectors[self._rows[keep]])
+        del vectors
+
+        tmp_path = self._vectors_path.with_suffix(".tmp")
+        kept_vectors.tofile(tmp_path)
+        os.replace(tmp_path, self._vectors_path)
+
+        self._num_rows = kept_vectors.shape[0]
+        self._set_index(
+            self._keys[keep],
+            np.arange(self._num_rows, dtype=np.int64),
+            self._last_used[keep],
+        )
+        self._save_index()
+
+        logger.info(f"Evicted {num_evicted} stale embeddings from {self._dir}.")
+
+        return num_evicted
+
+    def _find(self, keys: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        keys = np.asarray(keys, dtype=_KEY_DTYPE)
+        if self._keys.size == 0:
+            return np.zeros(keys.size, dtype=np.int64), np.zeros(keys.size, dtype=bool)
+
+        positions = np.minimum(np.searchsorted(self._keys, keys), self._keys.size - 1)
+
+        return positions, self._keys[positions] == keys
+
+    def _set_index(
+        self, keys: np.ndarray, rows: np.ndarray, last_used: np.ndarray
+    ) -> None:
+        order = np.argsort(keys)
+        self._keys = keys[order]
+        self._rows = rows[order]
+        self._last_used = last_used[order]
+
+    def _load(self) -> None:
+        meta = {"model_id": self._model_id, "dim": self._dim}
+        if self._meta_path.exists() and json.loads(self._meta_path.read_text()) != meta:
+            logger.warning(
+                f"Embedding cache at {self._dir} was built with different settings. Resetting it."
+            )
+            self._index_path.unlink(missing_ok=True)
+            self._vectors_path.unlink(missing_ok=True)
+        self._meta_path.write_text(json.dumps(meta))
+
+        if self._index_path.exists():
+            index = np.load(self._index_path)
+            self._keys = index["keys"]
+            self._rows = index["rows"]
+            self._last_used = index["last_used"]
+        else:
+            self._keys = np.empty(0, dtype=_KEY_DTYPE)
+            self._rows = np.empty(0, dtype=np.int64)
+            self._last_used = np.empty(0, dtype=np.int64)
+
+        vectors_size = (
+            self._vectors_path.stat().st_size if self._vectors_path.exists() else 0
+        )
+        self._num_rows = vectors_size // (self._dim * np.dtype(np.float32).itemsize)
+
+    def _save_index(self) -> None:
+        # Write to a temporary file first so a crash never leaves a torn index.
+        tmp_path = self._dir / "index.tmp.npz"
+        np.savez(
+            tmp_path, keys=self._keys, rows=self._rows, last_used=self._last_used
+        )
+        os.replace(tmp_path, self._index_path)
@@ -0,0 +1,129 @@
+import numpy as np
+import polars as pl
+
+from recsys.config import EmbeddingEncoding
+
+SCALE_COLUMN_SUFFIX = "_scale"
+
+
+def encode_embeddings(
+    df: pl.DataFrame, encoding: EmbeddingEncoding, column: str = "embeddings"
+) -> pl.DataFrame:
+    """
+    Encode an embedding column for storage in a feature group.
+
+    FLOAT64 and FLOAT32 store the vectors as lists of that type. INT8 stores
+    symmetric scalar-quantized vectors plus a float32 `<column>_scale` column
+    holding the per-vector scale.
+
+    Parameters:
+    - df (pl.DataFrame): DataFrame with an Array or List embedding column.
+    - encoding (EmbeddingEncoding): Storage encoding.
+    - column (str): Name of the embedding column.
+
+    Returns:
+    - pl.DataFrame: DataFrame with the encoded embedding column.
+    """
+    if encoding == EmbeddingEncoding.FLOAT64:
+        return df.with_columns(pl.col(column).cast(pl.List(pl.Float64)))
+    if encoding == EmbeddingEncoding.FLOAT32:
+        return df.with_columns(pl.col(column).cast(pl.List(pl.Float32)))
+
+    codes, scales = quantize_int8(embeddings_to_numpy(df[column]))
+
+    return df.with_columns(
+        pl.Series(column, codes).cast(pl.List(pl.Int8)),
+        pl.Series(column + SCALE_COLUMN_SUFFIX, scales),
+    )
+
+
+def decode_embeddings(
+    df: pl.DataFrame, encoding: EmbeddingEncoding, column: str = "embeddings"
+) -> pl.DataFrame:
+    """
+    Decode an embedding column read from a feature group into an Array(Float32, dim) column.
+
+    Parameters:
+    - df (pl.DataFrame): DataFrame read from the feature group.
+    - encoding (EmbeddingEncoding): Encoding the column was stored with.
+    - column (str): Name of the embedding column.
+
+    Returns:
+    - pl.DataFrame: DataFrame with float32 embeddings and without the scale column.
+    """
+    embeddings = embeddings_to_numpy(df[column])
+    if encoding == EmbeddingEncoding.INT8:
+        scale_column = column + SCALE_COLUMN_SUFFIX
+        embeddings = dequantize_int8(embeddings, df[scale_column].to_numpy())
+        df = df.drop(scale_column)
+
+    return df.with_columns(pl.Series(column, embeddings.astype(np.float32, copy=False)))
+
+
+def quantize_int8(embeddings: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Quantize every vector to int8 with its own symmetric scale `max(|x|) / 127`.
+    """
+    scales = np.abs(embeddings).max(axis=1) / 127.0
+    scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+    codes = np.clip(np.rint(embeddings / scales[:, None]), -127, 127).astype(np.int8)
+
+    return codes, scales
+
+
+def dequantize_int8(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    return codes.astype(np.float32) * scales[:, None].astype(np.float32)
+
+
+def embeddings_to_numpy(embeddings: pl.Series) -> np.ndarray:
+    """
+    Return an Array or List embedding column as a 2D NumPy matrix.
+    """
+    if isinstance(embeddings.dtype, pl.List):
+        width = embeddings.list.len().max() or 0
+        embeddings = embeddings.list.to_array(width)
+
+    return embeddings.to_numpy()
+
+
+def recall_at_k(
+    embeddings: np.ndarray,
+    encoding: EmbeddingEncoding,
+    k: int = 10,
+    num_queries: int = 1000,
+    seed: int = 0,
+) -> float:
+    """
+    Measure how well an encoding preserves exact inner-product nearest neighbours.
+
+    A sample of the vectors is used as queries against the full catalog, once
+    with the original and once with the encoded-then-decoded vectors.
+
+    Parameters:
+    - embeddings (np.ndarray): Original embeddings of shape `(n, dim)`.
+    - encoding (EmbeddingEncoding): Encoding to evaluate.
+    - k (int): Number of neighbours compared per query.
+    - num_queries (int): Number of sampled queries.
+    - seed (int): Seed of the query sample.
+
+    Returns:
+    - float: Mean fraction of the original top-k found in the top-k of the encoded vectors.
+    """
+    embeddings = embeddings.astype(np.float32, copy=False)
+    if encoding == EmbeddingEncoding.INT8:
+        decoded = dequantize_int8(*quantize_int8(embeddings))
+    else:
+        decoded = embeddings
+
+    k = min(k, embeddings.shape[0])
+    rng = np.random.default_rng(seed)
+    query_idx = rng.choice(
+        embeddings.shape[0], size=min(num_queries, embeddings.shape[0]), replace=False
+    )
+    queries = embeddings[query_idx]
+
+    exact = np.argpartition(-(queries @ embeddings.T), k - 1, axis=1)[:, :k]
+    approx = np.argpartition(-(queries @ decoded.T), k - 1, axis=1)[:, :k]
+    hits = (exact[:, :, None] == approx[:, None, :]).any(axis=2).sum(axis=1)
+
+    return float(hits.mean() / k)
@@ -0,0 +1,176 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+
+import numpy as np
+import torch
+from loguru import logger
+from sentence_transformers import SentenceTransformer
+from tqdm.auto import tqdm
+from transformers import AutoTokenizer
+
+from recsys.config import settings
+
+# Model replica of the current worker process, loaded once by `_init_worker`.
+_worker_model = None
+
+
+@dataclass
+class ModelInfo:
+    dimension: int
+    max_seq_length: int
+    tokenizer_path: str
+
+
+@dataclass
+class EmbeddingMetrics:
+    num_texts: int
+    elapsed_seconds: float
+    texts_per_second: float
+    padding_ratio: float
+
+
+class SentenceEmbeddingEngine:
+    """
+    CPU embedding engine that runs one SentenceTransformer replica per worker process.
+
+    Texts are sorted by token length and cut into batches of similar length
+    to minimise padding. Batches are spread over a process pool and every
+    result is written back to its original position as soon as it arrives.
+    The models only live in the workers, the engine itself loads the
+    tokenizer alone. The pool is started on first use and kept until
+    `close()`, or the end of a `with` block.
+    """
+
+    def __init__(
+        self,
+        model_id: str = settings.FEATURES_EMBEDDING_MODEL_ID,
+        num_workers: int = settings.FEATURES_EMBEDDING_NUM_WORKERS,
+        batch_size: int = settings.FEATURES_EMBEDDING_BATCH_SIZE,
+    ) -> None:
+        self._model_id = model_id
+        self._num_workers = num_workers or os.cpu_count() or 1
+        self._batch_size = batch_size
+        self._executor: ProcessPoolExecutor | None = None
+        self._model_info: ModelInfo | None = None
+        self._tokenizer = None
+        self.last_metrics: EmbeddingMetrics | None = None
+
+    def __enter__(self) -> "SentenceEmbeddingEngine":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Stop the worker processes, the next call starts them again.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self._get_model_info().dimension
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        """
+        Embed texts on the worker pool.
+
+        Parameters:
+        - texts (list[str]): Texts to embed.
+
+        Returns:
+        - np.ndarray: float32 embeddings of shape `(len(texts), dim)`, in the order of `texts`.
+        """
+        start = time.perf_counter()
+        embeddings = np.empty(
+            (len(texts), self.get_sentence_embedding_dimension()), dtype=np.float32
+        )
+        if not texts:
+            return embeddings
+
+        token_lengths = self._token_lengths(texts)
+        batches = np.array_split(
+            np.argsort(token_lengths, kind="stable"),
+            range(self._batch_size, len(texts), self._batch_size),
+        )
+
+        executor = self._get_executor()
+        futures = {
+            executor.submit(_encode_batch, [texts[i] for i in batch]): batch
+            for batch in batches
+        }
+        with tqdm(total=len(texts), desc="Generating embeddings") as pbar:
+            for future in as_completed(futures):
+                batch = futures[future]
+                embeddings[batch] = future.result()
+                pbar.update(len(batch))
+
+        elapsed = time.perf_counter() - start
+        padded_tokens = sum(token_lengths[batch].max() * len(batch) for batch in batches)
+        self.last_metrics = EmbeddingMetrics(
+            num_texts=len(texts),
+            elapsed_seconds=elapsed,
+            texts_per_second=len(texts) / elapsed,
+            padding_ratio=1 - token_lengths.sum() / padded_tokens,
+        )
+        logger.info(
+            f"Embedded {len(texts)} texts with {self._num_workers} workers: "
+            f"{self.last_metrics.texts_per_second:.1f} texts/sec, "
+            f"padding ratio {self.last_metrics.padding_ratio:.3f}."
+        )
+
+        return embeddings
+
+    def _token_lengths(self, texts: list[str]) -> np.ndarray:
+        model_info = self._get_model_info()
+        if self._tokenizer is None:
+            # The files the workers loaded, the model is not downloaded again.
+            self._tokenizer = AutoTokenizer.from_pretrained(model_info.tokenizer_path)
+        input_ids = self._tokenizer(
+            texts, truncation=True, max_length=model_info.max_seq_length
+        )["input_ids"]
+
+        return np.array([len(ids) for ids in input_ids], dtype=np.int64)
+
+    def _get_model_info(self) -> ModelInfo:
+        if self._model_info is None:
+            self._model_info = self._get_executor().submit(_get_model_info).result()
+
+        return self._model_info
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            threads_per_worker = max(1, (os.cpu_count() or 1) // self._num_workers)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._num_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self._model_id, threads_per_worker),
+            )
+
+        return self._executor
+
+
+def _init_worker(model_id: str, num_threads: int) -> None:
+    global _worker_model
+
+    torch.set_num_threads(num_threads)
+    _worker_model = SentenceTransformer(model_id, device="cpu")
+
+
+def _get_model_info() -> ModelInfo:
+    return ModelInfo(
+        dimension=_worker_model.get_sentence_embedding_dimension(),
+        max_seq_length=_worker_model.max_seq_length,
+        tokenizer_path=_worker_model.tokenizer.name_or_path,
+    )
+
+
+def _encode_batch(texts: list[str]) -> np.ndarray:
+    return _worker_model.encode(
+        texts, batch_size=len(texts), show_progress_bar=False, convert_to_numpy=True
+    ).astype(np.float32, copy=False)
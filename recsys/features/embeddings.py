@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 import tensorflow as tf
 
@@ -12,23 +13,29 @@ def preprocess(train_df: pd.DataFrame, candidate_features: list) -> pd.DataFrame
     return item_df
 
 
-def embed(df: pd.DataFrame, candidate_model) -> pd.DataFrame:
+def embed(df: pd.DataFrame, candidate_model, batch_size: int = 2048) -> pd.DataFrame:
     ds = tf.data.Dataset.from_tensor_slices({col: df[col] for col in df})
 
-    candidate_embeddings = ds.batch(2048).map(
-        lambda x: (x["artwork_id"], candidate_model(x))
-    )
-
-    all_artwork_ids = tf.concat([batch[0] for batch in candidate_embeddings], axis=0)
-    all_embeddings = tf.concat([batch[1] for batch in candidate_embeddings], axis=0)
-
-    all_artwork_ids = all_artwork_ids.numpy().astype(str).tolist()
-    all_embeddings = all_embeddings.numpy().tolist()
-
+    # Write every batch straight into one preallocated float32 buffer.
+    all_embeddings = None
+    offset = 0
+    for batch in ds.batch(batch_size):
+        batch_embeddings = candidate_model(batch).numpy()
+        if all_embeddings is None:
+            all_embeddings = np.empty(
+                (len(df), batch_embeddings.shape[1]), dtype=np.float32
+            )
+        all_embeddings[offset : offset + len(batch_embeddings)] = batch_embeddings
+        offset += len(batch_embeddings)
+
+    if all_embeddings is None:
+        all_embeddings = np.empty((0, 0), dtype=np.float32)
+
+    # The candidate embeddings store `array<double>`, every row is a view of one float64 buffer.
     embeddings_df = pd.DataFrame(
         {
-            "artwork_id": all_artwork_ids,
-            "embeddings": all_embeddings,
+            "artwork_id": df["artwork_id"].astype(str).to_numpy(),
+            "embeddings": list(all_embeddings.astype(np.float64)),
         }
     )
 
@@ -0,0 +1,305 @@
+import os
+from pathlib import Path
+
+import polars as pl
+from loguru import logger
+
+from recsys.config import settings
+
+CODE_DTYPE = pl.Int32
+
+# Id column -> column holding its dense integer code.
+CODE_COLUMNS = {"user_id": "user_idx", "artwork_id": "artwork_idx"}
+
+
+class IdDictionary:
+    """
+    Append-only dictionary from string ids to dense int32 codes.
+
+    Codes are positions in insertion order, so a code never changes once it
+    was assigned: extending the dictionary with new ids only appends codes.
+    Dictionaries are saved next to each other as `<name>_v<version>.parquet`,
+    where `version` is the version of the feature groups the codes are
+    stored in, together with a `<name>_v<version>.txt` vocabulary file of
+    one id per line, whose line numbers are the codes. The saved files are
+    shared through the Hopsworks datasets API with `upload_id_dictionaries`
+    and `download_id_dictionaries`, so every run extends the same codes.
+    """
+
+    def __init__(self, name: str, ids: pl.Series | None = None) -> None:
+        self.name = name
+        self._ids = (
+            pl.Series("id", [], dtype=pl.Utf8)
+            if ids is None
+            else ids.cast(pl.Utf8).rename("id")
+        )
+        if self._ids.is_duplicated().any():
+            raise ValueError(f"Ids of the '{name}' dictionary must be unique.")
+
+    def __len__(self) -> int:
+        return self._ids.len()
+
+    @property
+    def ids(self) -> pl.Series:
+        return self._ids
+
+    def extend(self, ids: pl.Series) -> "IdDictionary":
+        """
+        Return a dictionary with the ids not seen yet appended, in sorted order.
+        """
+        ids = ids.cast(pl.Utf8).drop_nulls().unique()
+        new_ids = ids.filter(~ids.is_in(self._ids)).sort()
+        if new_ids.len() > 0:
+            logger.info(f"Adding {new_ids.len()} ids to the '{self.name}' dictionary.")
+
+        return IdDictionary(self.name, pl.concat([self._ids, new_ids]))
+
+    def encode(self, column: str, alias: str | None = None) -> pl.Expr:
+        """
+        Expression mapping the ids in `column` to their int32 codes. Unknown ids map to null.
+
+        Parameters:
+        - column (str): Column holding the string ids.
+        - alias (str | None): Name of the output column. Defaults to `CODE_COLUMNS[column]`.
+
+        Returns:
+        - pl.Expr: Int32 codes.
+        """
+        return (
+            pl.col(column)
+            .cast(pl.Utf8)
+            .replace_strict(
+                self._ids, self._codes(), default=None, return_dtype=CODE_DTYPE
+            )
+            .alias(alias or CODE_COLUMNS.get(column, column))
+        )
+
+    def decode(self, column: str, alias: str | None = None) -> pl.Expr:
+        """
+        Expression mapping the int32 codes in `column` back to their string ids.
+        """
+        return (
+            pl.col(column)
+            .replace_strict(
+                self._codes(), self._ids, default=None, return_dtype=pl.Utf8
+            )
+            .alias(alias or column)
+        )
+
+    def to_frame(self, column: str | None = None) -> pl.DataFrame:
+        """
+        Return the dictionary as a frame of ids and their int32 codes, to decode codes with a join.
+
+        Parameters:
+        - column (str | None): Name of the id column. Defaults to the dictionary name.
+
+        Returns:
+        - pl.DataFrame: Id column and its `CODE_COLUMNS` code column, in code order.
+        """
+        column = column or self.name
+
+        return pl.DataFrame(
+            [
+                self._codes().alias(CODE_COLUMNS.get(column, f"{column}_idx")),
+                self._ids.alias(column),
+            ]
+        )
+
+    def _codes(self) -> pl.Series:
+        return pl.int_range(0, len(self), dtype=CODE_DTYPE, eager=True)
+
+    def save(
+        self,
+        version: int = settings.FEATURES_ID_DICTIONARY_VERSION,
+        directory: Path = settings.FEATURES_ID_DICTIONARY_DIR,
+    ) -> Path:
+        path = _dictionary_path(self.name, version, directory)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temporary file first so a crash never leaves a torn dictionary.
+        tmp_path = path.with_suffix(".tmp")
+        self._ids.to_frame().write_parquet(tmp_path)
+        os.replace(tmp_path, path)
+
+        self.write_vocabulary(vocabulary_path(self.name, version, directory))
+
+        return path
+
+    def write_vocabulary(self, path: Path) -> Path:
+        """
+        Write the ids one per line, the format of `tf.lookup.TextFileInitializer`.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for id_ in self._ids:
+                f.write(id_ + "\n")
+        os.replace(tmp_path, path)
+
+        return path
+
+    @classmethod
+    def load(
+        cls,
+        name: str,
+        version: int = settings.FEATURES_ID_DICTIONARY_VERSION,
+        directory: Path = settings.FEATURES_ID_DICTIONARY_DIR,
+    ) -> "IdDictionary":
+        """
+        Load a saved dictionary, or return an empty one if it was never saved.
+        """
+        path = _dictionary_path(name, version, directory)
+        if not path.exists():
+            return cls(name)
+
+        return cls(name, pl.read_parquet(path)["id"])
+
+
+def update_id_dictionaries(
+    user_ids: pl.Series,
+    artwork_ids: pl.Series,
+    version: int = settings.FEATURES_ID_DICTIONARY_VERSION,
+    directory: Path = settings.FEATURES_ID_DICTIONARY_DIR,
+    dataset_api=None,
+) -> dict[str, IdDictionary]:
+    """
+    Extend the saved user and artwork dictionaries with new ids and save them.
+
+    With a `dataset_api`, the dictionaries stored in Hopsworks are downloaded
+    first and the extended ones uploaded back, so runs on machines that do
+    not share `directory` keep extending the same codes.
+
+    Parameters:
+    - user_ids (pl.Series): User ids to encode.
+    - artwork_ids (pl.Series): Artwork ids to encode.
+    - version (int): Version of the feature groups the codes are stored in.
+    - directory (Path): Directory of the saved dictionaries.
+    - dataset_api: Hopsworks datasets API the dictionaries are shared through. None keeps them local.
+
+    Returns:
+    - dict[str, IdDictionary]: Dictionaries keyed by id column, 'user_id' and 'artwork_id'.
+    """
+    if dataset_api is not None:
+        download_id_dictionaries(dataset_api, version, directory)
+
+    dictionaries = {}
+    for column, ids in [("user_id", user_ids), ("artwork_id", artwork_ids)]:
+        dictionary = IdDictionary.load(column, version, directory).extend(ids)
+        dictionary.save(version, directory)
+        dictionaries[column] = dictionary
+
+    if dataset_api is not None:
+        upload_id_dictionaries(dataset_api, version, directory)
+
+    return dictionaries
+
+
+def load_id_dictionaries(
+    version: int = settings.FEATURES_ID_DICTIONARY_VERSION,
+    directory: Path = settings.FEATURES_ID_DICTIONARY_DIR,
+    dataset_api=None,
+) -> dict[str, IdDictionary]:
+    """
+    Load the saved user and artwork dictionaries, keyed by id column.
+
+    With a `dataset_api`, the dictionaries stored in Hopsworks are downloaded first.
+    """
+    if dataset_api is not None:
+        download_id_dictionaries(dataset_api, version, directory)
+
+    return {
+        column: IdDictionary.load(column, version, directory) for column in CODE_COLUMNS
+    }
+
+
+def upload_id_dictionaries(
+    dataset_api,
+    version: int = settings.FEATURES_ID_DICTIONARY_VERSION,
+    directory: Path = settings.FEATURES_ID_DICTIONARY_DIR,
+    remote_dir: str = settings.FEATURES_ID_DICTIONARY_REMOTE_DIR,
+) -> None:
+    """
+    Upload the saved dictionaries and their vocabulary files of `version` to Hopsworks.
+
+    Parameters:
+    - dataset_api: Hopsworks datasets API.
+    - version (int): Version of the feature groups the codes are stored in.
+    - directory (Path): Directory of the saved dictionaries.
+    - remote_dir (str): Hopsworks directory the files are uploaded to.
+    """
+    if not dataset_api.exists(remote_dir):
+        dataset_api.mkdir(remote_dir)
+
+    for path in _dictionary_files(version, directory):
+        if path.exists():
+            dataset_api.upload(str(path), remote_dir, overwrite=True)
+    logger.info(f"Uploaded the v{version} id dictionaries to {remote_dir}.")
+
+
+def download_id_dictionaries(
+    dataset_api,
+    version: int = settings.FEATURES_ID_DICTIONARY_VERSION,
+    directory: Path = settings.FEATURES_ID_DICTIONARY_DIR,
+    remote_dir: str = settings.FEATURES_ID_DICTIONARY_REMOTE_DIR,
+) -> None:
+    """
+    Download the dictionaries and vocabulary files of `version` stored in Hopsworks, if any.
+
+    Files that were never uploaded are left as they are locally.
+
+    Parameters:
+    - dataset_api: Hopsworks datasets API.
+    - version (int): Version of the feature groups the codes are stored in.
+    - directory (Path): Directory the dictionaries are saved to.
+    - remote_dir (str): Hopsworks directory the files were uploaded to.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    for path in _dictionary_files(version, directory):
+        remote_path = f"{remote_dir}/{path.name}"
+        if dataset_api.exists(remote_path):
+            dataset_api.download(remote_path, local_path=str(directory), overwrite=True)
+
+
+def with_id_codes(
+    df: pl.DataFrame | pl.LazyFrame, dictionaries: dict[str, IdDictionary]
+) -> pl.DataFrame | pl.LazyFrame:
+    """
+    Add the int32 code column of every id column of `df` that has a dictionary.
+    """
+    columns = df.collect_schema().names()
+
+    return df.with_columns(
+        dictionary.encode(column)
+        for column, dictionary in dictionaries.items()
+        if column in columns
+    )
+
+
+def vocabulary_path(
+    name: str,
+    version: int = settings.FEATURES_ID_DICTIONARY_VERSION,
+    directory: Path = settings.FEATURES_ID_DICTIONARY_DIR,
+) -> Path:
+    """
+    Path of the vocabulary file written next to a saved dictionary.
+    """
+    return Path(directory) / f"{name}_v{version}.txt"
+
+
+def _dictionary_path(name: str, version: int, directory: Path) -> Path:
+    return Path(directory) / f"{name}_v{version}.parquet"
+
+
+def _dictionary_files(version: int, directory: Path) -> list[Path]:
+    return [
+        path
+        for name in CODE_COLUMNS
+        for path in [
+            _dictionary_path(name, version, directory),
+            vocabulary_path(name, version, directory),
+        ]
+    ]
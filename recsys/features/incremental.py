@@ -0,0 +1,221 @@
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+from loguru import logger
+
+from recsys.config import settings
+from recsys.features.interaction import (
+    INTERACTIONS_SCHEMA,
+    generate_interaction_data,
+    stable_hash,
+)
+from recsys.features.transactions import compute_features_transactions
+
+TRANSACTIONS_FEATURE_GROUP = "transactions"
+INTERACTIONS_FEATURE_GROUP = "interactions"
+
+
+@dataclass
+class IncrementalUpdate:
+    transactions: pl.DataFrame
+    interactions: pl.DataFrame
+    transactions_watermark: int | None
+    interactions_watermark: int | None
+
+
+class WatermarkStore:
+    """
+    Persisted `t_dat` high-watermarks, in seconds, one per feature group.
+
+    A watermark is the largest source transaction `t_dat` a feature group has
+    been updated with. It is only moved forward once the update was inserted.
+    """
+
+    def __init__(self, path: Path = settings.FEATURES_WATERMARKS_PATH) -> None:
+        self._path = Path(path)
+        self._watermarks = (
+            json.loads(self._path.read_text()) if self._path.exists() else {}
+        )
+
+    def get(self, feature_group: str) -> int | None:
+        return self._watermarks.get(feature_group)
+
+    def set(self, feature_group: str, t_dat: int) -> None:
+        self._watermarks[feature_group] = int(t_dat)
+
+        # Write to a temporary file first so a crash never leaves a torn file.
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self._watermarks, indent=2, sort_keys=True))
+        os.replace(tmp_path, self._path)
+
+
+def compute_incremental_features(
+    transactions_lf: pl.LazyFrame,
+    artwork_ids: pl.Series,
+    user_ids: pl.Series,
+    transactions_watermark: int | None,
+    interactions_watermark: int | None,
+    interactions_history=None,
+    seed: int = settings.INTERACTIONS_SEED,
+) -> IncrementalUpdate:
+    """
+    Compute the transactions and interactions features of the transactions newer than their watermarks.
+
+    Only raw transactions at or after the oldest of both watermarks are
+    read: the filter compares 't_dat' with a datetime literal, so a Parquet
+    scan sorted by 't_dat', as written by `generate_user_likes.py`, skips
+    the row groups before it. The second of a watermark is processed again,
+    so transactions that arrived within the same second are not missed. Transactions are
+    upserted on their primary key, and likes already in the interactions
+    history are dropped, so both updates are idempotent.
+
+    Interactions are generated for the new likes only, with ignores and extra
+    clicks drawn from the full artworks catalog. The earlier interactions of
+    the users with new likes are read from `interactions_history` and passed
+    to `generate_interaction_data`, so that no new ignore or click replaces an
+    earlier like and ignores do not pile up over runs. The random draws are
+    seeded by `seed` and the (user_id, t_dat) pairs of the new likes, so the
+    same delta always yields the same interactions.
+
+    Parameters:
+    - transactions_lf (pl.LazyFrame): Raw transactions with a datetime 't_dat' column.
+    - artwork_ids (pl.Series): Ids of the artworks in the artworks feature group.
+    - user_ids (pl.Series): Ids of the users in the users feature group.
+    - transactions_watermark (int | None): Watermark of the transactions feature group. None recomputes everything.
+    - interactions_watermark (int | None): Watermark of the interactions feature group. None recomputes everything.
+    - interactions_history: Interactions feature group, DataFrame, LazyFrame or Parquet path with the earlier interactions. None if there are none.
+    - seed (int): Base seed of the interactions generation.
+
+    Returns:
+    - IncrementalUpdate: Deltas to upsert and the watermarks to store once they are inserted.
+    """
+    if "t_dat" not in transactions_lf.collect_schema().names():
+        raise ValueError(
+            "Incremental updates need a 't_dat' column in the raw transactions, "
+            "regenerate them with generate_user_likes.py."
+        )
+
+    since = _oldest_watermark(transactions_watermark, interactions_watermark)
+    if since is not None:
+        # Naive 't_dat' datetimes are UTC, like in `compute_features_transactions`.
+        transactions_lf = transactions_lf.filter(
+            pl.col("t_dat")
+            >= datetime.fromtimestamp(since, timezone.utc).replace(tzinfo=None)
+        )
+
+    # Inner joins on unique keys keep the plan streamable, semi-joins do not.
+    trans_df = (
+        transactions_lf.join(
+            artwork_ids.alias("artwork_id").unique().to_frame().lazy(),
+            on="artwork_id",
+        )
+        .join(user_ids.alias("user_id").unique().to_frame().lazy(), on="user_id")
+        .pipe(compute_features_transactions)
+        .collect(streaming=True)
+    )
+
+    transactions_delta = _since(trans_df, transactions_watermark)
+    interactions_source = _since(trans_df, interactions_watermark)
+    history = _read_interactions_history(
+        interactions_history, interactions_source["user_id"].unique()
+    )
+    # Sorted, as the streaming joins do not keep the row order of the source.
+    new_likes = interactions_source.join(
+        history.filter(pl.col("interaction_score") == 2),
+        on=["user_id", "artwork_id", "t_dat"],
+        how="anti",
+    ).sort(["user_id", "t_dat", "artwork_id"])
+    interactions_delta = generate_interaction_data(
+        new_likes,
+        seed=_delta_seed(seed, new_likes),
+        artwork_ids=artwork_ids,
+        history=history,
+    )
+    logger.info(
+        f"{transactions_delta.height} new transactions since {transactions_watermark}, "
+        f"{interactions_delta.height} new interactions since {interactions_watermark}."
+    )
+
+    return IncrementalUpdate(
+        transactions=transactions_delta,
+        interactions=interactions_delta,
+        transactions_watermark=_next_watermark(
+            transactions_delta, transactions_watermark
+        ),
+        interactions_watermark=_next_watermark(
+            interactions_source, interactions_watermark
+        ),
+    )
+
+
+def _next_watermark(trans_df: pl.DataFrame, watermark: int | None) -> int | None:
+    if trans_df.height == 0:
+        return watermark
+
+    return int(trans_df["t_dat"].max())
+
+
+def _since(trans_df: pl.DataFrame, watermark: int | None) -> pl.DataFrame:
+    if watermark is None:
+        return trans_df
+
+    return trans_df.filter(pl.col("t_dat") >= watermark)
+
+
+def _read_interactions_history(source, user_ids: pl.Series) -> pl.DataFrame:
+    """
+    Read the earlier interactions of `user_ids` from a feature group, frame or Parquet path.
+    """
+    columns = ["user_id", "artwork_id", "t_dat", "interaction_score"]
+    if source is None or user_ids.is_empty():
+        return pl.DataFrame(
+            schema={column: INTERACTIONS_SCHEMA[column] for column in columns}
+        )
+
+    if isinstance(source, (str, Path)):
+        source = pl.scan_parquet(source)
+    if isinstance(source, pl.DataFrame):
+        source = source.lazy()
+    if isinstance(source, pl.LazyFrame):
+        history = (
+            source.select(columns)
+            .join(user_ids.alias("user_id").to_frame().lazy(), on="user_id")
+            .collect(streaming=True)
+        )
+    else:
+        # Feature groups are read with the projection and the user filter
+        # pushed to the feature store.
+        history = (
+            source.select(columns)
+            .filter(source.user_id.isin(user_ids.to_list()))
+            .read(dataframe_type="polars")
+        )
+
+    return history.cast({column: INTERACTIONS_SCHEMA[column] for column in columns})
+
+
+def _delta_seed(seed: int, trans_df: pl.DataFrame) -> np.random.SeedSequence:
+    # The order-independent sum of the (user_id, t_dat) hashes makes the seed
+    # depend on the content of the delta only.
+    keys = trans_df.select(
+        pl.concat_str(
+            [pl.col("user_id").cast(pl.Utf8), pl.col("t_dat").cast(pl.Utf8)],
+            separator=":",
+        ).alias("key")
+    )["key"]
+    hashes = stable_hash(keys)
+
+    return np.random.SeedSequence([seed, int(hashes.sum(dtype=np.uint64))])
+
+
+def _oldest_watermark(*watermarks: int | None) -> int | None:
+    if any(watermark is None for watermark in watermarks):
+        return None
+
+    return min(watermarks)
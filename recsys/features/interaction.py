@@ -1,174 +1,443 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
 import numpy as np
 import polars as pl
-from tqdm import tqdm
-
-
-def generate_interaction_data(trans_df):
-    # Pre-compute unique values once
-    unique_users = trans_df["user_id"].unique()
-    all_artworks = trans_df["artwork_id"].unique()
-    all_artworks_set = set(all_artworks)
-
-    interactions = []
-
-    def generate_timestamps(base_timestamp, count, min_hours, max_hours):
-        hours = np.random.randint(min_hours, max_hours, size=count)
-        return base_timestamp - (hours * 3600000)
-
-    # Ratios to ensure more realistic interactions
-    CLICK_BEFORE_PURCHASE_PROB = 0.9
-    MIN_IGNORES = 40
-    MAX_IGNORES = 60
-    MIN_EXTRA_CLICKS = 5
-    MAX_EXTRA_CLICKS = 8
-    EXTRA_CLICKS_PROB = 0.95
-
-    chunk_size = 1000
-    for chunk_start in tqdm(
-        range(0, len(unique_users), chunk_size), desc="Processing user chunks"
-    ):
-        chunk_end = min(chunk_start + chunk_size, len(unique_users))
-        chunk_users = unique_users[chunk_start:chunk_end]
-
-        chunk_transactions = trans_df.filter(
-            pl.col("user_id").is_in(chunk_users)
-        )
+from loguru import logger
 
-        for user_id in chunk_users:
-            user_likes = chunk_transactions.filter(
-                pl.col("user_id") == user_id
-            )
+from recsys.config import settings
 
-            if len(user_likes) == 0:
-                continue
-
-            user_artworks = {"liked": set(), "clicked": set(), "ignored": set()}
-            last_like_timestamp = user_likes["t_dat"].max()
-
-            # Generate more ignores first
-            num_ignores = np.random.randint(MIN_IGNORES, MAX_IGNORES)
-            available_artworks = list(all_artworks_set)
-
-            if available_artworks and num_ignores > 0:
-                ignore_timestamps = generate_timestamps(
-                    last_like_timestamp, num_ignores, 1, 96
-                )
-                selected_ignores = np.random.choice(
-                    available_artworks,
-                    size=min(num_ignores, len(available_artworks)),
-                    replace=False,
-                )
-
-                # Generate multiple sets of ignores to increase the count
-                for ts, art_id in zip(ignore_timestamps, selected_ignores):
-                    # Add 1-2 ignore events for the same artwork
-                    num_ignore_events = np.random.randint(1, 3)
-                    for _ in range(num_ignore_events):
-                        ignore_ts = (
-                            ts - np.random.randint(1, 12) * 3600000
-                        )  # Add some random hours difference
-                        interactions.append(
-                            {
-                                "t_dat": ignore_ts,
-                                "user_id": user_id,
-                                "artwork_id": art_id,
-                                "interaction_score": 0,
-                                "prev_artwork_id": None,
-                            }
-                        )
-                    user_artworks["ignored"].add(art_id)
-
-            # Process likes and their clicks
-            like_rows = user_likes.iter_rows(named=True)
-            for row in like_rows:
-                like_timestamp = row["t_dat"]
-                artwork_id = row["artwork_id"]
-
-                # Add clicks before like
-                if np.random.random() < CLICK_BEFORE_PURCHASE_PROB:
-                    num_pre_clicks = np.random.randint(1, 3)
-                    for _ in range(num_pre_clicks):
-                        click_timestamp = generate_timestamps(
-                            like_timestamp, 1, 1, 48
-                        )[0]
-                        interactions.append(
-                            {
-                                "t_dat": click_timestamp,
-                                "user_id": user_id,
-                                "artwork_id": artwork_id,
-                                "interaction_score": 1,
-                                "prev_artwork_id": None,
-                            }
-                        )
-                        user_artworks["clicked"].add(artwork_id)
-
-                # Add like
-                interactions.append(
-                    {
-                        "t_dat": like_timestamp,
-                        "user_id": user_id,
-                        "artwork_id": artwork_id,
-                        "interaction_score": 2,
-                        "prev_artwork_id": None,
-                    }
-                )
-                user_artworks["liked"].add(artwork_id)
-
-            # Generate extra clicks
-            if np.random.random() < EXTRA_CLICKS_PROB:
-                num_extra_clicks = np.random.randint(
-                    MIN_EXTRA_CLICKS, MAX_EXTRA_CLICKS + 1
-                )
-                available_for_clicks = list(
-                    all_artworks_set
-                    - user_artworks["liked"]
-                    - user_artworks["clicked"]
-                    - user_artworks["ignored"]
-                )
-
-                if available_for_clicks and num_extra_clicks > 0:
-                    click_timestamps = generate_timestamps(
-                        last_like_timestamp, num_extra_clicks, 1, 72
-                    )
-                    selected_clicks = np.random.choice(
-                        available_for_clicks,
-                        size=min(num_extra_clicks, len(available_for_clicks)),
-                        replace=False,
-                    )
-
-                    for ts, art_id in zip(click_timestamps, selected_clicks):
-                        interactions.append(
-                            {
-                                "t_dat": ts,
-                                "user_id": user_id,
-                                "artwork_id": art_id,
-                                "interaction_score": 1,
-                                "prev_artwork_id": None,
-                            }
-                        )
-
-    if not interactions:
-        return pl.DataFrame(
-            schema={
-                "t_dat": pl.Int64,
-                "user_id": pl.Utf8,
-                "artwork_id": pl.Utf8,
-                "interaction_score": pl.Int64,
-                "prev_artwork_id": pl.Utf8,
-            }
-        )
+# Ratios to ensure more realistic interactions
+CLICK_BEFORE_PURCHASE_PROB = 0.9
+MIN_IGNORES = 40
+MAX_IGNORES = 60
+MIN_EXTRA_CLICKS = 5
+MAX_EXTRA_CLICKS = 8
+EXTRA_CLICKS_PROB = 0.95
+
+HOUR_MS = 3600000
+
+# Below this catalog size distinct items are drawn from a dense per-user
+# permutation instead of by rejection sampling.
+_DENSE_SAMPLING_MAX_POPULATION = 1024
+_DENSE_SAMPLING_MAX_CELLS = 4_000_000
+
+INTERACTIONS_SCHEMA = {
+    "t_dat": pl.Int64,
+    "user_id": pl.Utf8,
+    "artwork_id": pl.Utf8,
+    "interaction_score": pl.Int64,
+    "prev_artwork_id": pl.Utf8,
+}
+
+
+def generate_interaction_data(
+    trans_df: pl.DataFrame,
+    seed: int | np.random.SeedSequence | None = None,
+    artwork_ids: pl.Series | None = None,
+    history: pl.DataFrame | None = None,
+) -> pl.DataFrame:
+    """
+    Generate synthetic ignore, click and like interactions from liked artworks.
+
+    Every step is computed over whole columns: users are grouped once and all
+    random draws are made per group with a single `np.random.Generator`.
+
+    With a `history`, the artworks a user already interacted with are never
+    drawn again as ignores or extra clicks, their earlier ignores and extra
+    clicks count towards the 40-59 ignores and 5-8 extra clicks of the user,
+    and the first new interaction of a user follows the last earlier one in
+    'prev_artwork_id'.
+
+    Parameters:
+    - trans_df (pl.DataFrame): Transactions with 'user_id', 'artwork_id' and an integer 't_dat'.
+    - seed (int | np.random.SeedSequence | None): Seed for the random generator. None draws fresh entropy.
+    - artwork_ids (pl.Series | None): Catalog to draw ignores and extra clicks from. Defaults to the artworks in `trans_df`.
+    - history (pl.DataFrame | None): Earlier interactions, with 'user_id', 'artwork_id', 't_dat' and 'interaction_score'.
 
-    interaction_df = pl.DataFrame(interactions)
-    sorted_df = interaction_df.sort(["user_id", "t_dat"])
+    Returns:
+    - pl.DataFrame: Interactions sorted by user and time, with 'prev_artwork_id' set.
+    """
+    if trans_df.height == 0:
+        return pl.DataFrame(schema=INTERACTIONS_SCHEMA)
+
+    rng = np.random.default_rng(seed)
+
+    # Users are indexed in 'user_id' order so that the output can be sorted by
+    # integer index instead of by string.
+    users = (
+        trans_df.group_by("user_id")
+        .agg(pl.col("t_dat").max().alias("last_like_t_dat"))
+        .sort("user_id")
+        .with_row_index("user_idx")
+    )
+    if artwork_ids is None:
+        artwork_ids = trans_df["artwork_id"]
+    artworks = (
+        artwork_ids.alias("artwork_id")
+        .unique(maintain_order=True)
+        .to_frame()
+        .with_row_index("artwork_idx")
+    )
+    n_users = users.height
+    n_artworks = artworks.height
+
+    likes = trans_df.join(
+        users.select("user_id", "user_idx"), on="user_id", how="left"
+    ).join(artworks, on="artwork_id", how="left")
+    like_user_idx = likes["user_idx"].to_numpy().astype(np.int64)
+    like_artwork_idx = likes["artwork_idx"].to_numpy().astype(np.int64)
+    like_t_dat = likes["t_dat"].to_numpy().astype(np.int64)
+    last_like_t_dat = users["last_like_t_dat"].to_numpy().astype(np.int64)
+
+    # Earlier interactions of the users, on artworks of the catalog.
+    if history is None:
+        history = pl.DataFrame(schema=INTERACTIONS_SCHEMA)
+    history = (
+        history.select(["user_id", "artwork_id", "t_dat", "interaction_score"])
+        .with_columns(pl.col("t_dat").cast(pl.Int64))
+        .join(users.select("user_id", "user_idx"), on="user_id")
+        .join(artworks, on="artwork_id")
+    )
+    history_user_idx = history["user_idx"].to_numpy().astype(np.int64)
+    history_score = history["interaction_score"].to_numpy()
+    history_keys = history_user_idx * n_artworks + history["artwork_idx"].to_numpy()
+
+    # Ignores: 40-59 distinct artworks per user, each seen 1-2 times, never
+    # on an artwork the user likes or interacted with before.
+    excluded_keys = _sorted_unique(
+        np.concatenate([like_user_idx * n_artworks + like_artwork_idx, history_keys])
+    )
+    num_ignores = rng.integers(MIN_IGNORES, MAX_IGNORES, size=n_users)
+    num_ignores -= np.bincount(history_user_idx[history_score == 0], minlength=n_users)
+    ignore_user_idx, ignore_artwork_idx = _sample_distinct(
+        rng,
+        n_artworks,
+        np.clip(num_ignores, 0, _num_available(excluded_keys, n_users, n_artworks)),
+        excluded_keys=excluded_keys,
+    )
+    ignore_base_t_dat = last_like_t_dat[ignore_user_idx] - rng.integers(
+        1, 96, size=ignore_user_idx.size
+    ) * HOUR_MS
+    num_ignore_events = rng.integers(1, 3, size=ignore_user_idx.size)
+    ignore_event_idx = np.repeat(np.arange(ignore_user_idx.size), num_ignore_events)
+    ignore_event_t_dat = ignore_base_t_dat[ignore_event_idx] - rng.integers(
+        1, 12, size=ignore_event_idx.size
+    ) * HOUR_MS
+
+    # Clicks before likes: 1-2 clicks for 90% of the likes.
+    has_pre_clicks = rng.random(like_user_idx.size) < CLICK_BEFORE_PURCHASE_PROB
+    num_pre_clicks = np.where(
+        has_pre_clicks, rng.integers(1, 3, size=like_user_idx.size), 0
+    )
+    pre_click_idx = np.repeat(np.arange(like_user_idx.size), num_pre_clicks)
+    pre_click_t_dat = like_t_dat[pre_click_idx] - rng.integers(
+        1, 48, size=pre_click_idx.size
+    ) * HOUR_MS
 
-    final_df = sorted_df.with_columns(
+    # Extra clicks on artworks that were neither liked, ignored nor
+    # interacted with before.
+    excluded_keys = _sorted_unique(
+        np.concatenate(
+            [excluded_keys, ignore_user_idx * n_artworks + ignore_artwork_idx]
+        )
+    )
+    has_extra_clicks = rng.random(n_users) < EXTRA_CLICKS_PROB
+    num_extra_clicks = np.where(
+        has_extra_clicks,
+        rng.integers(MIN_EXTRA_CLICKS, MAX_EXTRA_CLICKS + 1, size=n_users),
+        0,
+    )
+    num_extra_clicks -= np.bincount(
+        history_user_idx[history_score == 1], minlength=n_users
+    )
+    extra_click_user_idx, extra_click_artwork_idx = _sample_distinct(
+        rng,
+        n_artworks,
+        np.clip(
+            num_extra_clicks, 0, _num_available(excluded_keys, n_users, n_artworks)
+        ),
+        excluded_keys=excluded_keys,
+    )
+    extra_click_t_dat = last_like_t_dat[extra_click_user_idx] - rng.integers(
+        1, 72, size=extra_click_user_idx.size
+    ) * HOUR_MS
+
+    user_idx = np.concatenate(
         [
-            pl.col("artwork_id")
-            .alias("prev_artwork_id")
-            .shift(1)
-            .over("user_id")
-            .fill_null("START")
+            ignore_user_idx[ignore_event_idx],
+            like_user_idx[pre_click_idx],
+            like_user_idx,
+            extra_click_user_idx,
         ]
     )
-    
+    artwork_idx = np.concatenate(
+        [
+            ignore_artwork_idx[ignore_event_idx],
+            like_artwork_idx[pre_click_idx],
+            like_artwork_idx,
+            extra_click_artwork_idx,
+        ]
+    )
+    t_dat = np.concatenate(
+        [ignore_event_t_dat, pre_click_t_dat, like_t_dat, extra_click_t_dat]
+    )
+    interaction_score = np.concatenate(
+        [
+            np.zeros(ignore_event_idx.size, dtype=np.int64),
+            np.ones(pre_click_idx.size, dtype=np.int64),
+            np.full(like_user_idx.size, 2, dtype=np.int64),
+            np.ones(extra_click_user_idx.size, dtype=np.int64),
+        ]
+    )
+
+    order = np.lexsort((t_dat, user_idx))
+    user_idx, artwork_idx = user_idx[order], artwork_idx[order]
+
+    # The previous artwork is the one just before in the same user's timeline.
+    prev_artwork_idx = np.roll(artwork_idx, 1)
+    is_first = np.ones(user_idx.size, dtype=bool)
+    is_first[1:] = user_idx[1:] != user_idx[:-1]
+
+    artwork_ids = artworks["artwork_id"]
+    final_df = pl.DataFrame(
+        {
+            "t_dat": t_dat[order],
+            "user_id": users["user_id"].gather(user_idx),
+            "artwork_id": artwork_ids.gather(artwork_idx),
+            "interaction_score": interaction_score[order],
+            "prev_artwork_id": artwork_ids.gather(prev_artwork_idx),
+        }
+    )
+
+    # The first new interaction of a user follows their latest earlier one.
+    first_prev_artwork_id = pl.lit("START")
+    if history.height > 0:
+        final_df = (
+            final_df.with_row_index("_row")
+            .sort("t_dat")
+            .join_asof(
+                history.select(
+                    "user_id",
+                    "t_dat",
+                    pl.col("artwork_id").alias("_earlier_artwork_id"),
+                ).sort(["t_dat", "user_id", "_earlier_artwork_id"]),
+                on="t_dat",
+                by="user_id",
+                strategy="backward",
+            )
+            .sort("_row")
+            .drop("_row")
+        )
+        first_prev_artwork_id = pl.col("_earlier_artwork_id").fill_null("START")
+
+    final_df = final_df.with_columns(
+        pl.when(pl.Series(is_first))
+        .then(first_prev_artwork_id)
+        .otherwise(pl.col("prev_artwork_id"))
+        .alias("prev_artwork_id")
+    ).select(list(INTERACTIONS_SCHEMA))
+
     return final_df
+
+
+def generate_interaction_data_sharded(
+    trans_df: pl.DataFrame,
+    output_dir: str | Path,
+    seed: int = settings.INTERACTIONS_SEED,
+    num_shards: int = settings.INTERACTIONS_NUM_SHARDS,
+    num_workers: int | None = None,
+) -> list[Path]:
+    """
+    Generate interaction data in user shards on a process pool.
+
+    Users are assigned to shards by a stable hash of 'user_id' and every shard
+    draws from its own seed, spawned from `seed`. The output only depends on
+    `seed` and `num_shards`, never on `num_workers`. Each shard is written by
+    its worker to `output_dir/part-<shard>.parquet`.
+
+    Parameters:
+    - trans_df (pl.DataFrame): Transactions with 'user_id', 'artwork_id' and an integer 't_dat'.
+    - output_dir (str | Path): Directory the Parquet shards are written to.
+    - seed (int): Master seed the per-shard seeds are derived from.
+    - num_shards (int): Number of user shards.
+    - num_workers (int | None): Number of worker processes. Defaults to the number of CPUs.
+
+    Returns:
+    - list[Path]: Paths of the written shards, ordered by shard.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    artwork_ids = trans_df["artwork_id"].unique(maintain_order=True)
+    shard_ids = pl.Series(
+        "shard", stable_hash(trans_df["user_id"]) % np.uint64(num_shards)
+    )
+    shard_seeds = np.random.SeedSequence(seed).spawn(num_shards)
+    shards = {
+        key[0]: df.drop("shard")
+        for key, df in trans_df.with_columns(shard_ids).partition_by(
+            "shard", as_dict=True
+        ).items()
+    }
+
+    logger.info(
+        f"Generating interactions for {trans_df.height} transactions in {num_shards} shards."
+    )
+    with ProcessPoolExecutor(
+        max_workers=num_workers, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        futures = [
+            executor.submit(
+                _generate_interaction_shard,
+                shards.get(shard, trans_df.clear()),
+                artwork_ids,
+                shard_seeds[shard],
+                output_dir / f"part-{shard:05d}.parquet",
+            )
+            for shard in range(num_shards)
+        ]
+        output_paths = [future.result() for future in futures]
+
+    return output_paths
+
+
+def stable_hash(values: pl.Series) -> np.ndarray:
+    """
+    Hash strings with 64-bit FNV-1a, independent of process and library version.
+
+    Parameters:
+    - values (pl.Series): Values to hash, cast to strings. Nulls hash like empty strings.
+
+    Returns:
+    - np.ndarray: uint64 hash of every value.
+    """
+    encoded = (
+        values.cast(pl.Utf8).fill_null("").cast(pl.Binary).to_numpy().astype(np.bytes_)
+    )
+    lengths = np.char.str_len(encoded)
+    max_length = encoded.dtype.itemsize
+    byte_matrix = encoded.view(np.uint8).reshape(-1, max_length)
+
+    hashes = np.full(encoded.size, 0xCBF29CE484222325, dtype=np.uint64)
+    fnv_prime = np.uint64(0x100000001B3)
+    for position in range(max_length):
+        in_string = position < lengths
+        hashes = np.where(
+            in_string,
+            (hashes ^ byte_matrix[:, position].astype(np.uint64)) * fnv_prime,
+            hashes,
+        )
+
+    return hashes
+
+
+def _generate_interaction_shard(
+    trans_df: pl.DataFrame,
+    artwork_ids: pl.Series,
+    seed: np.random.SeedSequence,
+    output_path: Path,
+) -> Path:
+    interaction_df = generate_interaction_data(
+        trans_df, seed=seed, artwork_ids=artwork_ids
+    )
+    interaction_df.write_parquet(output_path)
+
+    return output_path
+
+
+def _sample_distinct(
+    rng: np.random.Generator,
+    n_population: int,
+    sizes: np.ndarray,
+    excluded_keys: np.ndarray | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Draw `sizes[g]` distinct items from `range(n_population)` for every group `g`.
+
+    Parameters:
+    - rng (np.random.Generator): Random generator to draw from.
+    - n_population (int): Number of items to sample from.
+    - sizes (np.ndarray): Number of items to draw per group. Must not exceed the available items.
+    - excluded_keys (np.ndarray | None): Sorted `group * n_population + item` keys that must not be drawn.
+
+    Returns:
+    - tuple[np.ndarray, np.ndarray]: Flat group and item indices of the draws, ordered by group.
+    """
+    if excluded_keys is None:
+        excluded_keys = np.empty(0, dtype=np.int64)
+
+    if n_population <= _DENSE_SAMPLING_MAX_POPULATION:
+        return _sample_distinct_dense(rng, n_population, sizes, excluded_keys)
+
+    group_idx = np.repeat(np.arange(sizes.size), sizes)
+    item_idx = rng.integers(0, n_population, size=group_idx.size)
+
+    # Redraw duplicated or excluded items until every draw is valid. Keeping the
+    # first occurrence and redrawing the rest is equivalent to sequential
+    # sampling without replacement.
+    pending = np.ones(group_idx.size, dtype=bool)
+    while pending.any():
+        keys = group_idx * n_population + item_idx
+
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        pending = np.zeros(keys.size, dtype=bool)
+        pending[order[1:]] = sorted_keys[1:] == sorted_keys[:-1]
+        if excluded_keys.size > 0:
+            positions = np.minimum(
+                np.searchsorted(excluded_keys, keys), excluded_keys.size - 1
+            )
+            pending |= excluded_keys[positions] == keys
+
+        item_idx[pending] = rng.integers(0, n_population, size=pending.sum())
+
+    return group_idx, item_idx
+
+
+def _num_available(
+    excluded_keys: np.ndarray, n_groups: int, n_population: int
+) -> np.ndarray:
+    return n_population - np.bincount(
+        excluded_keys // n_population, minlength=n_groups
+    )
+
+
+def _sorted_unique(values: np.ndarray) -> np.ndarray:
+    values = np.sort(values)
+    if values.size == 0:
+        return values
+
+    return values[np.concatenate([[True], values[1:] != values[:-1]])]
+
+
+def _sample_distinct_dense(
+    rng: np.random.Generator,
+    n_population: int,
+    sizes: np.ndarray,
+    excluded_keys: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    chunk_size = max(1, _DENSE_SAMPLING_MAX_CELLS // max(n_population, 1))
+    group_chunks, item_chunks = [], []
+    for chunk_start in range(0, sizes.size, chunk_size):
+        chunk_sizes = sizes[chunk_start : chunk_start + chunk_size]
+
+        priorities = rng.random((chunk_sizes.size, n_population))
+        chunk_keys = excluded_keys[
+            (excluded_keys >= chunk_start * n_population)
+            & (excluded_keys < (chunk_start + chunk_sizes.size) * n_population)
+        ] - chunk_start * n_population
+        priorities.flat[chunk_keys] = np.inf
+
+        order = np.argsort(priorities, axis=1)
+        local_group_idx, rank = np.nonzero(
+            np.arange(n_population) < chunk_sizes[:, None]
+        )
+        group_chunks.append(local_group_idx + chunk_start)
+        item_chunks.append(order[local_group_idx, rank])
+
+    if not group_chunks:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    return np.concatenate(group_chunks), np.concatenate(item_chunks)
@@ -0,0 +1,133 @@
+import numpy as np
+
+from recsys.config import settings
+
+# Users that liked almost every artwork can make valid negatives very rare.
+# Draws still colliding with a positive after this many rounds are dropped.
+MAX_RESAMPLING_ROUNDS = 20
+
+
+def build_alias_table(weights: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Build a Walker/Vose alias table to draw indices proportionally to `weights` in O(1).
+
+    The table is built in rounds instead of item by item: in every round all
+    under-full buckets are paired at once with the over-full buckets through
+    cumulative sums of their deficits and excesses.
+
+    Parameters:
+    - weights (np.ndarray): Non-negative sampling weights, one per index.
+
+    Returns:
+    - tuple[np.ndarray, np.ndarray]: Acceptance probability and alias index of every bucket.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    n = weights.size
+    if n == 0 or weights.sum() <= 0:
+        raise ValueError("Alias table weights must contain a positive value.")
+
+    scaled = weights * (n / weights.sum())
+    prob = np.ones(n, dtype=np.float64)
+    alias = np.arange(n, dtype=np.int64)
+    unresolved = np.ones(n, dtype=bool)
+
+    while True:
+        small = np.flatnonzero(unresolved & (scaled < 1.0))
+        large = np.flatnonzero(unresolved & (scaled >= 1.0))
+        if small.size == 0 or large.size == 0:
+            break
+
+        # Lay the deficits of the small buckets and the excesses of the large
+        # buckets on the same axis; every small bucket borrows from the large
+        # bucket its deficit starts in.
+        deficit = 1.0 - scaled[small]
+        excess_end = np.cumsum(scaled[large] - 1.0)
+        deficit_start = np.cumsum(deficit) - deficit
+        donor = np.minimum(
+            np.searchsorted(excess_end, deficit_start, side="right"), large.size - 1
+        )
+
+        prob[small] = scaled[small]
+        alias[small] = large[donor]
+        unresolved[small] = False
+        scaled[large] -= np.bincount(donor, weights=deficit, minlength=large.size)
+
+    # Whatever is left is full up to floating point error.
+    prob[unresolved] = 1.0
+
+    return prob, alias
+
+
+def sample_alias(
+    rng: np.random.Generator, prob: np.ndarray, alias: np.ndarray, size: int
+) -> np.ndarray:
+    """
+    Draw `size` indices from an alias table built by `build_alias_table`.
+    """
+    buckets = rng.integers(0, prob.size, size=size)
+    accept = rng.random(size) < prob[buckets]
+
+    return np.where(accept, buckets, alias[buckets])
+
+
+def sample_negatives(
+    user_idx: np.ndarray,
+    item_idx: np.ndarray,
+    num_items: int,
+    negatives_per_positive: int = settings.RANKING_NEGATIVES_PER_POSITIVE,
+    popularity_exponent: float = settings.RANKING_NEGATIVES_POPULARITY_EXPONENT,
+    seed: int | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Sample negative user-item pairs that never collide with a positive pair.
+
+    Every positive pair yields `negatives_per_positive` negatives for the same
+    user. Items are drawn proportionally to `popularity ** popularity_exponent`
+    through an alias table, and pairs present among the positives are removed
+    with an anti-join on `user * num_items + item` keys and drawn again.
+
+    Parameters:
+    - user_idx (np.ndarray): Integer user codes of the positive pairs.
+    - item_idx (np.ndarray): Integer item codes in `[0, num_items)` of the positive pairs.
+    - num_items (int): Number of items to sample from.
+    - negatives_per_positive (int): Number of negatives drawn for every positive pair.
+    - popularity_exponent (float): 0 samples items uniformly, 1 proportionally to their number of positives.
+    - seed (int | None): Seed for the random generator.
+
+    Returns:
+    - tuple[np.ndarray, np.ndarray]: User and item codes of the negative pairs.
+    """
+    user_idx = np.asarray(user_idx, dtype=np.int64)
+    item_idx = np.asarray(item_idx, dtype=np.int64)
+    if user_idx.size == 0 or num_items == 0 or negatives_per_positive == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    rng = np.random.default_rng(seed)
+
+    popularity = np.bincount(item_idx, minlength=num_items).astype(np.float64)
+    prob, alias = build_alias_table(popularity**popularity_exponent)
+
+    positive_keys = np.sort(user_idx * num_items + item_idx)
+
+    negative_user_idx = np.repeat(user_idx, negatives_per_positive)
+    negative_item_idx = sample_alias(rng, prob, alias, negative_user_idx.size)
+
+    colliding = _is_in_sorted(negative_user_idx * num_items + negative_item_idx, positive_keys)
+    for _ in range(MAX_RESAMPLING_ROUNDS):
+        if not colliding.any():
+            break
+        negative_item_idx[colliding] = sample_alias(rng, prob, alias, colliding.sum())
+        colliding[colliding] = _is_in_sorted(
+            negative_user_idx[colliding] * num_items + negative_item_idx[colliding],
+            positive_keys,
+        )
+
+    keep = ~colliding
+
+    return negative_user_idx[keep], negative_item_idx[keep]
+
+
+def _is_in_sorted(keys: np.ndarray, sorted_keys: np.ndarray) -> np.ndarray:
+    positions = np.minimum(np.searchsorted(sorted_keys, keys), sorted_keys.size - 1)
+
+    return sorted_keys[positions] == keys
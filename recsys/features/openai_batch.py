@@ -0,0 +1,242 @@
+import json
+from pathlib import Path
+
+import polars as pl
+from loguru import logger
+
+from recsys.config import settings
+
+USER_PROFILE_SYSTEM_PROMPT = (
+    "You are a psychologist and an art critic. Be concise and creative."
+)
+USER_PROFILE_PROMPT = """Here is a list of artworks that a users liked.
+Complete the user profile based on these images.
+Answer with exact age, sex (F or M) and a creative description of the user (culture, location, aestehtics, emotions...).
+Format the response as a JSON object with the keys age, gender, and description."""
+ARTWORK_DESCRIPTION_SYSTEM_PROMPT = "You are an expert art critic and designer."
+ARTWORK_DESCRIPTION_PROMPT = (
+    "Describe this image by color, mood, and aesthetic in no more than 4 lines of text"
+)
+
+MAX_THUMBNAILS_PER_USER = 3
+MAX_TOKENS = 300
+
+# Same check as urlparse: a scheme and a network location.
+VALID_URL_PATTERN = r"^[A-Za-z][A-Za-z0-9+.\-]*://[^/?#]+"
+
+
+class BatchShardWriter:
+    """
+    Write OpenAI Batch API requests to JSONL shards capped by request count and size.
+
+    A new shard is started before a request would exceed either cap, so
+    every shard can be uploaded as its own batch. Requests whose
+    `custom_id` was already written are skipped, the Batch API rejects
+    files with duplicate ids.
+    """
+
+    def __init__(
+        self,
+        output_dir: Path,
+        prefix: str,
+        max_requests: int = settings.OPENAI_BATCH_MAX_REQUESTS,
+        max_bytes: int = settings.OPENAI_BATCH_MAX_BYTES,
+    ) -> None:
+        self.output_dir = Path(output_dir)
+        self.prefix = prefix
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        self.paths: list[Path] = []
+        self.num_duplicates = 0
+        self._seen_ids: set[str] = set()
+        self._file = None
+        self._num_requests = 0
+        self._num_bytes = 0
+
+    @property
+    def num_requests(self) -> int:
+        return len(self._seen_ids)
+
+    def __enter__(self) -> "BatchShardWriter":
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        # Drop the shards of a previous run, they might not be overwritten.
+        for path in self.output_dir.glob(f"{self.prefix}_*.jsonl"):
+            path.unlink()
+
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def write(self, request: dict) -> bool:
+        """
+        Write a request, unless its `custom_id` was already written.
+        """
+        if request["custom_id"] in self._seen_ids:
+            self.num_duplicates += 1
+            return False
+        self._seen_ids.add(request["custom_id"])
+
+        line = (json.dumps(request) + "\n").encode("utf-8")
+        if len(line) > self.max_bytes:
+            raise ValueError(
+                f"Request '{request['custom_id']}' is larger than a whole shard."
+            )
+        if (
+            self._file is None
+            or self._num_requests >= self.max_requests
+            or self._num_bytes + len(line) > self.max_bytes
+        ):
+            self._next_shard()
+
+        self._file.write(line)
+        self._num_requests += 1
+        self._num_bytes += len(line)
+
+        return True
+
+    def _next_shard(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+        path = self.output_dir / f"{self.prefix}_{len(self.paths):03d}.jsonl"
+        self.paths.append(path)
+        self._file = open(path, "wb")
+        self._num_requests = 0
+        self._num_bytes = 0
+
+
+def chat_completion_request(
+    custom_id: str,
+    system_prompt: str,
+    content: list[dict],
+    model: str = settings.OPENAI_MODEL_ID,
+    max_tokens: int = MAX_TOKENS,
+) -> dict:
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": content},
+            ],
+            "max_tokens": max_tokens,
+        },
+    }
+
+
+def user_thumbnails(
+    transactions_lf: pl.LazyFrame, max_thumbnails: int = MAX_THUMBNAILS_PER_USER
+) -> pl.LazyFrame:
+    """
+    Select the first `max_thumbnails` valid thumbnail links liked by every user, in transaction order.
+
+    Parameters:
+    - transactions_lf (pl.LazyFrame): Transactions with 'user_id' and 'thumbnail_link'.
+    - max_thumbnails (int): Maximum number of thumbnails per user.
+
+    Returns:
+    - pl.LazyFrame: 'user_id' and the list of its 'thumbnail_link' values.
+    """
+    # Rows keep their order within a group.
+    return transactions_lf.group_by("user_id").agg(
+        pl.col("thumbnail_link")
+        .filter(pl.col("thumbnail_link").str.contains(VALID_URL_PATTERN))
+        .head(max_thumbnails)
+    )
+
+
+def write_user_profile_requests(
+    transactions_lf: pl.LazyFrame,
+    output_dir: Path = settings.OPENAI_BATCH_DIR,
+    num_partitions: int = settings.OPENAI_BATCH_NUM_PARTITIONS,
+    model: str = settings.OPENAI_MODEL_ID,
+) -> list[Path]:
+    """
+    Write one user profile request per user, asking for its age, gender and description from the artworks it liked.
+
+    Users are hash partitioned on their id and the partitions are grouped
+    one after the other, so only one partition of the groups is in memory.
+
+    Parameters:
+    - transactions_lf (pl.LazyFrame): Transactions with 'user_id' and 'thumbnail_link'.
+    - output_dir (Path): Directory the request shards are written to.
+    - num_partitions (int): Number of user partitions.
+    - model (str): OpenAI model of the requests.
+
+    Returns:
+    - list[Path]: Written shards.
+    """
+    with BatchShardWriter(output_dir, prefix="user_profiles") as writer:
+        for partition in range(num_partitions):
+            thumbnails = (
+                transactions_lf.filter(
+                    pl.col("user_id").hash(settings.INTERACTIONS_SEED) % num_partitions
+                    == partition
+                )
+                .pipe(user_thumbnails)
+                .sort("user_id")
+                .collect(streaming=True)
+            )
+            for user_id, links in thumbnails.iter_rows():
+                content = [{"type": "text", "text": USER_PROFILE_PROMPT}] + [
+                    {"type": "image_url", "image_url": {"url": link}} for link in links
+                ]
+                writer.write(
+                    chat_completion_request(
+                        user_id, USER_PROFILE_SYSTEM_PROMPT, content, model=model
+                    )
+                )
+
+    logger.info(
+        f"Wrote {writer.num_requests} user profile requests to {len(writer.paths)} shards."
+    )
+
+    return writer.paths
+
+
+def write_artwork_description_requests(
+    artworks_lf: pl.LazyFrame,
+    output_dir: Path = settings.OPENAI_BATCH_DIR,
+    model: str = settings.OPENAI_MODEL_ID,
+) -> list[Path]:
+    """
+    Write one description request per artwork with a thumbnail.
+
+    Parameters:
+    - artworks_lf (pl.LazyFrame): Artworks with 'id' and 'thumbnail_link', e.g. the filtered catalog.
+    - output_dir (Path): Directory the request shards are written to.
+    - model (str): OpenAI model of the requests.
+
+    Returns:
+    - list[Path]: Written shards.
+    """
+    artworks_lf = artworks_lf.select(
+        pl.col("id").cast(pl.Utf8).str.strip_chars(),
+        pl.col("thumbnail_link").str.strip_chars(),
+    ).filter(pl.col("thumbnail_link").fill_null("") != "")
+
+    with BatchShardWriter(output_dir, prefix="artwork_descriptions") as writer:
+        for artwork_id, thumbnail_link in artworks_lf.collect(streaming=True).iter_rows():
+            content = [
+                {"type": "text", "text": ARTWORK_DESCRIPTION_PROMPT},
+                {"type": "image_url", "image_url": {"url": thumbnail_link}},
+            ]
+            writer.write(
+                chat_completion_request(
+                    artwork_id, ARTWORK_DESCRIPTION_SYSTEM_PROMPT, content, model=model
+                )
+            )
+
+    if writer.num_duplicates > 0:
+        logger.warning(f"Skipped {writer.num_duplicates} duplicated artwork ids.")
+    logger.info(
+        f"Wrote {writer.num_requests} artwork description requests to {len(writer.paths)} shards."
+    )
+
+    return writer.paths
@@ -0,0 +1,224 @@
+import json
+import multiprocessing
+import os
+import re
+from collections import deque
+from collections.abc import Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import polars as pl
+from loguru import logger
+
+from recsys.config import settings
+
+ARTWORK_DESCRIPTION_SCHEMA = {"id": pl.Utf8, "description": pl.Utf8}
+USER_PROFILE_SCHEMA = {
+    "user_id": pl.Utf8,
+    "age": pl.Int64,
+    "gender": pl.Utf8,
+    "description": pl.Utf8,
+}
+
+# Gender answers -> the values of the users table.
+GENDERS = {"F": "Female", "FEMALE": "Female", "M": "Male", "MALE": "Male"}
+
+# Models often wrap JSON answers in a Markdown code block.
+CODE_BLOCK_PATTERN = re.compile(r"^\s*```(?:json)?\s*(.*?)\s*```\s*$", re.DOTALL)
+
+
+def read_batch_results(
+    paths: list[Path],
+    parse: Callable[[list[str]], tuple[pl.DataFrame, int]],
+    chunk_size: int = settings.OPENAI_BATCH_RESULTS_CHUNK_SIZE,
+    num_workers: int | None = None,
+) -> pl.DataFrame:
+    """
+    Parse OpenAI Batch API output files on a process pool.
+
+    The files are read line by line and sent to the workers in chunks of
+    `chunk_size` lines. At most two chunks per worker are in flight, so
+    memory is bounded by the parsed results, not by the size of the files.
+
+    Parameters:
+    - paths (list[Path]): Batch output JSONL files.
+    - parse (Callable): Module-level function turning a chunk of lines into a DataFrame and its number of malformed lines.
+    - chunk_size (int): Number of lines per chunk.
+    - num_workers (int | None): Number of worker processes. Defaults to the number of CPUs.
+
+    Returns:
+    - pl.DataFrame: Parsed results of every well-formed line.
+    """
+    num_workers = num_workers or os.cpu_count() or 1
+    results = [parse([])[0]]
+    num_malformed = 0
+    with ProcessPoolExecutor(
+        max_workers=num_workers, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        max_in_flight = 2 * num_workers
+        in_flight = deque()
+        for chunk in _iter_chunks(paths, chunk_size):
+            if len(in_flight) >= max_in_flight:
+                df, malformed = in_flight.popleft().result()
+                results.append(df)
+                num_malformed += malformed
+            in_flight.append(executor.submit(parse, chunk))
+
+        for future in in_flight:
+            df, malformed = future.result()
+            results.append(df)
+            num_malformed += malformed
+
+    results_df = pl.concat(results)
+    if num_malformed > 0:
+        logger.warning(f"Skipped {num_malformed} malformed batch results.")
+    logger.info(f"Parsed {results_df.height} batch results.")
+
+    return results_df
+
+
+def parse_artwork_description_results(lines: list[str]) -> tuple[pl.DataFrame, int]:
+    """
+    Parse artwork description results into 'id' and 'description'.
+    """
+    rows = []
+    num_malformed = 0
+    for line in lines:
+        try:
+            custom_id, content = _message_content(line)
+        except (ValueError, KeyError, IndexError, TypeError):
+            num_malformed += 1
+            continue
+        rows.append((custom_id, content.strip()))
+
+    return pl.DataFrame(rows, schema=ARTWORK_DESCRIPTION_SCHEMA, orient="row"), num_malformed
+
+
+def parse_user_profile_results(lines: list[str]) -> tuple[pl.DataFrame, int]:
+    """
+    Parse user profile results, whose answers are JSON objects, into 'user_id', 'age', 'gender' and 'description'.
+    """
+    rows = []
+    num_malformed = 0
+    for line in lines:
+        try:
+            custom_id, content = _message_content(line)
+            match = CODE_BLOCK_PATTERN.match(content)
+            profile = json.loads(match.group(1) if match else content)
+            age = int(profile["age"])
+            gender = GENDERS.get(str(profile["gender"]).strip().upper())
+            description = str(profile["description"]).strip()
+        except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+            num_malformed += 1
+            continue
+        rows.append((custom_id, age, gender, description))
+
+    return pl.DataFrame(rows, schema=USER_PROFILE_SCHEMA, orient="row"), num_malformed
+
+
+def ingest_artwork_descriptions(
+    result_paths: list[Path],
+    artworks_lf: pl.LazyFrame,
+    output_path: Path,
+    num_workers: int | None = None,
+) -> Path:
+    """
+    Join artwork description results to the artworks catalog and write it to Parquet.
+
+    Replaces the hand-made artworks_info.csv. The output is the input of
+    `compute_features_artworks`: the catalog columns plus 'description', for
+    the artworks that got one.
+
+    Parameters:
+    - result_paths (list[Path]): Batch output files of the artwork description requests.
+    - artworks_lf (pl.LazyFrame): Artworks catalog with an 'id' column.
+    - output_path (Path): Output Parquet file.
+    - num_workers (int | None): Number of worker processes. Defaults to the number of CPUs.
+
+    Returns:
+    - Path: Output Parquet file.
+    """
+    descriptions = read_batch_results(
+        result_paths, parse_artwork_description_results, num_workers=num_workers
+    )
+
+    return _join_and_write(
+        artworks_lf.drop("description", strict=False),
+        descriptions.unique(subset="id", keep="last"),
+        on="id",
+        output_path=output_path,
+    )
+
+
+def ingest_user_profiles(
+    result_paths: list[Path],
+    users_lf: pl.LazyFrame,
+    output_path: Path,
+    num_workers: int | None = None,
+) -> Path:
+    """
+    Join user profile results to the generated users and write the users table to Parquet.
+
+    Replaces the hand-made updated_user_details.csv. The output is the input
+    of `compute_features_users`: 'user_id', 'age', 'gender' and the profile
+    description as 'preference', for the users that got a well-formed answer.
+
+    Parameters:
+    - result_paths (list[Path]): Batch output files of the user profile requests.
+    - users_lf (pl.LazyFrame): Generated users, user-artworks.csv, with their id in an 'id' column.
+    - output_path (Path): Output Parquet file.
+    - num_workers (int | None): Number of worker processes. Defaults to the number of CPUs.
+
+    Returns:
+    - Path: Output Parquet file.
+    """
+    profiles = read_batch_results(
+        result_paths, parse_user_profile_results, num_workers=num_workers
+    )
+
+    return _join_and_write(
+        users_lf.select(pl.col("id").cast(pl.Utf8).alias("user_id")).unique(),
+        profiles.unique(subset="user_id", keep="last").rename(
+            {"description": "preference"}
+        ),
+        on="user_id",
+        output_path=output_path,
+    )
+
+
+def _join_and_write(
+    table_lf: pl.LazyFrame, results: pl.DataFrame, on: str, output_path: Path
+) -> Path:
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Results are unique on the key, so no row of the table is duplicated.
+    joined = table_lf.join(results.lazy(), on=on, how="inner").collect(streaming=True)
+    joined.write_parquet(output_path)
+    logger.info(f"Wrote {joined.height} rows with batch results to {output_path}.")
+
+    return output_path
+
+
+def _message_content(line: str) -> tuple[str, str]:
+    result = json.loads(line)
+    response = result["response"]
+    if result.get("error") or response["status_code"] != 200:
+        raise ValueError(f"Request '{result['custom_id']}' failed.")
+
+    return result["custom_id"], response["body"]["choices"][0]["message"]["content"]
+
+
+def _iter_chunks(paths: list[Path], chunk_size: int) -> Iterator[list[str]]:
+    chunk = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                chunk.append(line)
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,215 @@
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+import polars as pl
+import pyarrow.dataset as ds
+from loguru import logger
+
+from recsys.config import UserDatasetSize, UserSamplingMethod, settings
+from recsys.features.artworks import (
+    compute_features_artworks,
+    generate_embeddings_for_dataframe,
+)
+from recsys.features.embedding_cache import EmbeddingCache
+from recsys.features.embedding_engine import SentenceEmbeddingEngine
+from recsys.features.id_dictionary import update_id_dictionaries, with_id_codes
+from recsys.features.transactions import compute_features_transactions
+from recsys.features.users import (
+    DatasetSampler,
+    compute_features_users,
+    iter_batches,
+)
+
+TRANSACTIONS_PARTITION_COLUMNS = ["year", "month"]
+
+
+def scan_raw_data(
+    data_dir: str | Path = settings.FEATURES_RAW_DATA_DIR,
+) -> dict[str, pl.LazyFrame]:
+    """
+    Lazily scan the raw artworks, users and transactions exports.
+
+    Parameters:
+    - data_dir (str | Path): Directory holding the raw files.
+
+    Returns:
+    - dict[str, pl.LazyFrame]: Lazy 'artworks', 'users' and 'transactions' frames.
+    """
+    data_dir = Path(data_dir)
+
+    return {
+        "artworks": scan_raw_file(data_dir / settings.FEATURES_RAW_ARTWORKS_FILE),
+        "users": scan_raw_file(data_dir / settings.FEATURES_RAW_USERS_FILE),
+        "transactions": scan_raw_file(
+            data_dir / settings.FEATURES_RAW_TRANSACTIONS_FILE, try_parse_dates=True
+        ),
+    }
+
+
+def scan_raw_file(path: str | Path, try_parse_dates: bool = False) -> pl.LazyFrame:
+    """
+    Lazily scan a raw Parquet or CSV file, picked by its suffix.
+
+    Parameters:
+    - path (str | Path): Path of the raw file.
+    - try_parse_dates (bool): Whether to parse the date columns of a CSV file.
+
+    Returns:
+    - pl.LazyFrame: Lazy frame over the file.
+    """
+    path = Path(path)
+    if path.suffix == ".parquet":
+        return pl.scan_parquet(path)
+
+    return pl.scan_csv(path, try_parse_dates=try_parse_dates)
+
+
+def run_feature_pipeline(
+    data_dir: str | Path = settings.FEATURES_RAW_DATA_DIR,
+    output_dir: str | Path = settings.FEATURES_OUTPUT_DIR,
+    size: UserDatasetSize = settings.USER_DATA_SIZE,
+    t_dat: datetime | None = None,
+    sampling_method: UserSamplingMethod = settings.USER_SAMPLING_METHOD,
+    stratify_by: str | None = settings.USER_SAMPLING_STRATIFY_BY,
+    embed_descriptions: bool = True,
+    dataset_api=None,
+) -> dict[str, Path]:
+    """
+    Compute the artworks, users and transactions features from the raw files and write them to Parquet.
+
+    Users and transactions are streamed from the raw file scans to Parquet, so
+    memory does not grow with the size of the exports. The artworks catalog
+    is small and collected, its descriptions are embedded by a
+    `SentenceEmbeddingEngine` through the embedding cache, like in the
+    feature pipeline notebook. Users are sampled in a single pass with
+    `DatasetSampler.sample_streaming`; at most the sample itself is held in
+    memory. The saved id dictionaries are extended with the sampled users and
+    the artworks, and every table gets the int32 'user_idx' / 'artwork_idx'
+    codes of its ids. Transactions are written as a hive partitioned dataset,
+    `transactions/year=.../month=...`.
+
+    Parameters:
+    - data_dir (str | Path): Directory holding the raw files.
+    - output_dir (str | Path): Directory the Parquet outputs are written to.
+    - size (UserDatasetSize): Number of users to sample.
+    - t_dat (datetime | None): Timestamp of transactions without a 't_dat' column. Defaults to now.
+    - sampling_method (UserSamplingMethod): How users are sampled.
+    - stratify_by (str | None): Column to stratify a RESERVOIR user sample by.
+    - embed_descriptions (bool): Whether to add the 'embeddings' of the artwork descriptions.
+    - dataset_api: Hopsworks datasets API the id dictionaries are shared through. None keeps them local.
+
+    Returns:
+    - dict[str, Path]: Output path of every table.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    raw = scan_raw_data(data_dir)
+    artworks_lf = compute_features_artworks(raw["artworks"])
+    users_lf = compute_features_users(raw["users"], drop_null_age=True)
+    transactions_lf = _compute_features_transactions(
+        raw["transactions"], artworks_lf, t_dat
+    )
+
+    sampler = DatasetSampler(size=size)
+    if sampling_method == UserSamplingMethod.HASH:
+        users = users_lf
+    else:
+        users = (
+            compute_features_users(batch, drop_null_age=True)
+            for batch in iter_batches(Path(data_dir) / settings.FEATURES_RAW_USERS_FILE)
+        )
+    dataset_subset = sampler.sample_streaming(
+        users, transactions_lf, method=sampling_method, stratify_by=stratify_by
+    )
+
+    # Only the id columns are read to extend the dictionaries, then every
+    # table is written with its integer codes.
+    id_dictionaries = update_id_dictionaries(
+        user_ids=dataset_subset["users"]
+        .select("user_id")
+        .collect(streaming=True)["user_id"],
+        artwork_ids=artworks_lf.select("artwork_id").collect(streaming=True)[
+            "artwork_id"
+        ],
+        dataset_api=dataset_api,
+    )
+
+    artworks_path = output_dir / "artworks.parquet"
+    artworks_df = with_id_codes(artworks_lf, id_dictionaries).collect(streaming=True)
+    if embed_descriptions:
+        artworks_df = _embed_descriptions(artworks_df)
+    artworks_df.write_parquet(artworks_path)
+    logger.info(f"Wrote artworks features to {artworks_path}.")
+
+    users_path = output_dir / "users.parquet"
+    with_id_codes(dataset_subset["users"], id_dictionaries).sink_parquet(users_path)
+    logger.info(f"Wrote sampled users to {users_path}.")
+
+    transactions_path = _sink_partitioned(
+        with_id_codes(dataset_subset["transactions"], id_dictionaries),
+        output_dir / "transactions",
+        TRANSACTIONS_PARTITION_COLUMNS,
+    )
+
+    return {
+        "artworks": artworks_path,
+        "users": users_path,
+        "transactions": transactions_path,
+    }
+
+
+def _embed_descriptions(artworks_df: pl.DataFrame) -> pl.DataFrame:
+    with SentenceEmbeddingEngine() as engine:
+        cache = EmbeddingCache(
+            settings.FEATURES_EMBEDDING_MODEL_ID, engine.get_sentence_embedding_dimension()
+        )
+
+        return generate_embeddings_for_dataframe(
+            artworks_df, "description", engine, cache=cache
+        )
+
+
+def _compute_features_transactions(
+    transactions_lf: pl.LazyFrame, artworks_lf: pl.LazyFrame, t_dat: datetime | None
+) -> pl.LazyFrame:
+    if "t_dat" not in transactions_lf.collect_schema().names():
+        transactions_lf = transactions_lf.with_columns(
+            t_dat=pl.lit(t_dat or datetime.today())
+        )
+
+    # An inner join on unique keys keeps the plan streamable, a semi-join does not.
+    return transactions_lf.join(
+        artworks_lf.select("artwork_id").unique(), on="artwork_id"
+    ).pipe(compute_features_transactions)
+
+
+def _sink_partitioned(
+    lf: pl.LazyFrame, output_dir: Path, partition_columns: list[str]
+) -> Path:
+    """
+    Stream a LazyFrame to a hive partitioned Parquet dataset in a single pass.
+    """
+    # The plan is run once to a staging file, which a streaming pyarrow
+    # scanner then splits into one directory per partition.
+    staging_path = output_dir.with_name(f"{output_dir.name}.staging.parquet")
+    lf.sink_parquet(staging_path)
+
+    # Drop the partitions of a previous run, they might not be overwritten.
+    shutil.rmtree(output_dir, ignore_errors=True)
+    try:
+        ds.write_dataset(
+            ds.dataset(staging_path, format="parquet").scanner(),
+            output_dir,
+            format="parquet",
+            partitioning=partition_columns,
+            partitioning_flavor="hive",
+            basename_template="part-{i}.parquet",
+        )
+    finally:
+        staging_path.unlink(missing_ok=True)
+
+    logger.info(f"Wrote partitioned transactions to {output_dir}.")
+
+    return output_dir
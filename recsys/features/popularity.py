@@ -0,0 +1,305 @@
+import json
+import math
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+from loguru import logger
+
+from recsys.config import settings
+
+# Weight of a transaction, the interaction_score of a like.
+LIKE_WEIGHT = 2.0
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# Columns identifying an event, to fold every event once.
+EVENT_KEYS = ["user_id", "artwork_id", "t_dat"]
+EVENT_KEYS_SCHEMA = {"user_id": pl.Utf8, "artwork_id": pl.Utf8, "t_dat": pl.Int64}
+
+# Table name -> setting holding its half-life in days.
+TABLE_HALF_LIVES = {
+    "popularity": "POPULARITY_HALF_LIFE_DAYS",
+    "trending": "TRENDING_HALF_LIFE_DAYS",
+}
+
+
+class DecayedPopularity:
+    """
+    Exponentially time-decayed popularity of every artwork.
+
+    The score of an artwork is the sum of the weights of its events, each
+    decayed by `0.5 ** (age / half_life)`. Scores are kept as of `as_of`, the
+    time of the newest event folded in. Folding new events decays the stored
+    scores to the new `as_of` and adds the new events, so history is never
+    read again. Two tables are kept: 'popularity' with a long half-life and
+    'trending' with a short one.
+
+    Events may arrive up to `lateness_days` after newer ones were folded in.
+    The keys of the events within that window of `as_of` are kept, so a late
+    event is folded in, decayed by its own age, and an event read again is
+    not counted twice. Events older than the window are dropped.
+    """
+
+    def __init__(
+        self,
+        scores: pl.DataFrame,
+        as_of: int | None = None,
+        half_lives: dict[str, float] | None = None,
+        folded: pl.DataFrame | None = None,
+        lateness_days: float = settings.POPULARITY_LATENESS_DAYS,
+    ) -> None:
+        self.scores = scores
+        self.as_of = as_of
+        self.half_lives = half_lives or {
+            table: getattr(settings, setting) for table, setting in TABLE_HALF_LIVES.items()
+        }
+        self.folded = (
+            folded if folded is not None else pl.DataFrame(schema=EVENT_KEYS_SCHEMA)
+        )
+        self.lateness_days = lateness_days
+
+    @property
+    def watermark(self) -> int | None:
+        """
+        Oldest 't_dat' an event can have to be folded in, None before any event.
+        """
+        if self.as_of is None:
+            return None
+
+        return self.as_of - int(self.lateness_days * SECONDS_PER_DAY)
+
+    @classmethod
+    def empty(cls, artworks_df: pl.DataFrame) -> "DecayedPopularity":
+        """
+        Start from a zero score for every artwork of the catalog.
+        """
+        return cls(_zero_scores(artworks_df, list(TABLE_HALF_LIVES)))
+
+    def update(
+        self, events: pl.DataFrame, artworks_df: pl.DataFrame | None = None
+    ) -> "DecayedPopularity":
+        """
+        Fold new events into the scores.
+
+        Events already folded in are skipped, so the events since `watermark`
+        can be passed again.
+
+        Parameters:
+        - events (pl.DataFrame): Events with 'user_id', 'artwork_id', 't_dat' in seconds and 'weight', see `to_popularity_events`.
+        - artworks_df (pl.DataFrame | None): Catalog with 'artwork_id' and 'category'. New artworks start with a zero score.
+
+        Returns:
+        - DecayedPopularity: Scores as of the newest event.
+        """
+        scores = self.scores
+        if artworks_df is not None:
+            new_artworks = artworks_df.join(scores, on="artwork_id", how="anti")
+            scores = pl.concat(
+                [scores, _zero_scores(new_artworks, list(self.half_lives))]
+            )
+
+        events = events.join(
+            self.folded, on=EVENT_KEYS, how="anti", join_nulls=True
+        )
+        if self.watermark is not None:
+            too_late = events.filter(pl.col("t_dat") < self.watermark).height
+            if too_late > 0:
+                logger.warning(
+                    f"Dropping {too_late} events more than {self.lateness_days} days late."
+                )
+            events = events.filter(pl.col("t_dat") >= self.watermark)
+
+        if events.height == 0:
+            return DecayedPopularity(
+                scores, self.as_of, self.half_lives, self.folded, self.lateness_days
+            )
+
+        latest = int(events["t_dat"].max())
+        as_of = latest if self.as_of is None else max(self.as_of, latest)
+        elapsed = 0 if self.as_of is None else as_of - self.as_of
+
+        decayed_events = events.group_by("artwork_id").agg(
+            (pl.col("weight") * _decay(as_of - pl.col("t_dat"), half_life))
+            .sum()
+            .alias(table)
+            for table, half_life in self.half_lives.items()
+        )
+        unknown = decayed_events.join(scores, on="artwork_id", how="anti").height
+        if unknown > 0:
+            logger.warning(f"Dropping the events of {unknown} artworks not in the catalog.")
+
+        scores = scores.join(
+            decayed_events, on="artwork_id", how="left", suffix="_new"
+        ).select(
+            "artwork_id",
+            "category",
+            *(
+                (
+                    pl.col(table) * _decay(pl.lit(elapsed), half_life)
+                    + pl.col(f"{table}_new").fill_null(0.0)
+                ).alias(table)
+                for table, half_life in self.half_lives.items()
+            ),
+        )
+
+        popularity = DecayedPopularity(
+            scores, as_of, self.half_lives, lateness_days=self.lateness_days
+        )
+        popularity.folded = pl.concat(
+            [self.folded, events.select(EVENT_KEYS).cast(EVENT_KEYS_SCHEMA)]
+        ).filter(pl.col("t_dat") >= popularity.watermark)
+
+        return popularity
+
+    def tables(self, top_k: int = settings.POPULARITY_TOP_K) -> pl.DataFrame:
+        """
+        Materialize the top-k artworks of every table, overall and per category.
+
+        Returns:
+        - pl.DataFrame: 'table', 'category' (null for all categories), 'artwork_id' and 'score', best first.
+        """
+        tables = []
+        for table in self.half_lives:
+            ranked = self.scores.filter(pl.col(table) > 0).select(
+                pl.lit(table).alias("table"),
+                "category",
+                "artwork_id",
+                pl.col(table).alias("score"),
+            )
+            overall = ranked.sort("score", descending=True).head(top_k)
+            per_category = (
+                ranked.drop_nulls("category")
+                .sort("score", descending=True)
+                .group_by("category", maintain_order=True)
+                .head(top_k)
+            )
+            tables.extend(
+                [
+                    overall.with_columns(pl.lit(None, dtype=pl.Utf8).alias("category")),
+                    per_category.select(overall.columns),
+                ]
+            )
+
+        return pl.concat(tables)
+
+    def save(self, directory: Path = settings.POPULARITY_DIR) -> Path:
+        """
+        Write the scores and their materialized tables to `directory`.
+        """
+        directory = Path(directory)
+        tmp_dir = directory.with_name(directory.name + ".tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+
+        self.scores.write_parquet(tmp_dir / "scores.parquet")
+        self.tables().write_parquet(tmp_dir / "tables.parquet")
+        self.folded.write_parquet(tmp_dir / "folded.parquet")
+        (tmp_dir / "meta.json").write_text(
+            json.dumps(
+                {
+                    "as_of": self.as_of,
+                    "half_lives": self.half_lives,
+                    "lateness_days": self.lateness_days,
+                }
+            )
+        )
+
+        old_dir = directory.with_name(directory.name + ".old")
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if directory.exists():
+            os.replace(directory, old_dir)
+        os.replace(tmp_dir, directory)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+        return directory
+
+    @classmethod
+    def load(cls, directory: Path = settings.POPULARITY_DIR) -> "DecayedPopularity":
+        directory = Path(directory)
+        meta = json.loads((directory / "meta.json").read_text())
+        # Scores saved before the lateness window have no folded events.
+        folded_path = directory / "folded.parquet"
+
+        return cls(
+            pl.read_parquet(directory / "scores.parquet"),
+            as_of=meta["as_of"],
+            half_lives=meta["half_lives"],
+            folded=pl.read_parquet(folded_path) if folded_path.exists() else None,
+            lateness_days=meta.get("lateness_days", settings.POPULARITY_LATENESS_DAYS),
+        )
+
+
+class PopularityTables:
+    """
+    Read-only top-k lists saved by `DecayedPopularity.save`, for serving.
+
+    Every list is held as sorted arrays keyed by table and category, so a
+    lookup is a dictionary access and a slice.
+    """
+
+    def __init__(self, tables: pl.DataFrame) -> None:
+        self._tables = {
+            (key[0], key[1]): (
+                df["artwork_id"].to_numpy(),
+                df["score"].to_numpy(),
+            )
+            for key, df in tables.partition_by(
+                ["table", "category"], maintain_order=True, as_dict=True
+            ).items()
+        }
+
+    def top(
+        self, table: str = "popularity", category: str | None = None, k: int = 12
+    ) -> list[tuple[str, float]]:
+        """
+        Return the `k` best artworks of a table with their scores, within `category` if given.
+        """
+        artwork_ids, scores = self._tables.get(
+            (table, category), (np.empty(0, dtype=object), np.empty(0))
+        )
+
+        return list(zip(artwork_ids[:k].tolist(), scores[:k].tolist()))
+
+    @classmethod
+    def load(cls, directory: Path = settings.POPULARITY_DIR) -> "PopularityTables":
+        return cls(pl.read_parquet(Path(directory) / "tables.parquet"))
+
+
+def to_popularity_events(df: pl.DataFrame) -> pl.DataFrame:
+    """
+    Turn transactions or interactions into weighted popularity events.
+
+    Interactions are weighted by their 'interaction_score', so ignored
+    artworks do not count, and every transaction counts as a like.
+
+    Parameters:
+    - df (pl.DataFrame): Transactions or interactions with 'user_id', 'artwork_id' and 't_dat' in seconds.
+
+    Returns:
+    - pl.DataFrame: 'user_id', 'artwork_id', 't_dat' and 'weight' of every event with a positive weight.
+    """
+    if "interaction_score" in df.columns:
+        weight = pl.col("interaction_score").cast(pl.Float64)
+    else:
+        weight = pl.lit(LIKE_WEIGHT)
+
+    return df.select(
+        "user_id", "artwork_id", pl.col("t_dat").cast(pl.Int64), weight.alias("weight")
+    ).filter(pl.col("weight") > 0)
+
+
+def _decay(age_seconds: pl.Expr, half_life_days: float) -> pl.Expr:
+    rate = math.log(2) / (half_life_days * SECONDS_PER_DAY)
+
+    return (-rate * age_seconds.cast(pl.Float64)).exp()
+
+
+def _zero_scores(artworks_df: pl.DataFrame, tables: list[str]) -> pl.DataFrame:
+    return artworks_df.select(
+        pl.col("artwork_id").cast(pl.Utf8),
+        pl.col("category").cast(pl.Utf8),
+        *(pl.lit(0.0).alias(table) for table in tables),
+    )
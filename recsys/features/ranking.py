@@ -1,90 +1,169 @@
+from pathlib import Path
+
 import polars as pl
 
+from recsys.config import settings
+from recsys.features.id_dictionary import CODE_DTYPE, IdDictionary
+from recsys.features.negative_sampling import sample_negatives
+
+NEGATIVES_SEED = 2
+
+
 def compute_ranking_dataset(trans_fg, artworks_fg, users_fg) -> pl.DataFrame:
-    # Read data from the feature groups
-    trans_df = trans_fg.select(
-        ["artwork_id", "user_id"]
-    ).read(dataframe_type="polars")
-    artworks_df= artworks_fg.select_except(
-        ["description", "embeddings", "thumbnail_link"]
-    ).read(dataframe_type="polars")
-    users_df = users_fg.select(["user_id", "age"]).read(dataframe_type="polars")
-
-    # Convert artwork_id to string in both dataframes before joining
-    trans_df = trans_df.with_columns(pl.col("artwork_id").cast(pl.Utf8))
-    artworks_df = artworks_df.with_columns(pl.col("artwork_id").cast(pl.Utf8))
-
-    # Merge operations
-    df = trans_df.join(artworks_df, on="artwork_id", how="left")
-    df = df.join(users_df, on="user_id", how="left")
-
-    # Select query features
-    query_features = ["user_id", "age", "artwork_id"]
-    df = df.select(query_features)
+    """
+    Build the ranking dataset of positive and sampled negative user-artwork pairs.
+
+    Parameters:
+    - trans_fg: Transactions feature group, DataFrame, LazyFrame or Parquet path.
+    - artworks_fg: Artworks feature group, DataFrame, LazyFrame or Parquet path.
+    - users_fg: Users feature group, DataFrame, LazyFrame or Parquet path.
+
+    Returns:
+    - pl.DataFrame: Ranking dataset with user, artwork and item features and a 'label' column.
+    """
+    return compute_ranking_dataset_lazy(trans_fg, artworks_fg, users_fg).collect(
+        streaming=True
+    )
+
+
+def sink_ranking_dataset(
+    trans_fg, artworks_fg, users_fg, output_path: str | Path
+) -> Path:
+    """
+    Stream the ranking dataset to a Parquet file.
+
+    Only the integer codes of the pairs are held in memory: ids, ages and
+    item features are joined in by the streamed plan.
+
+    Parameters:
+    - trans_fg: Transactions feature group, DataFrame, LazyFrame or Parquet path.
+    - artworks_fg: Artworks feature group, DataFrame, LazyFrame or Parquet path.
+    - users_fg: Users feature group, DataFrame, LazyFrame or Parquet path.
+    - output_path (str | Path): Destination Parquet file.
+
+    Returns:
+    - Path: Path of the written Parquet file.
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    compute_ranking_dataset_lazy(trans_fg, artworks_fg, users_fg).sink_parquet(
+        output_path
+    )
+
+    return output_path
+
+
+def compute_ranking_dataset_lazy(
+    trans_fg,
+    artworks_fg,
+    users_fg,
+    negatives_per_positive: int = settings.RANKING_NEGATIVES_PER_POSITIVE,
+    popularity_exponent: float = settings.RANKING_NEGATIVES_POPULARITY_EXPONENT,
+    seed: int = NEGATIVES_SEED,
+) -> pl.LazyFrame:
+    """
+    Build the ranking dataset as a single streamable LazyFrame plan.
+
+    Only the columns the dataset needs are read from every source. Negatives
+    are sampled on integer codes by `sample_negatives`: they keep the user and
+    age of a positive pair, draw liked artworks uniformly, or by popularity
+    with a positive `popularity_exponent`, and never collide with a positive
+    pair. Only the int32 codes of the pairs and the user and artwork lookup
+    tables are materialized: the negatives are decoded back to ids and ages
+    with joins inside the plan.
+
+    Parameters:
+    - trans_fg: Transactions feature group, DataFrame, LazyFrame or Parquet path.
+    - artworks_fg: Artworks feature group, DataFrame, LazyFrame or Parquet path.
+    - users_fg: Users feature group, DataFrame, LazyFrame or Parquet path.
+    - negatives_per_positive (int): Number of negative pairs sampled for every positive pair.
+    - popularity_exponent (float): Exponent applied to artwork popularity when sampling negatives, 0 samples uniformly.
+    - seed (int): Seed of the negative sampling.
+
+    Returns:
+    - pl.LazyFrame: Lazy ranking dataset.
+    """
+    trans_lf = _scan_source(trans_fg, ["artwork_id", "user_id"]).with_columns(
+        pl.col("artwork_id").cast(pl.Utf8)
+    )
+    users_lf = _scan_source(users_fg, ["user_id", "age"])
+    item_lf = (
+        _scan_source(artworks_fg, ["artwork_id", "title", "description", "category"])
+        .with_columns(pl.col("artwork_id").cast(pl.Utf8))
+        .unique(subset=["artwork_id"])
+    )
 
     # Create positive pairs
-    positive_pairs = df.clone()
-
-    # Calculate number of negative pairs
-    n_neg = len(positive_pairs) * 10
-
-    # Create negative pairs DataFrame
-    artwork_ids = (df.select("artwork_id")
-                    .unique()
-                    .sample(n=n_neg, with_replacement=True, seed=2)
-                    .get_column("artwork_id"))
-    
-    user_ids = (df.select("user_id")
-                     .sample(n=n_neg, with_replacement=True, seed=3)
-                     .get_column("user_id"))
-
-    other_features = (df.select(["age"])
-                       .sample(n=n_neg, with_replacement=True, seed=4))
-
-    # Construct negative pairs
-    negative_pairs = pl.DataFrame({
-        "artwork_id": artwork_ids,
-        "user_id": user_ids,
-        "age": other_features.get_column("age"),
-    })
-
-    # Add labels
-    positive_pairs = positive_pairs.with_columns(pl.lit(1).alias("label"))
-    negative_pairs = negative_pairs.with_columns(pl.lit(0).alias("label"))
-
-    # Concatenate positive and negative pairs
-    ranking_df = pl.concat([
-        positive_pairs,
-        negative_pairs.select(positive_pairs.columns)
-    ])
-
-    # Process item features
-    item_df = artworks_fg.read(dataframe_type="polars")
-    
-    # Convert artwork_id to string in item_df before final join
-    item_df = item_df.with_columns(pl.col("artwork_id").cast(pl.Utf8))
-    
-    # Keep unique artwork_ids and select columns
-    item_df = (
-        item_df.unique(subset=["artwork_id"])
-        .select([
-            "artwork_id",
-            "title",
-            "description",
-            "category"
-            # "graphical_appearance_name",
-            # "colour_group_name",
-            # "perceived_colour_value_name",
-            # "perceived_colour_master_name",
-            # "department_name",
-            # "index_name",
-            # "index_group_name",
-            # "section_name",
-            # "garment_group_name",
-        ])
+    positive_pairs = trans_lf.join(users_lf, on="user_id", how="left").select(
+        ["user_id", "age", "artwork_id"]
+    )
+
+    # Dictionary-encode users and liked artworks to sample negatives on ints.
+    # Users are encoded in the order of `user_ages`, so a user code indexes its age.
+    user_ages = (
+        positive_pairs.select(["user_id", "age"])
+        .unique(subset=["user_id"])
+        .sort("user_id")
+        .collect(streaming=True)
+    )
+    users = IdDictionary("user_id", user_ages["user_id"])
+    artworks = IdDictionary(
+        "artwork_id",
+        positive_pairs.select(pl.col("artwork_id").unique().sort()).collect(
+            streaming=True
+        )["artwork_id"],
+    )
+    positive_codes = positive_pairs.select(
+        users.encode("user_id"), artworks.encode("artwork_id")
+    ).collect(streaming=True)
+
+    negative_user_idx, negative_artwork_idx = sample_negatives(
+        positive_codes["user_idx"].to_numpy(),
+        positive_codes["artwork_idx"].to_numpy(),
+        num_items=len(artworks),
+        negatives_per_positive=negatives_per_positive,
+        popularity_exponent=popularity_exponent,
+        seed=seed,
+    )
+    negative_pairs = (
+        pl.LazyFrame(
+            [
+                pl.Series("user_idx", negative_user_idx, dtype=CODE_DTYPE),
+                pl.Series("artwork_idx", negative_artwork_idx, dtype=CODE_DTYPE),
+            ]
+        )
+        .join(
+            users.to_frame().with_columns(user_ages["age"]).lazy(),
+            on="user_idx",
+            how="left",
+        )
+        .join(artworks.to_frame().lazy(), on="artwork_idx", how="left")
+        .select(["user_id", "age", "artwork_id"])
+    )
+
+    # Concatenate labeled positive and negative pairs
+    ranking_lf = pl.concat(
+        [
+            positive_pairs.with_columns(pl.lit(1).alias("label")),
+            negative_pairs.with_columns(pl.lit(0).alias("label")),
+        ]
     )
 
     # Final merge with item features
-    ranking_df = ranking_df.join(item_df, on="artwork_id", how="left")
+    return ranking_lf.join(item_lf, on="artwork_id", how="left")
+
+
+def _scan_source(source, columns: list[str]) -> pl.LazyFrame:
+    """
+    Return a LazyFrame over the given columns of a feature group, frame or Parquet path.
+    """
+    if isinstance(source, (str, Path)):
+        return pl.scan_parquet(source).select(columns)
+    if isinstance(source, pl.LazyFrame):
+        return source.select(columns)
+    if isinstance(source, pl.DataFrame):
+        return source.lazy().select(columns)
 
-    return ranking_df
\ No newline at end of file
+    # Feature groups are read eagerly, with the projection pushed to the feature store.
+    return source.select(columns).read(dataframe_type="polars").lazy()
@@ -0,0 +1,182 @@
+import hashlib
+import mmap
+import os
+import shutil
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from io import BytesIO
+from pathlib import Path
+
+import polars as pl
+import requests
+from loguru import logger
+from PIL import Image, UnidentifiedImageError
+
+from recsys.config import settings
+
+PACK_FILE = "thumbnails.pack"
+INDEX_FILE = "thumbnails.index.parquet"
+JPEG_QUALITY = 90
+REQUEST_TIMEOUT = 30
+
+
+class ThumbnailPack:
+    """
+    Resized thumbnails stored back to back in a single memory mapped file.
+
+    The pack is content addressed: identical thumbnails are stored once and
+    every artwork points to the offset and length of its JPEG bytes. Reading
+    a thumbnail is a dictionary lookup and a slice of the mapping.
+    """
+
+    def __init__(self, directory: Path = settings.THUMBNAIL_PACK_DIR) -> None:
+        directory = Path(directory)
+        index = pl.read_parquet(directory / INDEX_FILE)
+        self._entries = {
+            artwork_id: (offset, length)
+            for artwork_id, offset, length in index.select(
+                "artwork_id", "offset", "length"
+            ).iter_rows()
+        }
+
+        with open(directory / PACK_FILE, "rb") as f:
+            # An empty file cannot be mapped.
+            self._mmap = (
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                if os.fstat(f.fileno()).st_size > 0
+                else b""
+            )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, artwork_id: str) -> bool:
+        return artwork_id in self._entries
+
+    def get_bytes(self, artwork_id: str) -> bytes | None:
+        entry = self._entries.get(artwork_id)
+        if entry is None:
+            return None
+
+        offset, length = entry
+        return self._mmap[offset : offset + length]
+
+    def get_image(self, artwork_id: str) -> Image.Image | None:
+        data = self.get_bytes(artwork_id)
+        if data is None:
+            return None
+
+        return Image.open(BytesIO(data))
+
+
+def build_thumbnail_pack(
+    artworks_df: pl.DataFrame,
+    directory: Path = settings.THUMBNAIL_PACK_DIR,
+    width: int = settings.THUMBNAIL_WIDTH,
+    height: int = settings.THUMBNAIL_HEIGHT,
+    num_workers: int = settings.THUMBNAIL_DOWNLOAD_WORKERS,
+) -> Path:
+    """
+    Download, resize and pack the thumbnail of every artwork.
+
+    Thumbnails are downloaded on a bounded thread pool and resized like the
+    UI does, with LANCZOS. The main thread appends every resized JPEG to the
+    pack as it completes. At most two downloads per worker are in flight, so
+    memory is bounded by the window, not by the number of artworks. Thumbnails that fail to download or decode are
+    left out; the UI downloads those at render time as before. The pack
+    replaces a previous one only once it is complete.
+
+    Parameters:
+    - artworks_df (pl.DataFrame): Artworks with 'artwork_id' and 'thumbnail_link'.
+    - directory (Path): Directory of the pack and its index.
+    - width (int): Width of the packed thumbnails.
+    - height (int): Height of the packed thumbnails.
+    - num_workers (int): Number of concurrent downloads.
+
+    Returns:
+    - Path: Directory of the pack.
+    """
+    directory = Path(directory)
+    tmp_dir = directory.with_name(directory.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    artworks = artworks_df.select("artwork_id", "thumbnail_link").drop_nulls().rows()
+    blobs: dict[str, tuple[int, int]] = {}
+    index = []
+    num_failed = 0
+
+    with open(tmp_dir / PACK_FILE, "wb") as pack, requests.Session() as session:
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=num_workers)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        def add(artwork_id: str, data: bytes | None) -> None:
+            nonlocal num_failed
+            if data is None:
+                num_failed += 1
+                return
+
+            digest = hashlib.sha256(data).hexdigest()
+            if digest not in blobs:
+                blobs[digest] = (pack.tell(), len(data))
+                pack.write(data)
+            offset, length = blobs[digest]
+            index.append((artwork_id, digest, offset, length))
+
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            max_in_flight = 2 * num_workers
+            in_flight = {}
+            for artwork_id, link in artworks:
+                if len(in_flight) >= max_in_flight:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        add(in_flight.pop(future), future.result())
+                in_flight[
+                    executor.submit(_fetch_thumbnail, session, link, width, height)
+                ] = artwork_id
+
+            for future in as_completed(in_flight):
+                add(in_flight[future], future.result())
+
+    pl.DataFrame(
+        index,
+        schema={
+            "artwork_id": pl.Utf8,
+            "digest": pl.Utf8,
+            "offset": pl.Int64,
+            "length": pl.Int64,
+        },
+        orient="row",
+    ).sort("artwork_id").write_parquet(tmp_dir / INDEX_FILE)
+
+    old_dir = directory.with_name(directory.name + ".old")
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if directory.exists():
+        os.replace(directory, old_dir)
+    os.replace(tmp_dir, directory)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    logger.info(
+        f"Packed {len(index)} thumbnails as {len(blobs)} distinct images, "
+        f"{num_failed} failed."
+    )
+
+    return directory
+
+
+def _fetch_thumbnail(
+    session: requests.Session, link: str, width: int, height: int
+) -> bytes | None:
+    try:
+        response = session.get(link, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        img = Image.open(BytesIO(response.content)).convert("RGB")
+    except (UnidentifiedImageError, requests.RequestException, OSError):
+        return None
+
+    output = BytesIO()
+    img.resize((width, height), Image.LANCZOS).save(
+        output, format="JPEG", quality=JPEG_QUALITY
+    )
+
+    return output.getvalue()
@@ -5,9 +5,12 @@ from hopsworks import udf
 from datetime import datetime
 
 
-def compute_features_transactions(df: pl.DataFrame) -> pl.DataFrame:
+def compute_features_transactions(
+    df: pl.DataFrame | pl.LazyFrame,
+) -> pl.DataFrame | pl.LazyFrame:
     required_columns = ["transaction_id", "user_id", "artwork_id", "t_dat"]
-    missing_columns = [col for col in required_columns if col not in df.columns]
+    columns = df.collect_schema().names()
+    missing_columns = [col for col in required_columns if col not in columns]
     if missing_columns:
         raise ValueError(
             f"Columns {', '.join(missing_columns)} not found in the DataFrame"
@@ -1,9 +1,18 @@
-import random
+import tempfile
+from collections.abc import Iterable, Iterator
+from pathlib import Path
 
 import polars as pl
+import pyarrow.parquet as pq
 from loguru import logger
 
-from recsys.config import UserDatasetSize
+from recsys.config import UserDatasetSize, UserSamplingMethod, settings
+
+
+SAMPLING_SEED = 27
+SAMPLING_BATCH_SIZE = 100_000
+
+_SAMPLE_KEY = "_sample_key"
 
 
 class DatasetSampler:
@@ -13,8 +22,9 @@ class DatasetSampler:
         UserDatasetSize.SMALL: 1_000,
     }
 
-    def __init__(self, size: UserDatasetSize) -> None:
+    def __init__(self, size: UserDatasetSize, seed: int = SAMPLING_SEED) -> None:
         self._size = size
+        self._seed = seed
 
     @classmethod
     def get_supported_sizes(cls) -> dict:
@@ -23,11 +33,9 @@ class DatasetSampler:
     def sample(
         self, users_df: pl.DataFrame, transations_df: pl.DataFrame
     ) -> dict[str, pl.DataFrame]:
-        random.seed(27)
-
         n_users = self._SIZES[self._size]
         logger.info(f"Sampling {n_users} users.")
-        users_df = users_df.sample(n=n_users)
+        users_df = users_df.sample(n=n_users, seed=self._seed)
 
         logger.info(
             f"Number of transactions for all the users: {transations_df.height}"
@@ -40,7 +48,216 @@ class DatasetSampler:
         )
 
         return {"users": users_df, "transactions": transations_df}
-    
+
+    def sample_lazy(
+        self, users_lf: pl.LazyFrame, transactions_lf: pl.LazyFrame
+    ) -> dict[str, pl.LazyFrame]:
+        """
+        Lazily sample users and their transactions.
+
+        Users are ranked by a seeded hash of their `user_id` and the lowest
+        ranks are kept, so the sample is deterministic and only ever holds
+        `n_users` rows. Transactions are restricted to the sampled users with
+        a semi-join inside the same plan.
+
+        Parameters:
+        - users_lf (pl.LazyFrame): Users with a 'user_id' column.
+        - transactions_lf (pl.LazyFrame): Transactions with a 'user_id' column.
+
+        Returns:
+        - dict[str, pl.LazyFrame]: Lazy 'users' and 'transactions' samples.
+        """
+        n_users = self._SIZES[self._size]
+        logger.info(f"Sampling {n_users} users.")
+
+        users_lf = (
+            users_lf.with_columns(self._sample_key())
+            .bottom_k(n_users, by=_SAMPLE_KEY)
+            .drop(_SAMPLE_KEY)
+        )
+        transactions_lf = transactions_lf.join(
+            users_lf.select("user_id"), on="user_id", how="semi"
+        )
+
+        return {"users": users_lf, "transactions": transactions_lf}
+
+    def sample_streaming(
+        self,
+        users: str | Path | pl.LazyFrame | Iterable[pl.DataFrame],
+        transactions_lf: pl.LazyFrame,
+        method: UserSamplingMethod = settings.USER_SAMPLING_METHOD,
+        stratify_by: str | None = settings.USER_SAMPLING_STRATIFY_BY,
+    ) -> dict[str, pl.LazyFrame]:
+        """
+        Sample users and their transactions in a single pass over the users.
+
+        - HASH keeps every user whose seeded `user_id` hash falls under
+          `n_users / total_users`. The predicate is applied inside the users and
+          the transactions scans, nothing is materialized and the sample holds
+          about `n_users` users.
+        - RESERVOIR keeps exactly `n_users` users: the users with the lowest
+          seeded hashes, tracked batch by batch. With `stratify_by`, every
+          stratum gets a share of the sample proportional to its size.
+
+        Both methods are deterministic for a given seed and independent of the
+        order of the rows.
+
+        Parameters:
+        - users (str | Path | pl.LazyFrame | Iterable[pl.DataFrame]): Users, as a CSV or Parquet path, a LazyFrame or DataFrame batches. HASH needs a path or LazyFrame.
+        - transactions_lf (pl.LazyFrame): Transactions with a 'user_id' column.
+        - method (UserSamplingMethod): Sampling method.
+        - stratify_by (str | None): Column to stratify the RESERVOIR sample by, e.g. 'age_group'.
+
+        Returns:
+        - dict[str, pl.LazyFrame]: Lazy 'users' and 'transactions' samples.
+        """
+        if method == UserSamplingMethod.HASH:
+            users_lf = _scan_users(users)
+            in_sample = self._hash_threshold(users_lf)
+            users_lf = users_lf.filter(in_sample)
+            transactions_lf = transactions_lf.filter(in_sample)
+        else:
+            users_lf = self._reservoir(iter_batches(users), stratify_by).lazy()
+
+        # An inner join on the unique user ids keeps the plan streamable.
+        transactions_lf = transactions_lf.join(
+            users_lf.select("user_id"), on="user_id"
+        )
+
+        return {"users": users_lf, "transactions": transactions_lf}
+
+    def _sample_key(self) -> pl.Expr:
+        return pl.col("user_id").hash(self._seed).alias(_SAMPLE_KEY)
+
+    def _hash_threshold(self, users_lf: pl.LazyFrame) -> pl.Expr:
+        # Counting rows only reads the Parquet metadata or the CSV line breaks.
+        total_users = users_lf.select(pl.len()).collect().item()
+        n_users = self._SIZES[self._size]
+        fraction = min(1.0, n_users / max(total_users, 1))
+        logger.info(
+            f"Sampling about {n_users} of {total_users} users by user_id hash."
+        )
+
+        threshold = min(int(fraction * 2**64), 2**64 - 1)
+
+        return self._sample_key() <= pl.lit(threshold, dtype=pl.UInt64)
+
+    def _reservoir(
+        self, user_batches: Iterable[pl.DataFrame], stratify_by: str | None
+    ) -> pl.DataFrame:
+        """
+        Keep the `n_users` users with the lowest sample keys, per stratum if `stratify_by` is set.
+        """
+        n_users = self._SIZES[self._size]
+        strata = [stratify_by] if stratify_by else []
+        reservoir = None
+        stratum_sizes = []
+
+        for batch in user_batches:
+            batch = batch.with_columns(self._sample_key())
+            if strata:
+                stratum_sizes.append(batch.group_by(strata).len())
+
+            reservoir = batch if reservoir is None else pl.concat(
+                [reservoir, batch], how="vertical_relaxed"
+            )
+            reservoir = _lowest_keys(reservoir, n_users, strata)
+
+        if reservoir is None:
+            raise ValueError("No users to sample from.")
+
+        if strata:
+            quotas = _proportional_quotas(
+                pl.concat(stratum_sizes).group_by(strata).agg(pl.col("len").sum()),
+                n_users,
+            )
+            reservoir = reservoir.join(quotas, on=strata).filter(
+                pl.col(_SAMPLE_KEY).rank("ordinal").over(strata) <= pl.col("quota")
+            ).drop("quota")
+
+        logger.info(
+            f"Sampled {reservoir.height} users"
+            + (f" stratified by '{stratify_by}'." if stratify_by else ".")
+        )
+
+        return reservoir.sort(_SAMPLE_KEY).drop(_SAMPLE_KEY)
+
+
+def iter_batches(
+    source: str | Path | pl.LazyFrame | Iterable[pl.DataFrame],
+    batch_size: int = SAMPLING_BATCH_SIZE,
+) -> Iterator[pl.DataFrame]:
+    """
+    Read a CSV or Parquet file, a LazyFrame or DataFrame batches in batches of at most `batch_size` rows.
+    """
+    if isinstance(source, pl.DataFrame):
+        yield from source.iter_slices(batch_size)
+    elif isinstance(source, (str, Path)) and Path(source).suffix == ".csv":
+        reader = pl.read_csv_batched(source, batch_size=batch_size)
+        while batches := reader.next_batches(1):
+            yield from batches
+    elif isinstance(source, (str, Path)):
+        yield from _iter_parquet_batches(source, batch_size)
+    elif isinstance(source, pl.LazyFrame):
+        # The plan is run once, streamed to a temporary Parquet file that is
+        # then read back batch by batch, so memory stays bounded.
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "users.parquet"
+            source.sink_parquet(path)
+            yield from _iter_parquet_batches(path, batch_size)
+    else:
+        yield from source
+
+
+def _iter_parquet_batches(
+    path: str | Path, batch_size: int
+) -> Iterator[pl.DataFrame]:
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=batch_size):
+        yield pl.from_arrow(batch)
+
+
+def _scan_users(source: str | Path | pl.LazyFrame) -> pl.LazyFrame:
+    if isinstance(source, pl.LazyFrame):
+        return source
+    if isinstance(source, (str, Path)) and Path(source).suffix == ".csv":
+        return pl.scan_csv(source)
+    if isinstance(source, (str, Path)):
+        return pl.scan_parquet(source)
+
+    raise TypeError(
+        f"Users must be a CSV or Parquet path or a LazyFrame, got {type(source).__name__}."
+    )
+
+
+def _lowest_keys(df: pl.DataFrame, k: int, strata: list[str]) -> pl.DataFrame:
+    if not strata:
+        return df.bottom_k(k, by=_SAMPLE_KEY)
+
+    return df.filter(pl.col(_SAMPLE_KEY).rank("ordinal").over(strata) <= k)
+
+
+def _proportional_quotas(stratum_sizes: pl.DataFrame, n: int) -> pl.DataFrame:
+    """
+    Split `n` over the strata proportionally to their 'len' with the largest remainder method.
+    """
+    total = stratum_sizes["len"].sum()
+    n = min(n, total)
+    shares = stratum_sizes.with_columns(share=pl.col("len") * n / total)
+    shares = shares.with_columns(quota=pl.col("share").floor().cast(pl.Int64))
+
+    remainder = n - shares["quota"].sum()
+    shares = shares.with_columns(
+        quota=pl.col("quota")
+        + (
+            (pl.col("share") - pl.col("quota")).rank("ordinal", descending=True)
+            <= remainder
+        ).cast(pl.Int64)
+    )
+
+    return shares.drop(["len", "share"])
+
+
 def drop_na_age(df: pl.DataFrame) -> pl.DataFrame:
     """
     Drop rows with null values in the 'age' column.
@@ -80,10 +297,11 @@ def create_age_group() -> pl.Expr:
 
 
 def compute_features_users(
-    df: pl.DataFrame, drop_null_age: bool = False
-) -> pl.DataFrame:
+    df: pl.DataFrame | pl.LazyFrame, drop_null_age: bool = False
+) -> pl.DataFrame | pl.LazyFrame:
     required_columns = ["user_id", "age", "preference", "gender"]
-    missing_columns = [col for col in required_columns if col not in df.columns]
+    columns = df.collect_schema().names()
+    missing_columns = [col for col in required_columns if col not in columns]
     if missing_columns:
         raise ValueError(
             f"Columns {', '.join(missing_columns)} not found in the DataFrame"
@@ -1,9 +1,25 @@
 from hsfs.feature import Feature
 
+from recsys.config import EmbeddingEncoding
+
+### Versions. ###
+
+# Inserts into a feature group fail once its schema differs from the stored
+# one, so a schema change goes to a new version, and so do the feature views
+# reading it. The feature views read by the deployed transformers are pinned
+# in `recsys/inference` too.
+USERS_FEATURE_GROUP_VERSION = 2  # Added 'user_idx'.
+# Added 'artwork_idx', float32 or int8 'embeddings' and int8 'embeddings_scale'.
+ARTWORKS_FEATURE_GROUP_VERSION = 2
+USERS_FEATURE_VIEW_VERSION = 2
+ARTWORKS_FEATURE_VIEW_VERSION = 2
+RETRIEVAL_FEATURE_VIEW_VERSION = 2
+
 ### Post ingestion format.###
 
 user_feature_descriptions = [
     {"name": "user_id", "description": "Unique identifier for each user."},
+    {"name": "user_idx", "description": "Dense integer code of the user."},
     {"name": "age", "description": "Age of the user."},
     {"name": "preference", "description": "Preference of the user."},
     {
@@ -59,27 +75,50 @@ ranking_feature_descriptions = [
 
 ### Pre ingestion format. ###
 
-artwork_feature_description = [
-    Feature(
-        name="artwork_id", type="string", description="Identifier for the artwork."
-    ),
-    Feature(name="title", type="string", description="Name of the artwork."),
-    Feature(
-        name="category",
-        type="string",
-        description="Type of artwork",
-    ),
-    Feature(
-        name="thumbnail_link", type="string", description="URL of the artwork."
-    ),
-    Feature(
-        name="description",
-        type="string",
-        description="Description of the artwork.",
-    ),
-    Feature(
-        name="embeddings",
-        type="array<double>",
-        description="Vector embeddings of the artwork description.",
-    )
-]
+embedding_feature_types = {
+    EmbeddingEncoding.FLOAT64: "array<double>",
+    EmbeddingEncoding.FLOAT32: "array<float>",
+    EmbeddingEncoding.INT8: "array<tinyint>",
+}
+
+
+def artwork_feature_description(encoding: EmbeddingEncoding) -> list[Feature]:
+    features = [
+        Feature(
+            name="artwork_id", type="string", description="Identifier for the artwork."
+        ),
+        Feature(
+            name="artwork_idx",
+            type="int",
+            description="Dense integer code of the artwork.",
+        ),
+        Feature(name="title", type="string", description="Name of the artwork."),
+        Feature(
+            name="category",
+            type="string",
+            description="Type of artwork",
+        ),
+        Feature(
+            name="thumbnail_link", type="string", description="URL of the artwork."
+        ),
+        Feature(
+            name="description",
+            type="string",
+            description="Description of the artwork.",
+        ),
+        Feature(
+            name="embeddings",
+            type=embedding_feature_types[encoding],
+            description="Vector embeddings of the artwork description.",
+        ),
+    ]
+    if encoding == EmbeddingEncoding.INT8:
+        features.append(
+            Feature(
+                name="embeddings_scale",
+                type="float",
+                description="Per-vector scale of the int8 quantized embeddings.",
+            )
+        )
+
+    return features
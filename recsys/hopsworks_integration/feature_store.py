@@ -1,9 +1,16 @@
 import hopsworks
 import pandas as pd
+import polars as pl
 from hsfs import embedding
 from loguru import logger
 
-from recsys.config import settings
+from recsys.config import EmbeddingEncoding, settings
+from recsys.features.embedding_codec import (
+    decode_embeddings,
+    embeddings_to_numpy,
+    encode_embeddings,
+    recall_at_k,
+)
 from recsys.hopsworks_integration import constants
 from recsys.features.transactions import month_cos, month_sin
 
@@ -33,7 +40,7 @@ def create_users_feature_group(fs, df: pd.DataFrame, online_enabled: bool = True
     users_fg = fs.get_or_create_feature_group(
         name="users",
         description="Users data including age and gender",
-        version=1,
+        version=constants.USERS_FEATURE_GROUP_VERSION,
         primary_key=["user_id"],
         online_enabled=online_enabled,
     )
@@ -47,28 +54,72 @@ def create_users_feature_group(fs, df: pd.DataFrame, online_enabled: bool = True
 
 def create_artworks_feature_group(
     fs,
-    df: pd.DataFrame,
+    df: pl.DataFrame,
     artworks_description_embedding_dim: int,
     online_enabled: bool = True,
+    encoding: EmbeddingEncoding = settings.ARTWORKS_EMBEDDING_ENCODING,
 ):
+    if isinstance(df, pd.DataFrame):
+        df = pl.from_pandas(df)
+
     # Create the Embedding Index for the artworks description embedding.
-    emb = embedding.EmbeddingIndex()
-    emb.add_embedding("embeddings", artworks_description_embedding_dim)
+    # Vector search needs float vectors, so int8 embeddings are stored without
+    # one. Readers decode them with `read_artwork_embeddings` and search in memory.
+    if encoding == EmbeddingEncoding.INT8:
+        emb = None
+        recall = recall_at_k(embeddings_to_numpy(df["embeddings"]), encoding)
+        logger.info(f"Recall@10 of int8 artwork embeddings: {recall:.4f}")
+        if recall < settings.ARTWORKS_EMBEDDING_MIN_RECALL:
+            raise ValueError(
+                f"Recall@10 of int8 artwork embeddings is {recall:.4f}, below "
+                f"ARTWORKS_EMBEDDING_MIN_RECALL={settings.ARTWORKS_EMBEDDING_MIN_RECALL}. "
+                "Store them as float32 instead."
+            )
+    else:
+        emb = embedding.EmbeddingIndex()
+        emb.add_embedding("embeddings", artworks_description_embedding_dim)
 
+    features = constants.artwork_feature_description(encoding)
     artworks_fg = fs.get_or_create_feature_group(
         name="artworks",
-        version=1,
+        version=constants.ARTWORKS_FEATURE_GROUP_VERSION,
         description="Artworks data including category, description, and title",
         primary_key=["artwork_id"],
         online_enabled=online_enabled,
-        features=constants.artwork_feature_description,
+        features=features,
         embedding_index=emb,
     )
-    artworks_fg.insert(df, wait=True)
+    # An existing version keeps the encoding it was created with.
+    stored_type = artworks_fg.get_feature("embeddings").type
+    expected_type = constants.embedding_feature_types[encoding]
+    if stored_type != expected_type:
+        raise ValueError(
+            f"The artworks feature group stores '{stored_type}' embeddings, not "
+            f"'{expected_type}'. Bump ARTWORKS_FEATURE_GROUP_VERSION to change the encoding."
+        )
+    artworks_fg.insert(
+        encode_embeddings(df, encoding).select(feature.name for feature in features),
+        wait=True,
+    )
 
     return artworks_fg
 
 
+def read_artwork_embeddings(
+    artworks_fg, encoding: EmbeddingEncoding = settings.ARTWORKS_EMBEDDING_ENCODING
+) -> pl.DataFrame:
+    """
+    Read artwork ids and their float32 description embeddings from the artworks feature group.
+    """
+    columns = ["artwork_id", "embeddings"]
+    if encoding == EmbeddingEncoding.INT8:
+        columns.append("embeddings_scale")
+
+    df = artworks_fg.select(columns).read(dataframe_type="polars")
+
+    return decode_embeddings(df, encoding)
+
+
 def create_transactions_feature_group(
     fs, df: pd.DataFrame, online_enabled: bool = True
 ):
@@ -159,8 +210,12 @@ def create_candidate_embeddings_feature_group(
 
 def create_retrieval_feature_view(fs):
     trans_fg = fs.get_feature_group(name="transactions", version=1)
-    users_fg = fs.get_feature_group(name="users", version=1)
-    artworks_fg = fs.get_feature_group(name="artworks", version=1)
+    users_fg = fs.get_feature_group(
+        name="users", version=constants.USERS_FEATURE_GROUP_VERSION
+    )
+    artworks_fg = fs.get_feature_group(
+        name="artworks", version=constants.ARTWORKS_FEATURE_GROUP_VERSION
+    )
 
     # You'll need to join these three data sources to make the data compatible
     # with out retrieval model. Recall that each row in the `transactions` feature group
@@ -172,11 +227,11 @@ def create_retrieval_feature_view(fs):
             ["user_id", "artwork_id", "t_dat"]
         )
         .join(
-            users_fg.select(["age", "gender", "age_group"]),
+            users_fg.select(["user_idx", "age", "gender", "age_group"]),
             on="user_id",
         )
         .join(
-            artworks_fg.select(["category", "description"]),
+            artworks_fg.select(["artwork_idx", "category", "description"]),
             on="artwork_id",
         )
     )
@@ -184,7 +239,7 @@ def create_retrieval_feature_view(fs):
     feature_view = fs.get_or_create_feature_view(
         name="retrieval",
         query=selected_features,
-        version=1,
+        version=constants.RETRIEVAL_FEATURE_VIEW_VERSION,
     )
 
     return feature_view
@@ -193,12 +248,12 @@ def create_retrieval_feature_view(fs):
 def create_ranking_feature_views(fs):
     users_fg = fs.get_feature_group(
         name="users",
-        version=1,
+        version=constants.USERS_FEATURE_GROUP_VERSION,
     )
 
     artworks_fg = fs.get_feature_group(
         name="artworks",
-        version=1,
+        version=constants.ARTWORKS_FEATURE_GROUP_VERSION,
     )
 
     rank_fg = fs.get_feature_group(
@@ -214,14 +269,18 @@ def create_ranking_feature_views(fs):
     fs.get_or_create_feature_view(
         name="users",
         query=selected_features_users,
-        version=1,
+        version=constants.USERS_FEATURE_VIEW_VERSION,
     )
 
-    selected_features_artworks = artworks_fg.select_except(["embeddings"])
+    # The UI and the ranking transformer read artwork feature vectors by position.
+    excluded_artwork_features = ["embeddings", "artwork_idx"]
+    if settings.ARTWORKS_EMBEDDING_ENCODING == EmbeddingEncoding.INT8:
+        excluded_artwork_features.append("embeddings_scale")
+    selected_features_artworks = artworks_fg.select_except(excluded_artwork_features)
     fs.get_or_create_feature_view(
         name="artworks",
         query=selected_features_artworks,
-        version=1,
+        version=constants.ARTWORKS_FEATURE_VIEW_VERSION,
     )
 
     # Select features
@@ -6,7 +6,7 @@ from hsml.model_schema import ModelSchema
 from hsml.schema import Schema
 from hsml.transformer import Transformer
 
-from recsys.config import settings
+from recsys.config import TowerIdMode, settings
 from recsys.training.two_tower import ItemTower, QueryTower
 
 
@@ -16,22 +16,46 @@ class HopsworksQueryModel:
     def __init__(self, model: QueryTower) -> None:
         self.model = model
 
-    def save_to_local(self, output_path: str = "query_model") -> str:
+    def input_spec(self) -> dict:
         # Define the input specifications for the instances
         instances_spec = {
             "user_id": tf.TensorSpec(
                 shape=(None,), dtype=tf.string, name="user_id"
             ),  # Specification for user IDs
-            # "age": tf.TensorSpec(
-            #     shape=(None,), dtype=tf.float64, name="age"
-            # ),  # Specification for age
+            "age": tf.TensorSpec(
+                shape=(None,), dtype=tf.float64, name="age"
+            ),  # Specification for age
+            # "gender": tf.TensorSpec(
+            #     shape=(None,), dtype=tf.string, name="gender"
+            # ),  # Specification for gender
+        }
+        if self.model.id_mode == TowerIdMode.INDEX:
+            # Only the index mode embeds the user codes of the id dictionary.
+            instances_spec["user_idx"] = tf.TensorSpec(
+                shape=(None,), dtype=tf.int32, name="user_idx"
+            )  # Specification for the user codes
+
+        return instances_spec
+
+    def save_to_local(self, output_path: str = "query_model") -> str:
+        instances_spec = self.input_spec()
+        ids_spec = {
+            name: spec for name, spec in instances_spec.items() if name != "user_idx"
         }
 
         query_module_module = QueryModelModule(model=self.model)
-        # Get the concrete function for the query_model's compute_emb function using the specified input signatures
-        inference_signatures = (
-            query_module_module.compute_embedding.get_concrete_function(instances_spec)
-        )
+        # Get the concrete functions for the query_model's compute_emb functions using the specified input signatures.
+        # The default signature takes the inputs of the id mode (the user codes the transformer reads with
+        # the user features in the index mode), 'serving_ids' takes the user ids alone and encodes them
+        # with the vocabulary saved in the model.
+        inference_signatures = {
+            "serving_default": query_module_module.compute_embedding.get_concrete_function(
+                instances_spec
+            ),
+            "serving_ids": query_module_module.compute_embedding_from_ids.get_concrete_function(
+                ids_spec
+            ),
+        }
 
         # Save the query_model along with the concrete function signatures
         tf.saved_model.save(
@@ -45,14 +69,18 @@ class HopsworksQueryModel:
     def register(self, mr, feature_view, query_df) -> None:
         local_model_path = self.save_to_local()
 
-        # Sample a query example from the query DataFrame
+        # Sample a query example with the inputs of the default signature, the model schema
+        # tells the transformer whether to send the user codes.
+        query_df = query_df[[*self.input_spec()]]
         query_example = query_df.sample().to_dict("records")
+        model_schema = ModelSchema(input_schema=Schema(query_df))
 
         # Create a tensorflow model for the query_model in the Model Registry
         mr_query_model = mr.tensorflow.create_model(
             name="query_model",  # Name of the model
             description="Model that generates query embeddings from user and transaction features",  # Description of the model
             input_example=query_example,  # Example input for the model
+            model_schema=model_schema,  # Inputs of the default signature
             feature_view=feature_view,
         )
 
@@ -113,6 +141,16 @@ class QueryModelModule(tf.Module):
             "query_emb": query_embedding,
         }
 
+    @tf.function()
+    def compute_embedding_from_ids(self, instances):
+        if self.model.id_mode == TowerIdMode.INDEX:
+            instances = {
+                **instances,
+                "user_idx": self.model.user_embedding.encode(instances["user_id"]),
+            }
+
+        return self.compute_embedding(instances)
+
 
 class HopsworksCandidateModel:
     def __init__(self, model: ItemTower):
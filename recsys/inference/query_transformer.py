@@ -13,11 +13,16 @@ class Transformer(object):
         project = hopsworks.login()
         ms = project.get_model_serving()
 
+        # The query model takes the user codes only in the index id mode, as listed in its schema
+        query_model = project.get_model_registry().get_model(name="query_model", version=1)
+        input_schema = query_model.model_schema["input_schema"]["columnar_schema"]
+        self.send_user_idx = "user_idx" in {column["name"] for column in input_schema}
+
         # Retrieve the 'users' feature view
         fs = project.get_feature_store()
         self.user_fv = fs.get_feature_view(
             name="users",
-            version=1,
+            version=2,  # constants.USERS_FEATURE_VIEW_VERSION
         )
 
         # Retrieve  the "ranking" feature view and initialize the batch scoring server.
@@ -46,8 +51,10 @@ class Transformer(object):
             return_type="pandas",
         )
 
-        # Enrich inputs with user age
+        # Enrich inputs with user age and the user code the query model embeds
         inputs["age"] = user_features.age.values[0]
+        if self.send_user_idx:
+            inputs["user_idx"] = user_features.user_idx.values[0]
         # inputs["gender"] = user_features.gender.values[0]
 
         # Calculate the sine and cosine of the month_of_purchase
@@ -18,7 +18,7 @@ class Transformer(object):
         # Retrieve the 'artworks' feature view
         self.artworks_fv = self.fs.get_feature_view(
             name="artworks",
-            version=1,
+            version=2,  # constants.ARTWORKS_FEATURE_VIEW_VERSION
         )
 
         # Get list of feature names for artworks
@@ -27,7 +27,7 @@ class Transformer(object):
         # Retrieve the 'users' feature view
         self.user_fv = self.fs.get_feature_view(
             name="users",
-            version=1,
+            version=2,  # constants.USERS_FEATURE_VIEW_VERSION
         )
 
         self.user_fv.init_serving(1)
@@ -1,3 +1,3 @@
-from . import ranking, two_tower
+from . import distributed, evaluation, ranking, two_tower
 
-__all__ = ["ranking", "two_tower"]
+__all__ = ["distributed", "evaluation", "ranking", "two_tower"]
@@ -0,0 +1,66 @@
+import json
+import os
+
+import tensorflow as tf
+from loguru import logger
+
+from recsys.config import DistributionStrategy, settings
+
+
+def create_strategy(
+    strategy: DistributionStrategy = settings.TWO_TOWER_DISTRIBUTION_STRATEGY,
+    num_replicas: int = settings.TWO_TOWER_NUM_CPU_REPLICAS,
+) -> tf.distribute.Strategy:
+    """
+    Create the distribution strategy of the two-tower training.
+
+    The towers, the model and the trainer have to be created in its scope.
+    MIRRORED splits the CPU into `num_replicas` logical devices and trains a
+    replica on each, which has to happen before TensorFlow runs anything.
+    MULTI_WORKER trains a replica per process, as described by the TF_CONFIG
+    environment variable, e.g. set with `local_tf_config`.
+
+    Parameters:
+    - strategy (DistributionStrategy): Kind of strategy. NONE returns the default strategy.
+    - num_replicas (int): Number of CPU replicas of MIRRORED. 0 uses every CPU.
+
+    Returns:
+    - tf.distribute.Strategy: Strategy to create and train the model in.
+    """
+    if strategy == DistributionStrategy.NONE:
+        return tf.distribute.get_strategy()
+
+    if strategy == DistributionStrategy.MULTI_WORKER:
+        multi_worker_strategy = tf.distribute.MultiWorkerMirroredStrategy()
+        logger.info(
+            f"Training on {multi_worker_strategy.num_replicas_in_sync} workers."
+        )
+
+        return multi_worker_strategy
+
+    num_replicas = num_replicas or os.cpu_count() or 1
+    (cpu,) = tf.config.list_physical_devices("CPU")
+    tf.config.set_logical_device_configuration(
+        cpu, [tf.config.LogicalDeviceConfiguration() for _ in range(num_replicas)]
+    )
+    devices = [device.name for device in tf.config.list_logical_devices("CPU")]
+    logger.info(f"Training on {len(devices)} CPU replicas.")
+
+    # NCCL, the default all-reduce, needs GPUs.
+    return tf.distribute.MirroredStrategy(
+        devices=devices, cross_device_ops=tf.distribute.ReductionToOneDevice()
+    )
+
+
+def local_tf_config(num_workers: int, index: int, base_port: int = 23456) -> str:
+    """
+    TF_CONFIG of worker `index` of a MULTI_WORKER training over local processes.
+    """
+    return json.dumps(
+        {
+            "cluster": {
+                "worker": [f"localhost:{base_port + i}" for i in range(num_workers)]
+            },
+            "task": {"type": "worker", "index": index},
+        }
+    )
@@ -0,0 +1,128 @@
+import time
+
+import numpy as np
+import tensorflow as tf
+from loguru import logger
+
+from recsys.config import settings
+
+
+class RetrievalEvaluator:
+    """
+    Brute-force top-K evaluation of a two-tower model over the whole candidate set.
+
+    Candidates are embedded once into a dense matrix. Queries are embedded
+    and scored against every candidate in blocks of `block_size` queries,
+    one matrix product per block. Every query has a single relevant
+    candidate, the artwork of its interaction, so all metrics follow from
+    its rank: recall@K is the rate at which the rank is below K and NDCG@K
+    is 1 / log2(rank + 2) when it is.
+    """
+
+    def __init__(
+        self,
+        item_model: tf.keras.Model,
+        items_ds: tf.data.Dataset,
+        item_key: str = "artwork_id",
+        batch_size: int = settings.TWO_TOWER_MODEL_BATCH_SIZE,
+        top_ks: list[int] = settings.TWO_TOWER_EVALUATION_TOP_KS,
+        block_size: int = settings.TWO_TOWER_EVALUATION_BLOCK_SIZE,
+    ) -> None:
+        self.item_key = item_key
+        self.top_ks = sorted(top_ks)
+        self.block_size = block_size
+
+        item_ids = []
+        item_embeddings = []
+        for batch in items_ds.batch(batch_size):
+            item_ids.append(batch[item_key].numpy())
+            item_embeddings.append(item_model(batch, training=False).numpy())
+        self.item_ids = np.concatenate(item_ids)
+        self.item_embeddings = np.concatenate(item_embeddings).astype(np.float32)
+
+        self._sorter = np.argsort(self.item_ids)
+        self._sorted_ids = self.item_ids[self._sorter]
+
+        logger.info(f"Embedded {len(self.item_ids)} candidates.")
+
+    @classmethod
+    def from_dataset(cls, item_model: tf.keras.Model, dataset, **kwargs) -> "RetrievalEvaluator":
+        """
+        Evaluator over the unique artworks of the train split of a `TwoTowerDataset`.
+        """
+        return cls(item_model, dataset.get_items_subset(), **kwargs)
+
+    def evaluate(self, query_model: tf.keras.Model, queries_ds: tf.data.Dataset) -> dict[str, float]:
+        """
+        Compute recall@K and NDCG@K of every K over a dataset of interactions.
+
+        Parameters:
+        - query_model (tf.keras.Model): Query tower.
+        - queries_ds (tf.data.Dataset): Batched interactions with the query features and the relevant candidate id, e.g. the validation dataset.
+
+        Returns:
+        - dict[str, float]: 'recall@K' and 'ndcg@K' for every K.
+        """
+        start = time.perf_counter()
+
+        max_k = self.top_ks[-1]
+        discounts = 1.0 / np.log2(np.arange(2, max_k + 2))
+        hits_at_rank = np.zeros(max_k)
+        num_queries = 0
+        for query_embeddings, targets in self._iter_blocks(query_model, queries_ds):
+            ranks = self._ranks(query_embeddings, targets)
+            hits_at_rank += np.bincount(ranks[ranks < max_k], minlength=max_k)
+            num_queries += len(targets)
+
+        if num_queries == 0:
+            raise ValueError("No queries to evaluate.")
+
+        metrics = {}
+        for k in self.top_ks:
+            metrics[f"recall@{k}"] = float(hits_at_rank[:k].sum() / num_queries)
+            metrics[f"ndcg@{k}"] = float((hits_at_rank[:k] * discounts[:k]).sum() / num_queries)
+
+        logger.info(
+            f"Evaluated {num_queries} queries against {len(self.item_ids)} candidates "
+            f"in {time.perf_counter() - start:.2f}s."
+        )
+
+        return metrics
+
+    def _iter_blocks(self, query_model: tf.keras.Model, queries_ds: tf.data.Dataset):
+        """
+        Yield the query embeddings and candidate rows of about `block_size` queries at a time.
+        """
+        embeddings, targets, size = [], [], 0
+        for batch in queries_ds.prefetch(tf.data.AUTOTUNE):
+            embeddings.append(query_model(batch, training=False).numpy())
+            targets.append(self._positions(batch[self.item_key].numpy()))
+            size += len(targets[-1])
+            if size >= self.block_size:
+                yield np.concatenate(embeddings), np.concatenate(targets)
+                embeddings, targets, size = [], [], 0
+        if size > 0:
+            yield np.concatenate(embeddings), np.concatenate(targets)
+
+    def _ranks(self, query_embeddings: np.ndarray, targets: np.ndarray) -> np.ndarray:
+        """
+        0-based rank of the relevant candidate of every query, `len(item_ids)` when it is not a candidate.
+        """
+        scores = query_embeddings @ self.item_embeddings.T
+        known = targets >= 0
+        target_scores = scores[np.arange(len(targets)), targets.clip(min=0)]
+
+        # With a single relevant candidate its rank is the number of candidates
+        # scoring higher, one pass over the scores instead of a top-K selection.
+        ranks = np.count_nonzero(scores > target_scores[:, None], axis=1)
+
+        return np.where(known, ranks, len(self.item_ids))
+
+    def _positions(self, ids: np.ndarray) -> np.ndarray:
+        """
+        Row of every id in the candidate matrix, -1 for ids that are not candidates.
+        """
+        index = np.searchsorted(self._sorted_ids, ids).clip(max=len(self._sorted_ids) - 1)
+        found = self._sorted_ids[index] == ids
+
+        return np.where(found, self._sorter[index], -1)
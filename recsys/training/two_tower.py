@@ -1,9 +1,141 @@
+import math
+import os
+import shutil
+import tempfile
+from collections.abc import Iterator
+from pathlib import Path
+from urllib.parse import urlparse
+
+import hopsworks
+import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
 import tensorflow as tf
 import tensorflow_recommenders as tfrs
 from loguru import logger
 from tensorflow.keras.layers import Normalization, StringLookup
 
-from recsys.config import settings
+from recsys.config import TowerIdMode, settings
+from recsys.features.id_dictionary import download_id_dictionaries, vocabulary_path
+
+SPLITS = ["train", "val", "test"]
+
+# Directory of every split in a training dataset materialized by Hopsworks.
+TRAINING_DATASET_SPLITS = {"train": "train", "val": "validation", "test": "test"}
+
+# Rows kept to register the models with an input example.
+EXAMPLE_ROWS = 1000
+
+# Age is a float64 in the users features and in the query model serving signature.
+AGE_DTYPE = tf.float64
+
+
+# Id mode -> input holding the user and artwork ids.
+ID_INPUTS = {
+    TowerIdMode.STRING: {"user_id": "user_id", "artwork_id": "artwork_id"},
+    TowerIdMode.INDEX: {"user_id": "user_idx", "artwork_id": "artwork_idx"},
+    TowerIdMode.HASH: {"user_id": "user_id", "artwork_id": "artwork_id"},
+}
+
+# First half of the SipHash keys of the hash embeddings, the second half is the hash number.
+HASH_KEY = 0x5EED
+
+
+class IndexEmbedding(tf.keras.layers.Layer):
+    """
+    Embedding of ids pre-encoded as int32 codes of an id dictionary.
+
+    Codes are looked up directly, without hashing strings. Codes outside the
+    vocabulary file, like ids added to the dictionary after training or the
+    -1 of an unknown id, share one out-of-vocabulary row. The vocabulary file
+    is saved with the model, so string ids can still be encoded at serving
+    time with `encode`.
+    """
+
+    def __init__(self, vocabulary_file: str, emb_dim: int, **kwargs) -> None:
+        super().__init__(**kwargs)
+        with open(vocabulary_file, "r", encoding="utf-8") as f:
+            self.num_ids = sum(1 for _ in f)
+
+        self.table = tf.lookup.StaticHashTable(
+            tf.lookup.TextFileInitializer(
+                str(vocabulary_file),
+                key_dtype=tf.string,
+                key_index=tf.lookup.TextFileIndex.WHOLE_LINE,
+                value_dtype=tf.int64,
+                value_index=tf.lookup.TextFileIndex.LINE_NUMBER,
+            ),
+            default_value=-1,
+        )
+        # Add an additional embedding for out-of-vocabulary codes.
+        self.embedding = tf.keras.layers.Embedding(self.num_ids + 1, emb_dim)
+
+    def encode(self, ids: tf.Tensor) -> tf.Tensor:
+        return tf.cast(self.table.lookup(ids), tf.int32)
+
+    def call(self, codes: tf.Tensor) -> tf.Tensor:
+        codes = tf.cast(codes, tf.int32)
+        in_vocabulary = (codes >= 0) & (codes < self.num_ids)
+
+        return self.embedding(tf.where(in_vocabulary, codes, self.num_ids))
+
+
+class HashEmbedding(tf.keras.layers.Layer):
+    """
+    Embedding of string ids hashed into a fixed number of buckets.
+
+    Every id is hashed `num_hashes` times with different keys and embedded as
+    the sum of its bucket rows, so two ids only share their embedding when
+    all their hashes collide. The table does not grow with the number of ids,
+    and ids never seen in training still get distinct embeddings.
+    """
+
+    def __init__(self, num_buckets: int, emb_dim: int, num_hashes: int, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.num_buckets = num_buckets
+        self.num_hashes = num_hashes
+        self.embedding = tf.keras.layers.Embedding(num_buckets, emb_dim)
+
+    def call(self, ids: tf.Tensor) -> tf.Tensor:
+        buckets = tf.stack(
+            [
+                tf.strings.to_hash_bucket_strong(
+                    ids, self.num_buckets, key=[HASH_KEY, i]
+                )
+                for i in range(self.num_hashes)
+            ],
+            axis=-1,
+        )
+
+        return tf.reduce_sum(self.embedding(buckets), axis=-2)
+
+
+def id_embedding(
+    ids: list | str | None,
+    emb_dim: int,
+    id_mode: TowerIdMode,
+    num_buckets: int = settings.TWO_TOWER_HASH_NUM_BUCKETS,
+    num_hashes: int = settings.TWO_TOWER_HASH_NUM_HASHES,
+) -> tf.keras.layers.Layer:
+    """
+    Embedding of the ids of a tower: the list of ids in string mode, the vocabulary file in index mode.
+    Hash mode needs no ids, only the number of buckets and hashes.
+    """
+    if id_mode == TowerIdMode.INDEX:
+        return IndexEmbedding(ids, emb_dim)
+    if id_mode == TowerIdMode.HASH:
+        return HashEmbedding(num_buckets, emb_dim, num_hashes)
+
+    return tf.keras.Sequential(
+        [
+            StringLookup(vocabulary=ids, mask_token=None),
+            tf.keras.layers.Embedding(
+                # Add an additional embedding to account for unknown tokens.
+                len(ids) + 1,
+                emb_dim,
+            ),
+        ]
+    )
 
 
 class QueryTowerFactory:
@@ -11,34 +143,40 @@ class QueryTowerFactory:
         self._dataset = dataset
 
     def build(
-        self, embed_dim: int = settings.TWO_TOWER_MODEL_EMBEDDING_SIZE
+        self,
+        embed_dim: int = settings.TWO_TOWER_MODEL_EMBEDDING_SIZE,
+        id_mode: TowerIdMode = settings.TWO_TOWER_ID_MODE,
+        num_buckets: int = settings.TWO_TOWER_HASH_NUM_BUCKETS,
     ) -> "QueryTower":
         return QueryTower(
-            user_ids=self._dataset.properties["user_ids"],
+            user_ids=self._dataset.get_user_ids(id_mode),
             # gender_groups=self._dataset.properties["gender_groups"],
             emb_dim=embed_dim,
+            age_mean=self._dataset.properties.get("age_mean"),
+            age_variance=self._dataset.properties.get("age_variance"),
+            id_mode=id_mode,
+            num_buckets=num_buckets,
         )
 
 
 class QueryTower(tf.keras.Model):
     def __init__(
         self, 
-        user_ids: list, 
+        user_ids: list | str | None, 
         # gender_groups: list,
-        emb_dim: int
+        emb_dim: int,
+        age_mean: float | None = None,
+        age_variance: float | None = None,
+        id_mode: TowerIdMode = TowerIdMode.STRING,
+        num_buckets: int = settings.TWO_TOWER_HASH_NUM_BUCKETS,
     ):
         super().__init__()
         # self.gender_groups = gender_groups
 
-        self.user_embedding = tf.keras.Sequential(
-            [
-                StringLookup(vocabulary=user_ids, mask_token=None),
-                tf.keras.layers.Embedding(
-                    # Add an additional embedding to account for unknown tokens.
-                    len(user_ids) + 1,
-                    emb_dim,
-                ),
-            ]
+        self.id_mode = id_mode
+        self.user_key = ID_INPUTS[id_mode]["user_id"]
+        self.user_embedding = id_embedding(
+            user_ids, emb_dim, id_mode, num_buckets=num_buckets
         )
 
         # Converts strings into integer indices (scikit-learn LabelEncoder analog)
@@ -47,7 +185,10 @@ class QueryTower(tf.keras.Model):
         #     mask_token=None,
         # )
 
-        self.normalized_age = Normalization(axis=None)
+        # Without precomputed statistics the layer is adapted before training.
+        self.normalized_age = Normalization(
+            axis=None, mean=age_mean, variance=age_variance
+        )
 
         self.fnn = tf.keras.Sequential(
             [
@@ -63,7 +204,7 @@ class QueryTower(tf.keras.Model):
         # )
         concatenated_inputs = tf.concat(
             [
-                self.user_embedding(inputs["user_id"]),
+                self.user_embedding(inputs[self.user_key]),
                 tf.reshape(self.normalized_age(inputs["age"]), (-1, 1)),
                 # gender_group_embedding
             ],
@@ -80,36 +221,38 @@ class ItemTowerFactory:
         self._dataset = dataset
 
     def build(
-        self, embed_dim: int = settings.TWO_TOWER_MODEL_EMBEDDING_SIZE
+        self,
+        embed_dim: int = settings.TWO_TOWER_MODEL_EMBEDDING_SIZE,
+        id_mode: TowerIdMode = settings.TWO_TOWER_ID_MODE,
+        num_buckets: int = settings.TWO_TOWER_HASH_NUM_BUCKETS,
     ) -> "ItemTower":
         return ItemTower(
-            item_ids=self._dataset.properties["item_ids"],
+            item_ids=self._dataset.get_item_ids(id_mode),
             category_groups=self._dataset.properties["category_groups"],
             emb_dim=embed_dim,
+            id_mode=id_mode,
+            num_buckets=num_buckets,
         )
 
 
 class ItemTower(tf.keras.Model):
     def __init__(
         self,
-        item_ids: list,
+        item_ids: list | str | None,
         category_groups: list,
         # index_groups: list, ??
         emb_dim: int,
+        id_mode: TowerIdMode = TowerIdMode.STRING,
+        num_buckets: int = settings.TWO_TOWER_HASH_NUM_BUCKETS,
     ):
         super().__init__()
 
         self.category_groups = category_groups
 
-        self.item_embedding = tf.keras.Sequential(
-            [
-                StringLookup(vocabulary=item_ids, mask_token=None),
-                tf.keras.layers.Embedding(
-                    # Add an additional embedding to account for unknown tokens.
-                    len(item_ids) + 1,
-                    emb_dim,
-                ),
-            ]
+        self.id_mode = id_mode
+        self.item_key = ID_INPUTS[id_mode]["artwork_id"]
+        self.item_embedding = id_embedding(
+            item_ids, emb_dim, id_mode, num_buckets=num_buckets
         )
         # Converts strings into integer indices (scikit-learn LabelEncoder analog)
         self.category_group_tokenizer = StringLookup(
@@ -132,7 +275,7 @@ class ItemTower(tf.keras.Model):
 
         concatenated_inputs = tf.concat(
             [
-                self.item_embedding(inputs["artwork_id"]),
+                self.item_embedding(inputs[self.item_key]),
                 category_group_embedding,
             ],
             axis=1,
@@ -151,16 +294,8 @@ class TwoTowerFactory:
         self,
         query_model: QueryTower,
         item_model: ItemTower,
-        batch_size: int = settings.TWO_TOWER_MODEL_BATCH_SIZE,
     ) -> "TwoTowerModel":
-        item_ds = self._dataset.get_items_subset()
-
-        return TwoTowerModel(
-            query_model,
-            item_model,
-            item_ds=item_ds,
-            batch_size=batch_size,
-        )
+        return TwoTowerModel(query_model, item_model)
 
 
 class TwoTowerModel(tf.keras.Model):
@@ -168,17 +303,12 @@ class TwoTowerModel(tf.keras.Model):
         self,
         query_model: QueryTower,
         item_model: ItemTower,
-        item_ds: tf.data.Dataset,
-        batch_size: int,
     ) -> None:
         super().__init__()
         self.query_model = query_model
         self.item_model = item_model
-        self.task = tfrs.tasks.Retrieval(
-            metrics=tfrs.metrics.FactorizedTopK(
-                candidates=item_ds.batch(batch_size).map(self.item_model)
-            )
-        )
+        # Top-K metrics are computed over the whole catalog by evaluation.RetrievalEvaluator.
+        self.task = tfrs.tasks.Retrieval()
 
     def train_step(self, batch) -> tf.Tensor:
         # Set up a gradient tape to record gradients.
@@ -186,20 +316,18 @@ class TwoTowerModel(tf.keras.Model):
             # Loss computation.
             user_embeddings = self.query_model(batch)
             item_embeddings = self.item_model(batch)
-            loss = self.task(
-                user_embeddings,
-                item_embeddings,
-                compute_metrics=False,
-            )
+            loss = self._retrieval_loss(user_embeddings, item_embeddings)
 
-            # Handle regularization losses as well.
-            regularization_loss = sum(self.losses)
+            # Handle regularization losses as well. Gradients are summed
+            # across replicas, so every replica adds its share.
+            regularization_loss = sum(self.losses) / _num_replicas()
 
             total_loss = loss + regularization_loss
 
         gradients = tape.gradient(total_loss, self.trainable_variables)
         self.optimizer.apply_gradients(zip(gradients, self.trainable_variables))
 
+        # Keras sums the metrics of the replicas.
         metrics = {
             "loss": loss,
             "regularization_loss": regularization_loss,
@@ -213,14 +341,10 @@ class TwoTowerModel(tf.keras.Model):
         user_embeddings = self.query_model(batch)
         item_embeddings = self.item_model(batch)
 
-        loss = self.task(
-            user_embeddings,
-            item_embeddings,
-            compute_metrics=False,
-        )
+        loss = self._retrieval_loss(user_embeddings, item_embeddings)
 
         # Handle regularization losses as well.
-        regularization_loss = sum(self.losses)
+        regularization_loss = sum(self.losses) / _num_replicas()
 
         total_loss = loss + regularization_loss
 
@@ -231,22 +355,53 @@ class TwoTowerModel(tf.keras.Model):
 
         return metrics
 
+    def _retrieval_loss(
+        self, user_embeddings: tf.Tensor, item_embeddings: tf.Tensor
+    ) -> tf.Tensor:
+        replica_context = tf.distribute.get_replica_context()
+        if replica_context is None or replica_context.num_replicas_in_sync == 1:
+            return self.task(user_embeddings, item_embeddings, compute_metrics=False)
+
+        # Score the queries of this replica against the candidates of every
+        # replica, the in-batch negatives of the global batch. The candidates
+        # are rotated so the positives of this replica come first, where the
+        # task expects them. The task sums the loss over the queries, so the
+        # losses of the replicas add up to the loss of the global batch.
+        all_item_embeddings = replica_context.all_gather(item_embeddings, axis=0)
+        batch_sizes = replica_context.all_gather(tf.shape(item_embeddings)[:1], axis=0)
+        offset = tf.reduce_sum(
+            batch_sizes[: replica_context.replica_id_in_sync_group]
+        )
+
+        return self.task(
+            user_embeddings,
+            tf.roll(all_item_embeddings, shift=-offset, axis=0),
+            compute_metrics=False,
+        )
+
+
+def _num_replicas() -> int:
+    replica_context = tf.distribute.get_replica_context()
+
+    return 1 if replica_context is None else replica_context.num_replicas_in_sync
+
 
 class TwoTowerDataset:
     def __init__(self, feature_view, batch_size: int) -> None:
         self._feature_view = feature_view
         self._batch_size = batch_size
-        self._properties: dict | None
+        self._properties: dict | None = None
 
     @property
     def query_features(self) -> list[str]:
-        return ["user_id", "age"]
-        # return ["user_id", "age", "gender"]
+        return ["user_id", "user_idx", "age"]
+        # return ["user_id", "user_idx", "age", "gender"]
 
     @property
     def candidate_features(self) -> list[str]:
         return [
             "artwork_id",
+            "artwork_idx",
             "category"
         ]
 
@@ -256,9 +411,30 @@ class TwoTowerDataset:
 
         return self._properties
 
+    def get_user_ids(self, id_mode: TowerIdMode) -> list | str | None:
+        """
+        User vocabulary of a query tower: the train user ids, the vocabulary file of the user dictionary, or none in hash mode.
+        """
+        if id_mode == TowerIdMode.INDEX:
+            return _vocabulary_file("user_id")
+        if id_mode == TowerIdMode.HASH:
+            return None
+
+        return self.properties["user_ids"]
+
+    def get_item_ids(self, id_mode: TowerIdMode) -> list | str | None:
+        """
+        Item vocabulary of an item tower: the train artwork ids, the vocabulary file of the artwork dictionary, or none in hash mode.
+        """
+        if id_mode == TowerIdMode.INDEX:
+            return _vocabulary_file("artwork_id")
+        if id_mode == TowerIdMode.HASH:
+            return None
+
+        return self.properties["item_ids"]
+
     def get_items_subset(self):
-        item_df = self.properties["train_df"][self.candidate_features]
-        item_df.drop_duplicates(subset="artwork_id", inplace=True)
+        item_df = self.properties["item_df"].drop_duplicates(subset="artwork_id")
         item_ds = self.df_to_ds(item_df)
 
         return item_ds
@@ -274,19 +450,24 @@ class TwoTowerDataset:
             )
         )
 
+        # Shuffle examples, not whole batches.
         train_ds = (
             self.df_to_ds(train_df)
-            .batch(self._batch_size)
             .cache()
-            .shuffle(self._batch_size * 10)
+            .shuffle(settings.TWO_TOWER_SHUFFLE_BUFFER_SIZE)
+            .batch(self._batch_size)
         )
         val_ds = self.df_to_ds(val_df).batch(self._batch_size).cache()
 
+        # The splits are not kept, only a few query rows to build and register
+        # the query model and the distinct items the candidates are read from.
         self._properties = {
-            "train_df": train_df,
-            "val_df": val_df,
-            "query_df": train_df[self.query_features],
-            "item_df": train_df[self.candidate_features],
+            "num_train_rows": len(train_df),
+            "num_val_rows": len(val_df),
+            "query_df": train_df.head(EXAMPLE_ROWS)[self.query_features],
+            "item_df": train_df.drop_duplicates(subset="artwork_id")[
+                self.candidate_features
+            ],
             "user_ids": train_df["user_id"].unique().tolist(),
             "item_ids": train_df["artwork_id"].unique().tolist(),
             "category_groups": train_df["category"].unique().tolist(),
@@ -295,39 +476,390 @@ class TwoTowerDataset:
 
         return train_ds, val_ds
 
+    def export_splits(
+        self,
+        directory: Path = settings.TWO_TOWER_DATASET_DIR,
+        rows_per_file: int = settings.TWO_TOWER_DATASET_FILE_ROWS,
+    ) -> Path:
+        """
+        Write the train, validation and test splits of the feature view to Parquet files.
+
+        The splits are materialized as a Parquet training dataset by a
+        Hopsworks job, then its files are downloaded one at a time and their
+        record batches rewritten, so the splits are never held in memory.
+        Every split is a directory of files of `rows_per_file` rows, the
+        unit `get_train_val_split_from_parquet` interleaves and shuffles.
+        The splits replace previous ones only once they are all written.
+
+        Parameters:
+        - directory (Path): Directory of the splits.
+        - rows_per_file (int): Number of rows per file.
+
+        Returns:
+        - Path: Directory of the splits.
+        """
+        logger.info("Materializing and exporting train, val test split...")
+
+        version, _ = self._feature_view.create_train_validation_test_split(
+            validation_size=settings.TWO_TOWER_DATASET_VALIDATON_SPLIT_SIZE,
+            test_size=settings.TWO_TOWER_DATASET_TEST_SPLIT_SIZE,
+            description="Retrieval dataset splits",
+            data_format="parquet",
+            write_options={"wait_for_job": True},
+        )
+        training_dataset = next(
+            training_dataset
+            for training_dataset in self._feature_view.get_training_datasets()
+            if training_dataset.version == version
+        )
+        dataset_api = hopsworks.get_current_project().get_dataset_api()
+        location = urlparse(training_dataset.location).path
+
+        directory = Path(directory)
+        tmp_dir = directory.with_name(directory.name + ".tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        columns = self.query_features + self.candidate_features
+        with tempfile.TemporaryDirectory() as download_dir:
+            for split in SPLITS:
+                files = _download_parquet_files(
+                    dataset_api,
+                    f"{location}/{TRAINING_DATASET_SPLITS[split]}",
+                    Path(download_dir),
+                )
+                num_rows = _write_parquet_parts(
+                    files, columns, tmp_dir / split, rows_per_file
+                )
+                logger.info(f"Exported {num_rows} {split} rows.")
+
+        old_dir = directory.with_name(directory.name + ".old")
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if directory.exists():
+            os.replace(directory, old_dir)
+        os.replace(tmp_dir, directory)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+        return directory
+
+    def get_train_val_split_from_parquet(
+        self,
+        directory: Path = settings.TWO_TOWER_DATASET_DIR,
+        shuffle_buffer_size: int = settings.TWO_TOWER_SHUFFLE_BUFFER_SIZE,
+        strategy: tf.distribute.Strategy | None = None,
+    ):
+        """
+        Stream the splits written by `export_splits`.
+
+        Files are read concurrently and interleaved, and examples are
+        shuffled in a buffer of `shuffle_buffer_size` examples, so memory
+        does not grow with the size of the dataset. The vocabularies and
+        the age statistics are computed in a single streaming pass over
+        the train split. With a distribution strategy, every worker reads
+        its own share of the files and batches per replica, and the datasets
+        repeat so that an epoch is `steps_per_epoch` steps on every replica.
+
+        Parameters:
+        - directory (Path): Directory of the splits.
+        - shuffle_buffer_size (int): Number of examples in the shuffle buffer.
+        - strategy (tf.distribute.Strategy | None): Strategy the datasets are distributed with.
+
+        Returns:
+        - tuple[tf.data.Dataset, tf.data.Dataset]: Batched train and validation datasets.
+        """
+        directory = Path(directory)
+        train_files = sorted(str(path) for path in (directory / "train").glob("*.parquet"))
+        val_files = sorted(str(path) for path in (directory / "val").glob("*.parquet"))
+        assert train_files, f"No train split in {directory}, call export_splits() first."
+
+        logger.info(
+            f"Streaming {len(train_files)} train and {len(val_files)} val files..."
+        )
+
+        def train_ds_fn(input_context: tf.distribute.InputContext | None = None):
+            return (
+                _batch(
+                    self._parquet_to_ds(train_files, shuffle=True, input_context=input_context)
+                    .shuffle(shuffle_buffer_size),
+                    self._batch_size,
+                    input_context,
+                )
+                .prefetch(tf.data.AUTOTUNE)
+            )
+
+        def val_ds_fn(input_context: tf.distribute.InputContext | None = None):
+            return (
+                _batch(
+                    self._parquet_to_ds(val_files, shuffle=False, input_context=input_context),
+                    self._batch_size,
+                    input_context,
+                )
+                .prefetch(tf.data.AUTOTUNE)
+            )
+
+        if strategy is None:
+            train_ds, val_ds = train_ds_fn(), val_ds_fn()
+        else:
+            train_ds = strategy.distribute_datasets_from_function(train_ds_fn)
+            val_ds = strategy.distribute_datasets_from_function(val_ds_fn)
+
+        self._properties = self._scan_properties(train_files)
+        self._properties["num_val_rows"] = sum(
+            pq.ParquetFile(file).metadata.num_rows for file in val_files
+        )
+
+        return train_ds, val_ds
+
+    def steps_per_epoch(self, split: str = "train") -> int:
+        """
+        Number of global batches in one pass over the `split` rows, 'train' or 'val'.
+        """
+        return math.ceil(self.properties[f"num_{split}_rows"] / self._batch_size)
+
+    def _scan_properties(self, files: list[str]) -> dict:
+        stats = (
+            pl.scan_parquet(files)
+            .select(
+                pl.len().alias("num_rows"),
+                pl.col("user_id").unique(maintain_order=True).implode(),
+                pl.col("artwork_id").unique(maintain_order=True).implode(),
+                pl.col("category").unique(maintain_order=True).implode(),
+                pl.col("age").cast(pl.Float64).mean().alias("age_mean"),
+                pl.col("age").cast(pl.Float64).var(ddof=0).alias("age_variance"),
+                pl.struct(self.query_features)
+                .head(EXAMPLE_ROWS)
+                .implode()
+                .alias("query_df"),
+                pl.struct(self.candidate_features)
+                .filter(pl.col("artwork_id").is_first_distinct())
+                .implode()
+                .alias("item_df"),
+            )
+            .collect(streaming=True)
+            .row(0, named=True)
+        )
+
+        return {
+            "num_train_rows": stats["num_rows"],
+            "query_df": pl.DataFrame(stats["query_df"])
+            .with_columns(pl.col("age").cast(pl.Float64))
+            .to_pandas(),
+            "item_df": pl.DataFrame(stats["item_df"]).to_pandas(),
+            "user_ids": stats["user_id"],
+            "item_ids": stats["artwork_id"],
+            "category_groups": stats["category"],
+            "age_mean": stats["age_mean"],
+            "age_variance": stats["age_variance"],
+        }
+
+    def _parquet_to_ds(
+        self,
+        files: list[str],
+        shuffle: bool,
+        input_context: tf.distribute.InputContext | None = None,
+    ) -> tf.data.Dataset:
+        columns = self.query_features + self.candidate_features
+        schema = pq.read_schema(files[0])
+        output_signature = {
+            column: tf.TensorSpec(
+                shape=(None,), dtype=_arrow_to_tf_dtype(schema.field(column).type)
+            )
+            for column in columns
+        }
+
+        num_shards = 1 if input_context is None else input_context.num_input_pipelines
+        files_ds = tf.data.Dataset.from_tensor_slices(files)
+        # Shard by file when every worker gets one, by example otherwise.
+        shard_files = len(files) >= num_shards
+        if num_shards > 1 and shard_files:
+            files_ds = files_ds.shard(num_shards, input_context.input_pipeline_id)
+        if shuffle:
+            files_ds = files_ds.shuffle(len(files))
+
+        # Files are read by record batch and the map runs on whole record
+        # batches, examples are only split off at the end.
+        ds = (
+            files_ds.interleave(
+                lambda path: tf.data.Dataset.from_generator(
+                    _iter_parquet_batches,
+                    output_signature=output_signature,
+                    args=(path, columns),
+                ),
+                num_parallel_calls=tf.data.AUTOTUNE,
+                deterministic=not shuffle,
+            )
+            .map(_cast_age, num_parallel_calls=tf.data.AUTOTUNE)
+            .unbatch()
+        )
+        if num_shards > 1 and not shard_files:
+            ds = ds.shard(num_shards, input_context.input_pipeline_id)
+
+        return ds
+
     def df_to_ds(self, df):
-        return tf.data.Dataset.from_tensor_slices({col: df[col] for col in df})
+        return tf.data.Dataset.from_tensor_slices(
+            {
+                col: df[col].astype(AGE_DTYPE.as_numpy_dtype) if col == "age" else df[col]
+                for col in df
+            }
+        )
+
+
+def _batch(
+    ds: tf.data.Dataset, batch_size: int, input_context: tf.distribute.InputContext | None
+) -> tf.data.Dataset:
+    if input_context is None:
+        return ds.batch(batch_size)
+
+    # Every replica has to run the same number of steps while the workers
+    # read shares of different sizes, so distributed datasets repeat and
+    # the trainer bounds the epochs with `steps_per_epoch`.
+    return ds.repeat().batch(input_context.get_per_replica_batch_size(batch_size))
+
+
+def _download_parquet_files(
+    dataset_api, remote_dir: str, local_dir: Path
+) -> Iterator[Path]:
+    """
+    Download the Parquet files of a Hopsworks directory one at a time, each deleted once the next one is requested.
+    """
+    remote_paths, offset = [], 0
+    while page := dataset_api.list(remote_dir, offset=offset):
+        remote_paths += page
+        offset += len(page)
+
+    for remote_path in sorted(remote_paths):
+        if not remote_path.endswith(".parquet"):
+            continue
+
+        path = Path(
+            dataset_api.download(remote_path, local_path=str(local_dir), overwrite=True)
+        )
+        yield path
+        path.unlink()
+
+
+def _write_parquet_parts(
+    files: Iterator[Path], columns: list[str], output_dir: Path, rows_per_file: int
+) -> int:
+    """
+    Rewrite the `columns` of Parquet files to `output_dir` as files of `rows_per_file` rows, record batch by record batch.
+    """
+    output_dir.mkdir(parents=True)
+    writer, num_parts, num_rows = None, 0, 0
+    for path in files:
+        for batch in pq.ParquetFile(path).iter_batches(columns=columns):
+            while batch.num_rows > 0:
+                if writer is None:
+                    writer = pq.ParquetWriter(
+                        output_dir / f"part-{num_parts:05d}.parquet", batch.schema
+                    )
+                    num_parts += 1
+                chunk = batch.slice(0, rows_per_file - num_rows % rows_per_file)
+                writer.write_batch(chunk)
+                batch = batch.slice(chunk.num_rows)
+                num_rows += chunk.num_rows
+                if num_rows % rows_per_file == 0:
+                    writer.close()
+                    writer = None
+
+    if writer is not None:
+        writer.close()
+
+    return num_rows
+
+
+def _vocabulary_file(name: str) -> str:
+    path = vocabulary_path(name, settings.TWO_TOWER_ID_DICTIONARY_VERSION)
+    if not path.exists():
+        download_id_dictionaries(
+            hopsworks.get_current_project().get_dataset_api(),
+            settings.TWO_TOWER_ID_DICTIONARY_VERSION,
+        )
+    assert path.exists(), f"No vocabulary file {path}, run the feature pipeline first."
+
+    return str(path)
+
+
+def _arrow_to_tf_dtype(arrow_type: pa.DataType) -> tf.dtypes.DType:
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return tf.string
+
+    return tf.as_dtype(arrow_type.to_pandas_dtype())
+
+
+def _iter_parquet_batches(path: bytes, columns) -> dict:
+    parquet_file = pq.ParquetFile(path.decode())
+    columns = [column.decode() for column in columns]
+    for batch in parquet_file.iter_batches(columns=columns):
+        yield {
+            column: batch.column(column).to_numpy(zero_copy_only=False)
+            for column in columns
+        }
+
+
+def _cast_age(batch: dict) -> dict:
+    return {**batch, "age": tf.cast(batch["age"], AGE_DTYPE)}
 
 
 class TwoTowerTrainer:
-    def __init__(self, dataset: TwoTowerDataset, model: TwoTowerModel) -> None:
+    def __init__(
+        self,
+        dataset: TwoTowerDataset,
+        model: TwoTowerModel,
+        checkpoint_dir: Path | None = None,
+    ) -> None:
         self._dataset = dataset
         self._model = model
+        self._checkpoint_dir = checkpoint_dir
 
     def train(self, train_ds, val_ds):
-        self._initialize_query_model(train_ds)
+        # The optimizer and the initialized variables belong to the strategy
+        # the model was created in, the default one unless distributed.
+        with self._model.distribute_strategy.scope():
+            self._initialize_query_model(train_ds)
+
+            # Define an optimizer using AdamW with a learning rate of 0.01
+            optimizer = tf.keras.optimizers.AdamW(
+                weight_decay=settings.TWO_TOWER_WEIGHT_DECAY,
+                learning_rate=settings.TWO_TOWER_LEARNING_RATE,
+            )
 
-        # Define an optimizer using AdamW with a learning rate of 0.01
-        optimizer = tf.keras.optimizers.AdamW(
-            weight_decay=settings.TWO_TOWER_WEIGHT_DECAY,
-            learning_rate=settings.TWO_TOWER_LEARNING_RATE,
-        )
+            # Compile the model using the specified optimizer
+            self._model.compile(optimizer=optimizer)
 
-        # Compile the model using the specified optimizer
-        self._model.compile(optimizer=optimizer)
+        callbacks = []
+        if self._checkpoint_dir is not None:
+            # Saves the model, the optimizer and the epoch after every epoch, and
+            # restores them when an interrupted run is started again.
+            callbacks.append(
+                tf.keras.callbacks.BackupAndRestore(backup_dir=str(self._checkpoint_dir))
+            )
+
+        steps = {}
+        if isinstance(train_ds, tf.distribute.DistributedDataset):
+            # Distributed datasets repeat, an epoch is one pass over the rows.
+            steps = {
+                "steps_per_epoch": self._dataset.steps_per_epoch("train"),
+                "validation_steps": self._dataset.steps_per_epoch("val"),
+            }
 
         # Start training
         history = self._model.fit(
             train_ds,
             validation_data=val_ds,
             epochs=settings.TWO_TOWER_NUM_EPOCHS,
+            callbacks=callbacks,
+            **steps,
         )
 
         return history
 
     def _initialize_query_model(self, train_ds):
-        # Initialize age normalization layer.
-        self._model.query_model.normalized_age.adapt(train_ds.map(lambda x: x["age"]))
+        # Initialize age normalization layer, unless its statistics were precomputed.
+        if self._dataset.properties.get("age_mean") is None:
+            self._model.query_model.normalized_age.adapt(
+                train_ds.map(lambda x: x["age"])
+            )
 
         # Initialize model with inputs.
         query_df = self._dataset.properties["query_df"]
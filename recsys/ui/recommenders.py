@@ -1,14 +1,23 @@
 from datetime import datetime
 
+import numpy as np
+import requests
 import streamlit as st
+from hsml.client.exceptions import ModelServingException, RestAPIError
 
 from recsys.config import settings
+from recsys.features.embedding_codec import embeddings_to_numpy
 
 from .feature_group_updater import get_fg_updater
 from .interaction_tracker import get_tracker
 from .utils import (
-    fetch_and_process_image,
+    deployments_ready,
+    get_artwork_embeddings,
+    get_cooccurrence_index,
     get_item_image_url,
+    get_popularity_tables,
+    get_user_liked_artworks,
+    load_item_image,
     print_header,
     process_description,
 )
@@ -18,7 +27,7 @@ from .utils import (
 def display_item(item_id, score, artworks_fv, user_id, tracker, source):
     """Display a single item with its interactions"""
     image_url = get_item_image_url(item_id, artworks_fv)
-    img = fetch_and_process_image(image_url)
+    img = load_item_image(item_id, image_url)
 
     if img:
         st.image(img, use_column_width=True)
@@ -65,12 +74,17 @@ def user_recommendations(
     # Only get new predictions if:
     # 1. Button is clicked OR
     # 2. No recommendations exist OR
-    # 3. User ID changed
+    # 3. User ID changed OR
+    # 4. The deployments were starting and are now ready
     if (
         st.sidebar.button("Get Recommendations", key="get_recommendations_button")
         or not st.session_state.user_recs
         or "last_user_id" not in st.session_state
         or st.session_state.last_user_id != user_id
+        or (
+            st.session_state.get("awaiting_deployments")
+            and deployments_ready(ranking_deployment, query_model_deployment)
+        )
     ):
         with st.spinner("🔮 Getting recommendations..."):
             # Format timestamp with microseconds
@@ -94,9 +108,29 @@ def user_recommendations(
             #     "signature_name": "serving_default",
             #     "instances": deployment_input
             # }])["predictions"]["ranking"]
-            prediction = query_model_deployment.predict(inputs=deployment_input)[
-                "predictions"
-            ]["ranking"]
+            prediction = []
+            st.session_state.awaiting_deployments = not deployments_ready(
+                ranking_deployment, query_model_deployment
+            )
+            if st.session_state.awaiting_deployments:
+                st.sidebar.info("⏳ Deployments are starting, showing fallback artworks")
+            else:
+                try:
+                    prediction = query_model_deployment.predict(
+                        inputs=deployment_input
+                    )["predictions"]["ranking"]
+                except (
+                    ModelServingException,
+                    RestAPIError,
+                    requests.RequestException,
+                ):
+                    st.sidebar.warning(
+                        "⚠️ Model deployment failed, showing fallback artworks"
+                    )
+
+            # Fall back to co-liked and popular artworks without a model prediction
+            if not prediction:
+                prediction = fallback_items(user_id, tracker)
 
             # Filter out liked items
             available_items = [
@@ -153,6 +187,36 @@ def user_recommendations(
 
 
 
+def fallback_items(user_id, tracker, k=50):
+    """Get the artworks co-liked with the user's likes, topped up with popular ones, as (score, item_id) pairs"""
+    items = []
+    cooccurrence_index = (
+        get_cooccurrence_index() if settings.COOCCURRENCE_UI_FALLBACK else None
+    )
+    if cooccurrence_index is not None:
+        liked_items = set(get_user_liked_artworks(user_id))
+        liked_items |= tracker.liked_items.get(user_id, set())
+        recommendations = cooccurrence_index.recommend(sorted(liked_items), k=k)
+        items = [(score, item_id) for item_id, score in recommendations]
+
+    seen = {item_id for _, item_id in items}
+    items += [
+        (score, item_id) for score, item_id in popular_items(k) if item_id not in seen
+    ]
+
+    return items[:k]
+
+
+def popular_items(k=50):
+    """Get the most popular artworks as (score, item_id) pairs, like the ranking model"""
+    popularity_tables = get_popularity_tables()
+    if popularity_tables is None:
+        return []
+
+    return [(score, item_id) for item_id, score in popularity_tables.top(k=k)]
+
+
+
 def get_fashion_recommendations(user_input, fashion_chain, gender):
     """Get recommendations from the LLM"""
     response = fashion_chain.run(user_input=user_input, gender=gender)
@@ -206,8 +270,14 @@ def display_category_items(emoji, category, items, artworks_fv, user_id, tracker
     return False, []
 
 
-def get_similar_items(description, embedding_model, artworks_fv):
-    """Get similar items based on description embedding"""
-    description_embedding = embedding_model.encode(description)
+def get_similar_items(description, embedding_model, k=25):
+    """Get the (score, item_id) pairs of the artworks closest to a description embedding"""
+    # Searched in memory: int8 artwork embeddings have no vector index to query.
+    artwork_embeddings = get_artwork_embeddings()
+    description_embedding = embedding_model.encode(description).astype(np.float32)
+    scores = embeddings_to_numpy(artwork_embeddings["embeddings"]) @ description_embedding
+
+    top = np.argsort(-scores)[:k]
+    item_ids = artwork_embeddings["artwork_id"]
 
-    return artworks_fv.find_neighbors(description_embedding, k=25)
+    return [(float(scores[i]), item_ids[int(i)]) for i in top]
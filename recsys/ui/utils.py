@@ -3,9 +3,14 @@ from io import BytesIO
 
 import requests
 import streamlit as st
+from hsml.client.exceptions import RestAPIError
 from PIL import Image, UnidentifiedImageError
 
 from recsys import hopsworks_integration
+from recsys.features.cooccurrence import CooccurrenceIndex
+from recsys.features.popularity import PopularityTables
+from recsys.features.thumbnails import ThumbnailPack
+from recsys.hopsworks_integration import constants
 
 
 def print_header(text, font_size=22):
@@ -23,6 +28,23 @@ def fetch_and_process_image(image_url, width=200, height=300):
         return None
 
 
+@st.cache_resource()
+def get_thumbnail_pack():
+    try:
+        return ThumbnailPack()
+    except FileNotFoundError:
+        return None
+
+
+def load_item_image(item_id, image_url):
+    # Read the prefetched thumbnail, download it only if it was not packed
+    thumbnail_pack = get_thumbnail_pack()
+    if thumbnail_pack is not None and item_id in thumbnail_pack:
+        return thumbnail_pack.get_image(item_id)
+
+    return fetch_and_process_image(image_url)
+
+
 def process_description(description):
     return description if description else "No details available"
     # details_match = re.search(r"Details: (.+?)(?:\n|$)", description)
@@ -35,6 +57,47 @@ def get_item_image_url(item_id, artworks_fv):
 
 
 
+@st.cache_resource()
+def get_popularity_tables():
+    try:
+        return PopularityTables.load()
+    except FileNotFoundError:
+        return None
+
+
+@st.cache_resource()
+def get_cooccurrence_index():
+    try:
+        return CooccurrenceIndex.load()
+    except FileNotFoundError:
+        return None
+
+
+@st.cache_data()
+def get_user_liked_artworks(user_id):
+    _, fs = hopsworks_integration.get_feature_store()
+    transactions_fg = fs.get_feature_group(name="transactions", version=1)
+
+    likes = (
+        transactions_fg.select(["artwork_id"])
+        .filter(transactions_fg.user_id == user_id)
+        .read(dataframe_type="polars")
+    )
+
+    return likes["artwork_id"].cast(str).to_list()
+
+
+@st.cache_resource()
+def get_artwork_embeddings():
+    _, fs = hopsworks_integration.get_feature_store()
+    artworks_fg = fs.get_feature_group(
+        name="artworks", version=constants.ARTWORKS_FEATURE_GROUP_VERSION
+    )
+
+    # Decoded to float32 whatever the storage encoding of the feature group.
+    return hopsworks_integration.feature_store.read_artwork_embeddings(artworks_fg)
+
+
 @st.cache_resource()
 def get_deployments():
     project, fs = hopsworks_integration.get_feature_store()
@@ -43,7 +106,7 @@ def get_deployments():
 
     artworks_fv = fs.get_feature_view(
         name="artworks",
-        version=1,
+        version=constants.ARTWORKS_FEATURE_VIEW_VERSION,
     )
 
     query_model_deployment = ms.get_deployment(
@@ -53,7 +116,16 @@ def get_deployments():
         hopsworks_integration.ranking_serving.HopsworksRankingModel.deployment_name
     )
 
-    ranking_deployment.start(await_running=180)
-    query_model_deployment.start(await_running=180)
+    # Started without waiting for them, recommendations fall back to the
+    # popular artworks until `deployments_ready`.
+    ranking_deployment.start(await_running=0)
+    query_model_deployment.start(await_running=0)
 
-    return artworks_fv, ranking_deployment, query_model_deployment
\ No newline at end of file
+    return artworks_fv, ranking_deployment, query_model_deployment
+
+
+def deployments_ready(*deployments):
+    try:
+        return all(deployment.is_running() for deployment in deployments)
+    except (RestAPIError, requests.RequestException):
+        return False
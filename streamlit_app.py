@@ -8,7 +8,7 @@ from recsys.config import settings
 from recsys.ui.feature_group_updater import get_fg_updater
 from recsys.ui.interaction_tracker import get_tracker
 from recsys.ui.recommenders import user_recommendations
-from recsys.ui.utils import get_deployments
+from recsys.ui.utils import deployments_ready, get_deployments
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -35,7 +35,10 @@ def initialize_services():
     with st.sidebar:
         with st.spinner("🚀 Starting Deployments..."):
            artworks_fv, ranking_deployment, query_model_deployment = get_deployments()
-        st.success("✅ Deployments Ready")
+        if deployments_ready(ranking_deployment, query_model_deployment):
+            st.success("✅ Deployments Ready")
+        else:
+            st.info("⏳ Deployments Starting")
 
         # Stop deployments button
         if st.button(
@@ -0,0 +1,114 @@
+import multiprocessing
+import os
+import time
+
+import tensorflow as tf
+
+from recsys.config import DistributionStrategy, settings
+from recsys.training.distributed import create_strategy, local_tf_config
+from recsys.training.two_tower import (
+    ItemTowerFactory,
+    QueryTowerFactory,
+    TwoTowerDataset,
+    TwoTowerFactory,
+)
+from tools.benchmark_id_embeddings import SyntheticFeatureView
+
+WORKER_COUNTS = [1, 2, 4, 8]
+NUM_EPOCHS = 3
+BATCH_SIZE = settings.TWO_TOWER_MODEL_BATCH_SIZE
+
+
+class EpochTimer(tf.keras.callbacks.Callback):
+    def on_train_begin(self, logs=None):
+        self.epoch_times = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        self.epoch_times.append(time.perf_counter() - self._start)
+
+
+def train_throughput(strategy_kind: DistributionStrategy, num_workers: int) -> float:
+    """
+    Training examples per second of the fastest epoch, the first one traces the model.
+    """
+    strategy = create_strategy(strategy_kind, num_replicas=num_workers)
+
+    dataset = TwoTowerDataset(SyntheticFeatureView(), batch_size=BATCH_SIZE)
+    train_ds, _ = dataset.get_train_val_split()
+    with strategy.scope():
+        model = TwoTowerFactory(dataset).build(
+            QueryTowerFactory(dataset).build(), ItemTowerFactory(dataset).build()
+        )
+        model.compile(
+            optimizer=tf.keras.optimizers.AdamW(
+                weight_decay=settings.TWO_TOWER_WEIGHT_DECAY,
+                learning_rate=settings.TWO_TOWER_LEARNING_RATE,
+            )
+        )
+
+    timer = EpochTimer()
+    model.fit(train_ds, epochs=NUM_EPOCHS, callbacks=[timer], verbose=0)
+
+    return dataset.properties["num_train_rows"] / min(timer.epoch_times)
+
+
+def _run_worker(
+    strategy_kind: DistributionStrategy,
+    num_workers: int,
+    index: int,
+    results: multiprocessing.Queue,
+) -> None:
+    if strategy_kind == DistributionStrategy.MULTI_WORKER:
+        os.environ["TF_CONFIG"] = local_tf_config(
+            num_workers, index, base_port=23456 + 16 * num_workers
+        )
+        # Every worker process gets its share of the cores.
+        num_threads = max(1, (os.cpu_count() or 1) // num_workers)
+        tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+        tf.config.threading.set_inter_op_parallelism_threads(num_threads)
+
+    throughput = train_throughput(strategy_kind, num_workers)
+    if index == 0:
+        results.put(throughput)
+
+
+def run(strategy_kind: DistributionStrategy, num_workers: int) -> float:
+    """
+    Run a training in fresh processes, the logical devices of TensorFlow cannot be changed once it started.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    num_processes = num_workers if strategy_kind == DistributionStrategy.MULTI_WORKER else 1
+    processes = [
+        context.Process(
+            target=_run_worker, args=(strategy_kind, num_workers, index, results)
+        )
+        for index in range(num_processes)
+    ]
+    for process in processes:
+        process.start()
+    throughput = results.get()
+    for process in processes:
+        process.join()
+
+    return throughput
+
+
+def main():
+    print(f"Two-tower training throughput on {os.cpu_count()} CPUs, batch size {BATCH_SIZE}:")
+    for strategy_kind in [DistributionStrategy.MIRRORED, DistributionStrategy.MULTI_WORKER]:
+        baseline = None
+        for num_workers in WORKER_COUNTS:
+            throughput = run(strategy_kind, num_workers)
+            baseline = baseline or throughput
+            print(
+                f"{strategy_kind.value:>12} x{num_workers}: {throughput:>10,.0f} examples/sec "
+                f"({throughput / baseline:.2f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+
+from recsys.config import TowerIdMode, settings
+from recsys.training.evaluation import RetrievalEvaluator
+from recsys.training.two_tower import (
+    ItemTowerFactory,
+    QueryTower,
+    QueryTowerFactory,
+    TwoTowerDataset,
+    TwoTowerFactory,
+    TwoTowerTrainer,
+)
+
+SCALING_USERS = [10_000, 100_000, 1_000_000]
+NUM_USERS = 20_000
+NUM_ITEMS = 2_000
+NUM_CLUSTERS = 50
+LIKES_PER_USER = 10
+IN_CLUSTER_RATE = 0.8
+NUM_EPOCHS = 5
+BATCH_SIZE = 512
+TOP_KS = [10, 50, 100]
+HASH_BUCKETS = [2**12, 2**14]
+
+
+class SyntheticFeatureView:
+    """
+    Stand-in for the retrieval feature view with clustered likes the towers can learn.
+
+    Users and artworks belong to one of `NUM_CLUSTERS` clusters, and users
+    mostly like artworks of their own cluster.
+    """
+
+    def __init__(self, seed: int = 27) -> None:
+        rng = np.random.default_rng(seed)
+        user_idx = np.repeat(np.arange(NUM_USERS), LIKES_PER_USER)
+        user_cluster = user_idx % NUM_CLUSTERS
+        random_item = rng.integers(0, NUM_ITEMS, size=user_idx.size)
+        in_cluster_item = (
+            rng.integers(0, NUM_ITEMS // NUM_CLUSTERS, size=user_idx.size) * NUM_CLUSTERS
+            + user_cluster
+        )
+        item_idx = np.where(
+            rng.random(user_idx.size) < IN_CLUSTER_RATE, in_cluster_item, random_item
+        )
+
+        df = pd.DataFrame(
+            {
+                "user_id": [f"{i:032x}" for i in user_idx],
+                "user_idx": user_idx.astype(np.int32),
+                "age": rng.integers(18, 80, size=NUM_USERS)[user_idx].astype(np.float64),
+                "artwork_id": [f"{i:024x}" for i in item_idx],
+                "artwork_idx": item_idx.astype(np.int32),
+                "category": [f"category_{i % 5}" for i in item_idx],
+            }
+        )
+        is_val = rng.random(len(df)) < settings.TWO_TOWER_DATASET_VALIDATON_SPLIT_SIZE
+        self._train_df = df[~is_val].reset_index(drop=True)
+        self._val_df = df[is_val].reset_index(drop=True)
+
+    def train_validation_test_split(self, **kwargs):
+        return self._train_df, self._val_df, self._val_df.iloc[:0], None, None, None
+
+
+def saved_model_stats(model: tf.keras.Model, inputs: dict) -> tuple[float, float]:
+    """
+    Size on disk in MB and load time in seconds of a saved model.
+    """
+    model(inputs)
+    directory = Path(tempfile.mkdtemp())
+    try:
+        tf.saved_model.save(model, str(directory))
+        size = sum(path.stat().st_size for path in directory.rglob("*") if path.is_file())
+
+        start = time.perf_counter()
+        tf.saved_model.load(str(directory))
+        elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return size / 1024**2, elapsed
+
+
+def main():
+    print("Query tower size and load time by number of users:")
+    for num_users in SCALING_USERS:
+        user_ids = [f"{i:032x}" for i in range(num_users)]
+        inputs = {"user_id": tf.constant(user_ids[:1]), "age": tf.constant([30.0])}
+        for id_mode in [TowerIdMode.STRING, TowerIdMode.HASH]:
+            tower = QueryTower(
+                user_ids=user_ids if id_mode == TowerIdMode.STRING else None,
+                emb_dim=settings.TWO_TOWER_MODEL_EMBEDDING_SIZE,
+                age_mean=50.0,
+                age_variance=300.0,
+                id_mode=id_mode,
+            )
+            size, elapsed = saved_model_stats(tower, inputs)
+            print(
+                f"{num_users:>9} users {id_mode.value:>6}: {size:>8.1f} MB, "
+                f"loaded in {elapsed:.2f}s"
+            )
+
+    print(f"Recall on {NUM_USERS} synthetic users, {NUM_ITEMS} artworks:")
+    settings.TWO_TOWER_NUM_EPOCHS = NUM_EPOCHS
+    feature_view = SyntheticFeatureView()
+    configurations = [(TowerIdMode.STRING, None)] + [
+        (TowerIdMode.HASH, num_buckets) for num_buckets in HASH_BUCKETS
+    ]
+    for id_mode, num_buckets in configurations:
+        tf.keras.utils.set_random_seed(settings.INTERACTIONS_SEED)
+        dataset = TwoTowerDataset(feature_view, batch_size=BATCH_SIZE)
+        train_ds, val_ds = dataset.get_train_val_split()
+        bucket_kwargs = {} if num_buckets is None else {"num_buckets": num_buckets}
+        model = TwoTowerFactory(dataset).build(
+            QueryTowerFactory(dataset).build(id_mode=id_mode, **bucket_kwargs),
+            ItemTowerFactory(dataset).build(id_mode=id_mode, **bucket_kwargs),
+        )
+        TwoTowerTrainer(dataset, model).train(train_ds, val_ds)
+
+        metrics = RetrievalEvaluator.from_dataset(
+            model.item_model, dataset, batch_size=BATCH_SIZE, top_ks=TOP_KS
+        ).evaluate(model.query_model, val_ds)
+        num_params = model.query_model.user_embedding.count_params()
+        label = id_mode.value + ("" if num_buckets is None else f" {num_buckets}")
+        print(
+            f"{label:>12}: {num_params:>9,} user embedding parameters, "
+            + ", ".join(f"recall@{k} {metrics[f'recall@{k}']:.3f}" for k in TOP_KS)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import time
+
+import numpy as np
+import polars as pl
+
+from recsys.features.interaction import generate_interaction_data
+from recsys.features.users import DatasetSampler
+
+ARTWORKS_COUNT = 27577
+MAX_LIKES_PER_USER = 12
+
+
+def generate_transactions(n_users: int, seed: int = 27) -> pl.DataFrame:
+    """
+    Generate a synthetic transactions frame shaped like the sampled feature pipeline input.
+    """
+    rng = np.random.default_rng(seed)
+    likes_per_user = rng.integers(1, MAX_LIKES_PER_USER + 1, size=n_users)
+    user_idx = np.repeat(np.arange(n_users), likes_per_user)
+
+    return pl.DataFrame(
+        {
+            "user_id": pl.Series(user_idx).cast(pl.Utf8),
+            "artwork_id": pl.Series(
+                rng.integers(0, ARTWORKS_COUNT, size=user_idx.size)
+            ).cast(pl.Utf8),
+            "t_dat": rng.integers(1_700_000_000, 1_730_000_000, size=user_idx.size),
+        }
+    )
+
+
+def main():
+    for size, n_users in DatasetSampler.get_supported_sizes().items():
+        trans_df = generate_transactions(n_users)
+
+        start = time.perf_counter()
+        interaction_df = generate_interaction_data(trans_df, seed=27)
+        elapsed = time.perf_counter() - start
+
+        print(
+            f"{size.value:>6}: {n_users:>6} users, {trans_df.height:>7} likes -> "
+            f"{interaction_df.height:>9} interactions in {elapsed:.2f}s "
+            f"({interaction_df.height / elapsed:,.0f} rows/sec)"
+        )
+
+
+if __name__ == "__main__":
+    main()
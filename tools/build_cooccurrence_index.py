@@ -0,0 +1,38 @@
+import time
+
+from loguru import logger
+
+from recsys import hopsworks_integration
+from recsys.features.cooccurrence import CooccurrenceIndex, build_cooccurrence_index
+from recsys.features.id_dictionary import load_id_dictionaries
+
+
+def main():
+    project, fs = hopsworks_integration.get_feature_store()
+
+    trans_df = (
+        fs.get_feature_group("transactions", version=1)
+        .select(["user_id", "artwork_id", "t_dat"])
+        .read(dataframe_type="polars")
+    )
+
+    # Rows follow the artwork codes of the feature pipeline when they exist.
+    artworks = load_id_dictionaries(dataset_api=project.get_dataset_api())[
+        "artwork_id"
+    ]
+    index = build_cooccurrence_index(
+        trans_df, artworks=artworks if len(artworks) > 0 else None
+    )
+    path = index.save()
+    logger.info(f"Saved co-occurrence index to {path}.")
+
+    index = CooccurrenceIndex.load(path)
+    artwork_id = trans_df["artwork_id"][0]
+    start = time.perf_counter()
+    neighbors = index.neighbors(artwork_id, k=10)
+    elapsed_us = (time.perf_counter() - start) * 1e6
+    logger.info(f"Top neighbours of {artwork_id} in {elapsed_us:.0f}µs: {neighbors}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+from pathlib import Path
+
+import polars as pl
+from loguru import logger
+
+from recsys.config import settings
+from recsys.features.openai_batch import (
+    write_artwork_description_requests,
+    write_user_profile_requests,
+)
+
+FILTERED_ARTWORKS = ["filtered_artworks.parquet", "filtered_artworks.csv"]
+
+
+def main():
+    data_dir = Path(settings.FEATURES_RAW_DATA_DIR)
+
+    artworks_paths = [data_dir / name for name in FILTERED_ARTWORKS if (data_dir / name).exists()]
+    if artworks_paths:
+        path = artworks_paths[0]
+        artworks_lf = pl.scan_parquet(path) if path.suffix == ".parquet" else pl.scan_csv(path)
+        write_artwork_description_requests(artworks_lf)
+    else:
+        logger.warning(f"No filtered artworks catalog in {data_dir}, skipping artworks.")
+
+    transactions_path = data_dir / settings.FEATURES_RAW_TRANSACTIONS_FILE
+    if transactions_path.exists():
+        transactions_lf = (
+            pl.scan_parquet(transactions_path)
+            if transactions_path.suffix == ".parquet"
+            else pl.scan_csv(transactions_path)
+        )
+        write_user_profile_requests(transactions_lf)
+    else:
+        logger.warning(f"No {transactions_path.name} in {data_dir}, skipping users.")
+
+    logger.info(f"✅ Batch requests written to {settings.OPENAI_BATCH_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+from loguru import logger
+
+from recsys import hopsworks_integration
+from recsys.config import settings
+from recsys.features.popularity import DecayedPopularity, to_popularity_events
+from recsys.hopsworks_integration import constants
+
+
+def main():
+    project, fs = hopsworks_integration.get_feature_store()
+
+    artworks_df = (
+        fs.get_feature_group(
+            "artworks", version=constants.ARTWORKS_FEATURE_GROUP_VERSION
+        )
+        .select(["artwork_id", "category"])
+        .read(dataframe_type="polars")
+    )
+
+    if (settings.POPULARITY_DIR / "meta.json").exists():
+        popularity = DecayedPopularity.load()
+    else:
+        popularity = DecayedPopularity.empty(artworks_df)
+
+    # Only the interactions within the lateness window of the saved scores
+    # are read, the ones already folded in are skipped by the update.
+    interactions_fg = fs.get_feature_group("interactions", version=1)
+    query = interactions_fg.select(
+        ["user_id", "artwork_id", "t_dat", "interaction_score"]
+    )
+    if popularity.watermark is not None:
+        query = query.filter(interactions_fg.t_dat >= popularity.watermark)
+    interactions_df = query.read(dataframe_type="polars")
+    logger.info(
+        f"Reading {interactions_df.height} interactions since {popularity.watermark}."
+    )
+
+    popularity = popularity.update(
+        to_popularity_events(interactions_df), artworks_df=artworks_df
+    )
+    path = popularity.save()
+    logger.info(f"Saved popularity tables as of {popularity.as_of} to {path}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+from loguru import logger
+
+from recsys import hopsworks_integration
+from recsys.features.thumbnails import build_thumbnail_pack
+from recsys.hopsworks_integration import constants
+
+
+def main():
+    project, fs = hopsworks_integration.get_feature_store()
+
+    artworks_df = (
+        fs.get_feature_group(
+            "artworks", version=constants.ARTWORKS_FEATURE_GROUP_VERSION
+        )
+        .select(["artwork_id", "thumbnail_link"])
+        .read(dataframe_type="polars")
+    )
+    path = build_thumbnail_pack(artworks_df)
+
+    logger.info(f"✅ Thumbnail pack written to {path}")
+
+
+if __name__ == "__main__":
+    main()
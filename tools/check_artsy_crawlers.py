@@ -0,0 +1,273 @@
+import asyncio
+import csv
+import importlib.util
+import json
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from aiohttp import web
+from loguru import logger
+
+from recsys.config import settings
+
+HOST = "127.0.0.1"
+PAGES = 7
+RATE_LIMIT = 20
+# Slack on the request times of the rate limit check, for the scheduling jitter.
+RATE_TOLERANCE = 0.02
+
+
+def load_script(path: Path):
+    """
+    Import a data generation script, they live in directories that are not packages.
+    """
+    spec = importlib.util.spec_from_file_location(path.stem, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module
+
+
+class MockArtsy:
+    """
+    Local Artsy API serving the artworks pages and the similar artworks links.
+
+    A path listed in `failing` answers 401, and the first request of a path
+    listed in `throttled` answers 429 with a Retry-After header. Every
+    request is recorded with its time.
+    """
+
+    def __init__(self, page_size: int) -> None:
+        self.page_size = page_size
+        self.failing = set()
+        self.throttled = set()
+        self.requests = []
+        self._loop = asyncio.new_event_loop()
+        self._started = threading.Event()
+
+    @property
+    def url(self) -> str:
+        return f"http://{HOST}:{self._port}"
+
+    def start(self) -> "MockArtsy":
+        threading.Thread(target=self._serve, daemon=True).start()
+        self._started.wait()
+
+        return self
+
+    def hits(self, name: str) -> int:
+        return sum(request == name for request, _ in self.requests)
+
+    def times(self, prefix: str) -> list[float]:
+        return [t for request, t in self.requests if request.startswith(prefix)]
+
+    def _serve(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        app = web.Application()
+        app.router.add_get("/artworks", self._artworks)
+        app.router.add_get("/similar/{name}", self._similar)
+        runner = web.AppRunner(app)
+        self._loop.run_until_complete(runner.setup())
+        site = web.TCPSite(runner, HOST, 0)
+        self._loop.run_until_complete(site.start())
+        self._port = site._server.sockets[0].getsockname()[1]
+        self._started.set()
+        self._loop.run_forever()
+
+    def _record(self, name: str) -> web.Response | None:
+        first = self.hits(name) == 0
+        self.requests.append((name, time.monotonic()))
+        if name in self.failing:
+            return web.Response(status=401)
+        if name in self.throttled and first:
+            return web.Response(status=429, headers={"Retry-After": "0.1"})
+
+        return None
+
+    async def _artworks(self, request: web.Request) -> web.Response:
+        page = int(request.query["page"])
+        error = self._record(f"page-{page}")
+        if error is not None:
+            return error
+
+        artworks = []
+        if page <= PAGES:
+            artworks = [
+                {"id": f"artwork-{page}-{i}"} for i in range(self.page_size)
+            ]
+
+        return web.json_response({"_embedded": {"artworks": artworks}})
+
+    async def _similar(self, request: web.Request) -> web.Response:
+        name = request.match_info["name"]
+        error = self._record(f"similar-{name}")
+        if error is not None:
+            return error
+
+        return web.json_response(
+            {
+                "_embedded": {
+                    "artworks": [
+                        {
+                            "id": f"similar-{name}",
+                            "_links": {"thumbnail": {"href": f"thumbnail-{name}"}},
+                        }
+                    ]
+                }
+            }
+        )
+
+
+def check(condition: bool, message: str) -> None:
+    if not condition:
+        raise RuntimeError(f"Check failed: {message}")
+
+
+def check_rate(times: list[float], rate: float, name: str) -> None:
+    """
+    Check that the n-th request of a run came at least (n - 1) / rate seconds after the first.
+    """
+    times = sorted(times)
+    for i, t in enumerate(times):
+        check(
+            t - times[0] >= i / rate - RATE_TOLERANCE,
+            f"{name}: request {i} after {t - times[0]:.3f}s, faster than {rate} requests/s",
+        )
+
+
+def check_artworks_crawl(get_artworks, workdir: Path) -> None:
+    server = MockArtsy(get_artworks.PAGE_SIZE).start()
+    get_artworks.API_BASE_URL = server.url
+    output_file = workdir / "artworks.jsonl"
+    checkpoint_file = workdir / "artworks.checkpoint.json"
+
+    def crawl() -> None:
+        asyncio.run(
+            get_artworks.fetch_artworks(
+                "token",
+                output_file=str(output_file),
+                checkpoint_file=str(checkpoint_file),
+                rate_limit=RATE_LIMIT,
+            )
+        )
+
+    # A first run stops on a failing page, then a torn line is left at the end of the file.
+    server.failing.add("page-3")
+    server.throttled.add("page-5")
+    try:
+        crawl()
+    except Exception as e:
+        logger.info(f"First artworks crawl stopped: {e!r}")
+    else:
+        raise RuntimeError("Check failed: the artworks crawl did not stop on the failing page.")
+    check_rate(server.times("page-"), RATE_LIMIT, "artworks")
+    with open(output_file, "ab") as f:
+        f.write(b'{"id": "torn')
+
+    completed = set(json.loads(checkpoint_file.read_text())["completed_pages"])
+    server.failing.clear()
+    server.requests.clear()
+    crawl()
+
+    artwork_ids = [json.loads(line)["id"] for line in output_file.read_text().splitlines()]
+    expected_ids = {
+        f"artwork-{page}-{i}"
+        for page in range(1, PAGES + 1)
+        for i in range(get_artworks.PAGE_SIZE)
+    }
+    check(len(artwork_ids) == len(expected_ids), "every artwork is written once")
+    check(set(artwork_ids) == expected_ids, "the resumed crawl wrote every artwork")
+    check(
+        all(server.hits(f"page-{page}") == 0 for page in completed),
+        "the pages of the first run are not fetched again",
+    )
+    check(server.hits("page-3") == 1, "the failing page is fetched again")
+    check_rate(server.times("page-"), RATE_LIMIT, "artworks")
+    logger.info(
+        f"Artworks crawl: {len(completed)} pages resumed, torn line truncated, "
+        f"{len(artwork_ids)} artworks written."
+    )
+
+
+def check_likes_crawl(generate_user_likes, workdir: Path) -> None:
+    server = MockArtsy(page_size=1).start()
+    input_csv = workdir / "user-artworks.csv"
+    output_csv = workdir / "transaction-data.csv"
+    progress_file = workdir / "similar-artworks.jsonl"
+
+    names = ["a", "b", "failing", "throttled", "c"]
+    with open(input_csv, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(
+            f, fieldnames=["id", "artwork_id", "thumbnail_link", "similar_link"]
+        )
+        writer.writeheader()
+        for i, name in enumerate(names):
+            writer.writerow(
+                {
+                    "id": f"user-{i}",
+                    "artwork_id": f"artwork-{i}",
+                    "thumbnail_link": f"thumbnail-{i}",
+                    "similar_link": f"{server.url}/similar/{name}",
+                }
+            )
+
+    def generate() -> list[dict]:
+        generate_user_likes.generate_transaction_data(
+            "token", str(input_csv), str(output_csv), progress_file=str(progress_file)
+        )
+        with open(output_csv, encoding="utf-8") as f:
+            return list(csv.DictReader(f))
+
+    # A first run fails on one link, then a torn line is left at the end of the progress file.
+    server.failing.add("similar-failing")
+    server.throttled.add("similar-throttled")
+    rows = generate()
+    check(
+        {row["user_id"] for row in rows} == {"user-0", "user-1", "user-3", "user-4"},
+        "the user whose link failed is left out",
+    )
+    check(server.hits("similar-throttled") == 2, "the throttled link is retried")
+    check_rate(server.times("similar-"), generate_user_likes.RATE_LIMIT, "likes")
+    with open(progress_file, "a", encoding="utf-8") as f:
+        f.write('{"similar_link": "torn')
+
+    server.failing.clear()
+    server.requests.clear()
+    rows = generate()
+    check(
+        [name for name, _ in server.requests] == ["similar-failing"],
+        "only the failed link is fetched again",
+    )
+    check(
+        {row["user_id"] for row in rows} == {f"user-{i}" for i in range(len(names))},
+        "the resumed run writes every user",
+    )
+    check(len(rows) == 2 * len(names), "every user has its artwork and one similar artwork")
+    check(
+        [row["t_dat"] for row in rows] == sorted(row["t_dat"] for row in rows),
+        "the rows are written in t_dat order",
+    )
+    progress = progress_file.read_text().splitlines()
+    check(len(progress) == len(names), "the torn progress line is dropped")
+    logger.info(f"Likes crawl: {len(progress)} links fetched, {len(rows)} transactions written.")
+
+
+def main():
+    get_artworks = load_script(
+        settings.RECSYS_DIR.parent / "01-generate-artwork-descriptions" / "getArtworks.py"
+    )
+    generate_user_likes = load_script(
+        settings.RECSYS_DIR.parent / "02-generate-interactions" / "generate_user_likes.py"
+    )
+
+    with tempfile.TemporaryDirectory() as workdir:
+        check_artworks_crawl(get_artworks, Path(workdir))
+        check_likes_crawl(generate_user_likes, Path(workdir))
+
+    logger.info("The Artsy crawlers resume, truncate torn writes and keep to the rate limit.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+from loguru import logger
+
+from recsys import hopsworks_integration
+from recsys.config import settings
+from recsys.training.two_tower import TwoTowerDataset
+
+
+def main():
+    project, fs = hopsworks_integration.get_feature_store()
+    feature_view = hopsworks_integration.feature_store.create_retrieval_feature_view(fs)
+
+    dataset = TwoTowerDataset(
+        feature_view=feature_view, batch_size=settings.TWO_TOWER_MODEL_BATCH_SIZE
+    )
+    path = dataset.export_splits()
+    logger.info(f"Exported the retrieval dataset splits to {path}.")
+
+
+if __name__ == "__main__":
+    main()
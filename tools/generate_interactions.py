@@ -0,0 +1,32 @@
+import shutil
+
+import polars as pl
+from loguru import logger
+
+from recsys.config import settings
+from recsys.features.interaction import generate_interaction_data_sharded
+
+
+def main():
+    # The transactions written by `make feature-pipeline`, partitioned by year and month.
+    transactions_dir = settings.FEATURES_OUTPUT_DIR / "transactions"
+    output_dir = settings.FEATURES_OUTPUT_DIR / "interactions"
+
+    trans_df = (
+        pl.scan_parquet(transactions_dir / "**" / "*.parquet", hive_partitioning=True)
+        .select(["user_id", "artwork_id", "t_dat"])
+        .collect()
+    )
+
+    # Drop the shards of a previous run, a smaller shard count would not overwrite them all.
+    shutil.rmtree(output_dir, ignore_errors=True)
+    output_paths = generate_interaction_data_sharded(trans_df, output_dir)
+
+    num_rows = pl.scan_parquet(output_paths).select(pl.len()).collect().item()
+    logger.info(
+        f"✅ Wrote {num_rows} interactions in {len(output_paths)} shards to {output_dir}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+from pathlib import Path
+
+import polars as pl
+from loguru import logger
+
+from recsys.config import settings
+from recsys.features.openai_batch_results import (
+    ingest_artwork_descriptions,
+    ingest_user_profiles,
+)
+
+FILTERED_ARTWORKS = ["filtered_artworks.parquet", "filtered_artworks.csv"]
+GENERATED_USERS = "user-artworks.csv"
+RESULTS_DIR = settings.OPENAI_BATCH_DIR / "results"
+
+
+def main():
+    data_dir = Path(settings.FEATURES_RAW_DATA_DIR)
+
+    artwork_results = sorted(RESULTS_DIR.glob("artwork_descriptions_*.jsonl"))
+    artworks_paths = [data_dir / name for name in FILTERED_ARTWORKS if (data_dir / name).exists()]
+    if artwork_results and artworks_paths:
+        path = artworks_paths[0]
+        artworks_lf = pl.scan_parquet(path) if path.suffix == ".parquet" else pl.scan_csv(path)
+        ingest_artwork_descriptions(
+            artwork_results, artworks_lf, data_dir / settings.FEATURES_RAW_ARTWORKS_FILE
+        )
+    else:
+        logger.warning("No artwork description results or catalog, skipping artworks.")
+
+    # Profiles are joined to the users generated by generate_users.py.
+    user_results = sorted(RESULTS_DIR.glob("user_profiles_*.jsonl"))
+    if user_results and (data_dir / GENERATED_USERS).exists():
+        ingest_user_profiles(
+            user_results,
+            pl.scan_csv(data_dir / GENERATED_USERS),
+            data_dir / settings.FEATURES_RAW_USERS_FILE,
+        )
+    else:
+        logger.warning("No user profile results or generated users, skipping users.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+from loguru import logger
+
+from recsys import hopsworks_integration
+from recsys.config import settings
+from recsys.features.pipeline import run_feature_pipeline
+
+
+def main():
+    # The id dictionaries are shared through Hopsworks, so the codes stay
+    # the same on every machine the pipeline runs on.
+    project, _ = hopsworks_integration.get_feature_store()
+
+    logger.info(
+        f"Computing features from {settings.FEATURES_RAW_DATA_DIR} "
+        f"for a {settings.USER_DATA_SIZE.value} user sample."
+    )
+    outputs = run_feature_pipeline(dataset_api=project.get_dataset_api())
+
+    for table, path in outputs.items():
+        logger.info(f"✅ Wrote '{table}' features to {path}")
+
+
+if __name__ == "__main__":
+    main()
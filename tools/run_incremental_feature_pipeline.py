@@ -0,0 +1,67 @@
+from loguru import logger
+
+from recsys import hopsworks_integration
+from recsys.config import settings
+from recsys.features.incremental import (
+    INTERACTIONS_FEATURE_GROUP,
+    TRANSACTIONS_FEATURE_GROUP,
+    WatermarkStore,
+    compute_incremental_features,
+)
+from recsys.features.pipeline import scan_raw_file
+from recsys.hopsworks_integration import constants, feature_store
+
+
+def main():
+    project, fs = hopsworks_integration.get_feature_store()
+    watermarks = WatermarkStore()
+
+    artwork_ids = (
+        fs.get_feature_group(
+            "artworks", version=constants.ARTWORKS_FEATURE_GROUP_VERSION
+        )
+        .select(["artwork_id"])
+        .read(dataframe_type="polars")["artwork_id"]
+    )
+    user_ids = (
+        fs.get_feature_group("users", version=constants.USERS_FEATURE_GROUP_VERSION)
+        .select(["user_id"])
+        .read(dataframe_type="polars")["user_id"]
+    )
+
+    update = compute_incremental_features(
+        scan_raw_file(
+            settings.FEATURES_RAW_DATA_DIR / settings.FEATURES_RAW_TRANSACTIONS_FILE,
+            try_parse_dates=True,
+        ),
+        artwork_ids=artwork_ids,
+        user_ids=user_ids,
+        transactions_watermark=watermarks.get(TRANSACTIONS_FEATURE_GROUP),
+        interactions_watermark=watermarks.get(INTERACTIONS_FEATURE_GROUP),
+        # None before the first insert, then the earlier interactions are
+        # read for the users with new likes.
+        interactions_history=fs.get_feature_group(
+            INTERACTIONS_FEATURE_GROUP, version=1
+        ),
+    )
+
+    # Feature groups upsert on their primary key, so only the delta is written.
+    if update.transactions.height > 0:
+        logger.info(f"Upserting {update.transactions.height} transactions.")
+        feature_store.create_transactions_feature_group(
+            fs=fs, df=update.transactions, online_enabled=True
+        )
+        watermarks.set(TRANSACTIONS_FEATURE_GROUP, update.transactions_watermark)
+
+    if update.interactions.height > 0:
+        logger.info(f"Upserting {update.interactions.height} interactions.")
+        feature_store.create_interactions_feature_group(
+            fs=fs, df=update.interactions, online_enabled=True
+        )
+        watermarks.set(INTERACTIONS_FEATURE_GROUP, update.interactions_watermark)
+
+    logger.info("✅ Feature groups are up to date.")
+
+
+if __name__ == "__main__":
+    main()